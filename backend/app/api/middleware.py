@@ -0,0 +1,51 @@
+"""ASGI middleware recording request metrics."""
+import time
+
+from app.core.metrics import registry
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by method, route template and status code", ("method", "route", "status")
+)
+HTTP_DURATION = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and route template", ("method", "route")
+)
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests being processed")
+
+
+class MetricsMiddleware:
+    """Latency, status and in-flight counts per route template.
+
+    Plain ASGI (no BaseHTTPMiddleware): a few counter updates per request.
+    The route is read after the call from scope["route"], set by FastAPI's
+    router, so /api/products/{product_id} is one series whatever the id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            # Routes inconnues regroupées : pas une série par URL scannée
+            template = getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_DURATION.observe(elapsed, method, template)
+            HTTP_REQUESTS.inc(method, template, str(status_code))
@@ -0,0 +1,47 @@
+"""Opaque cursors for keyset pagination."""
+from fastapi import HTTPException, status
+from datetime import datetime
+import base64
+import json
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: dict) -> str:
+    """Encode the sort key of the last returned item into an opaque cursor."""
+    payload = json.dumps(
+        values,
+        separators=(",", ":"),
+        default=lambda v: {"$date": v.isoformat()} if isinstance(v, datetime) else str(v)
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def decode_cursor(cursor: str, *keys: str) -> dict:
+    """Decode a cursor produced by encode_cursor; each of keys must be present.
+
+    Values must be scalars (or dates): a forged cursor cannot inject query
+    operators, and a missing key is a 400 rather than a KeyError.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, dict):
+            raise ValueError("cursor must encode an object")
+        decoded = {key: _decode_value(value) for key, value in values.items()}
+        if any(key not in decoded for key in keys):
+            raise ValueError("cursor is missing a sort key")
+        if any(isinstance(value, (dict, list)) for value in decoded.values()):
+            raise ValueError("cursor values must be scalars")
+        return decoded
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Curseur de pagination invalide"
+        )
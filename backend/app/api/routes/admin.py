@@ -1,13 +1,53 @@
 """Admin routes."""
-from fastapi import APIRouter, HTTPException, Depends, status
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from pymongo import ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
 from typing import Optional, List
 from datetime import datetime, timezone
+import asyncio
+import os
+import re
 import uuid
 
 from app.db.connection import get_database
+from app.api.pagination import encode_cursor, decode_cursor, NEXT_CURSOR_HEADER
 from app.api.routes.auth import get_current_user
-from app.models.order import OrderStatus
+from app.services.order_status import transition_order
+from app.services.order_export import build_export_query, stream_orders
+from app.services.cache import AsyncTTLCache
+from app.services.sales_rollups import sales_by_status, sales_timeseries
+from app.services.product_sales import top_products
+from app.services.product_updates import (
+    build_product_update_pipeline,
+    toggle_flag_pipeline,
+    toggle_stock_pipeline,
+    validate_product_patch,
+)
+from app.services.catalog import invalidate_catalog
+from app.services.promotions import (
+    ENDED,
+    RUNNING,
+    SCHEDULED,
+    as_utc,
+    overlapping_promotions,
+    process_due_promotions,
+    promotion_product_ids,
+    promotion_scheduler,
+    revert_promotion,
+)
+from app.services.repricing import ROUNDING_RULES, reprice_catalog
+from app.services.reviews import (
+    APPROVED as APPROVED_REVIEW,
+    PENDING as PENDING_REVIEW,
+    REJECTED as REJECTED_REVIEW,
+    REVIEW_STATUSES,
+    apply_rating_change,
+    counted_rating,
+    initial_rating_aggregates,
+)
+from app.models.promotion import Promotion, PromotionCreate, PromotionUpdate
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -37,6 +77,7 @@ class ProductCreate(BaseModel):
     description: Optional[str] = ""
     image_url: Optional[str] = ""
     volume: Optional[str] = ""
+    quantity: Optional[int] = None
     in_stock: Optional[bool] = True
     is_new: Optional[bool] = False
     is_bestseller: Optional[bool] = False
@@ -52,76 +93,98 @@ class ProductUpdate(BaseModel):
     description: Optional[str] = None
     image_url: Optional[str] = None
     volume: Optional[str] = None
+    quantity: Optional[int] = None
     in_stock: Optional[bool] = None
     is_new: Optional[bool] = None
     is_bestseller: Optional[bool] = None
 
 
+class BulkProductItem(BaseModel):
+    id: str
+    patch: ProductUpdate
+
+
+class BulkProductFilter(BaseModel):
+    ids: Optional[List[str]] = None
+    brand: Optional[str] = None
+    category: Optional[str] = None
+    in_stock: Optional[bool] = None
+    promo: Optional[bool] = None
+
+
+class BulkProductOperation(BaseModel):
+    # Soit une liste de modifications par produit, soit un filtre + une modification
+    items: Optional[List[BulkProductItem]] = None
+    filter: Optional[BulkProductFilter] = None
+    patch: Optional[ProductUpdate] = None
+
+
+class RepriceRequest(BaseModel):
+    exchange_rate: Optional[float] = Field(None, gt=0)
+    margin: Optional[float] = Field(None, ge=0)  # fraction : 0.4 = 40%
+    rounding: str = "round"
+    cost_factor: Optional[float] = Field(None, gt=0)
+    dry_run: bool = True
+
+
 # ==================== DASHBOARD ====================
 
-@router.get("/dashboard")
-async def get_dashboard(admin: dict = Depends(require_admin)):
-    """Get admin dashboard statistics."""
-    db = await get_database()
+# Le tableau de bord est recalculé au plus une fois toutes les DASHBOARD_CACHE_TTL secondes
+DASHBOARD_CACHE_TTL = float(os.environ.get("DASHBOARD_CACHE_TTL", "10"))
+_dashboard_cache = AsyncTTLCache(DASHBOARD_CACHE_TTL, name="dashboard")
+
+
+async def _compute_dashboard(db) -> dict:
+    """Compute every dashboard figure with concurrent, single-pass queries."""
+    # Compteurs et chiffre d'affaires lus dans les agrégats journaliers, pas dans orders
+    by_status, top_products, total_products, total_users = await asyncio.gather(
+        sales_by_status(db),
+        # Top 8 : tri indexé sur les compteurs de ventes des produits
+        top_products(db, 8),
+        db.products.estimated_document_count(),
+        db.users.count_documents({"role": "client"})
+    )
     
-    # Total des commandes
-    total_orders = await db.orders.count_documents({})
-    
-    # Commandes par statut
-    pending_orders = await db.orders.count_documents({"status": "pending"})
-    confirmed_orders = await db.orders.count_documents({"status": "confirmed"})
-    delivered_orders = await db.orders.count_documents({"status": "delivered"})
-    
-    # Chiffre d'affaires (commandes livrées)
-    pipeline = [
-        {"$match": {"status": "delivered"}},
-        {"$group": {"_id": None, "total": {"$sum": "$total_tnd"}}}
-    ]
-    revenue_result = await db.orders.aggregate(pipeline).to_list(1)
-    total_revenue = revenue_result[0]["total"] if revenue_result else 0
-    
-    # Chiffre d'affaires potentiel (toutes commandes sauf annulées)
-    pipeline_potential = [
-        {"$match": {"status": {"$ne": "cancelled"}}},
-        {"$group": {"_id": None, "total": {"$sum": "$total_tnd"}}}
-    ]
-    potential_result = await db.orders.aggregate(pipeline_potential).to_list(1)
-    potential_revenue = potential_result[0]["total"] if potential_result else 0
-    
-    # Nombre de produits
-    total_products = await db.products.count_documents({})
-    
-    # Nombre d'utilisateurs (clients uniquement)
-    total_users = await db.users.count_documents({"role": "client"})
-    
-    # Top 8 produits les plus vendus
-    top_products_pipeline = [
-        {"$unwind": "$items"},
-        {"$group": {
-            "_id": "$items.product_id",
-            "product_name": {"$first": "$items.product_name"},
-            "product_image": {"$first": "$items.product_image"},
-            "brand": {"$first": "$items.brand"},
-            "total_sold": {"$sum": "$items.quantity"}
-        }},
-        {"$sort": {"total_sold": -1}},
-        {"$limit": 8}
-    ]
-    top_products = await db.orders.aggregate(top_products_pipeline).to_list(8)
+    def count(order_status):
+        return by_status.get(order_status, {}).get("orders", 0)
     
     return {
-        "total_orders": total_orders,
-        "pending_orders": pending_orders,
-        "confirmed_orders": confirmed_orders,
-        "delivered_orders": delivered_orders,
-        "total_revenue": total_revenue,
-        "potential_revenue": potential_revenue,
+        "total_orders": sum(row["orders"] for row in by_status.values()),
+        "pending_orders": count("pending"),
+        "confirmed_orders": count("confirmed"),
+        "delivered_orders": count("delivered"),
+        # Chiffre d'affaires (commandes livrées)
+        "total_revenue": by_status.get("delivered", {}).get("revenue_tnd", 0),
+        # Chiffre d'affaires potentiel (toutes commandes sauf annulées)
+        "potential_revenue": sum(
+            row["revenue_tnd"] for order_status, row in by_status.items() if order_status != "cancelled"
+        ),
         "total_products": total_products,
         "total_users": total_users,
         "top_products": top_products
     }
 
 
+@router.get("/dashboard")
+async def get_dashboard(admin: dict = Depends(require_admin)):
+    """Get admin dashboard statistics."""
+    db = await get_database()
+    return await _dashboard_cache.get(lambda: _compute_dashboard(db))
+
+
+@router.get("/dashboard/sales")
+async def get_sales_timeseries(
+    start: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$", description="First day (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$", description="Day after the last one (YYYY-MM-DD)"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Only this order status"),
+    governorate: Optional[str] = Query(None, description="Only this governorate"),
+    admin: dict = Depends(require_admin)
+):
+    """Daily sales series read from the rollups (admin only)."""
+    db = await get_database()
+    return await sales_timeseries(db, start, end, status_filter, governorate)
+
+
 # ==================== COMMANDES ====================
 
 @router.get("/orders")
@@ -145,6 +208,30 @@ async def get_all_orders(
     return orders
 
 
+@router.get("/orders/export")
+async def export_orders(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    start: Optional[datetime] = Query(None, description="Created at or after (ISO date)"),
+    end: Optional[datetime] = Query(None, description="Created before (ISO date)"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Filter by order status"),
+    flatten_items: bool = Query(False, description="One row per order line"),
+    admin: dict = Depends(require_admin)
+):
+    """Stream orders for accounting (admin only)."""
+    db = await get_database()
+    
+    query = build_export_query(start, end, status_filter)
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    period = "-".join(d.strftime("%Y%m%d") for d in (start, end) if d) or "all"
+    filename = f"orders-{period}.{'csv' if format == 'csv' else 'ndjson'}"
+    
+    return StreamingResponse(
+        stream_orders(db, query, format, flatten_items),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.get("/orders/{order_id}")
 async def get_order_details(order_id: str, admin: dict = Depends(require_admin)):
     """Get order details (admin only)."""
@@ -171,34 +258,14 @@ async def update_order_status(
     """Update order status (admin only)."""
     db = await get_database()
     
-    valid_statuses = [s.value for s in OrderStatus]
-    if data.status not in valid_statuses:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Statut invalide. Valeurs acceptées: {valid_statuses}"
-        )
-    
-    update_data = {
-        "status": data.status,
-        "updated_at": datetime.now(timezone.utc)
-    }
-    
-    if data.status == "confirmed":
-        update_data["confirmed_at"] = datetime.now(timezone.utc)
-    elif data.status == "delivered":
-        update_data["delivered_at"] = datetime.now(timezone.utc)
-    
-    result = await db.orders.update_one(
-        {"id": order_id},
-        {"$set": update_data}
+    # Transition atomique avec historique (stock remis en cas d'annulation)
+    await transition_order(
+        db,
+        order_id,
+        data.status,
+        changed_by=f"admin:{admin['email']}"
     )
     
-    if result.matched_count == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Commande non trouvée"
-        )
-    
     return {"message": "Statut mis à jour", "status": data.status}
 
 
@@ -220,6 +287,108 @@ async def get_all_products_admin(
     return products
 
 
+# Colonnes triables de la grille produits admin
+PRODUCT_SORT_FIELDS = {
+    "name", "brand", "category", "price_tnd", "original_price_tnd", "discount_percentage",
+    "quantity", "in_stock", "is_new", "is_bestseller", "rating", "review_count",
+    "sold_quantity", "sold_revenue_tnd", "sales_7d", "sales_30d", "created_at", "updated_at",
+}
+
+PRODUCT_GRID_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "ref": 1,
+    "name": 1,
+    "brand": 1,
+    "category": 1,
+    "image_url": 1,
+    "price_tnd": 1,
+    "original_price_tnd": 1,
+    "discount_percentage": 1,
+    "in_stock": 1,
+    "stock_disabled": 1,
+    "is_new": 1,
+    "is_bestseller": 1,
+    "rating": 1,
+    "review_count": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    # Stock et ventes, maintenus sur le document produit
+    "quantity": 1,
+    "sold_quantity": {"$ifNull": ["$sold_quantity", 0]},
+    "sold_revenue_tnd": {"$ifNull": ["$sold_revenue_tnd", 0]},
+    "sales_7d": {"$ifNull": ["$sales_7d", 0]},
+    "sales_30d": {"$ifNull": ["$sales_30d", 0]},
+}
+
+
+@router.get("/products/query")
+async def query_products_admin(
+    q: Optional[str] = Query(None, description="Search in name, brand or reference"),
+    brand: Optional[str] = Query(None, description="Exact brand"),
+    category: Optional[str] = Query(None, description="Exact category"),
+    in_stock: Optional[bool] = Query(None, description="Stock flag"),
+    low_stock: Optional[int] = Query(None, ge=0, description="Tracked quantity at or below this value"),
+    promo: Optional[bool] = Query(None, description="Products with (or without) a discount"),
+    is_new: Optional[bool] = Query(None, description="New products flag"),
+    is_bestseller: Optional[bool] = Query(None, description="Bestseller flag"),
+    sort: str = Query("name", description="Column to sort on"),
+    order: str = Query("asc", pattern="^(asc|desc)$", description="asc or desc"),
+    limit: int = Query(50, ge=1, le=500, description="Number of products to return"),
+    offset: int = Query(0, ge=0, description="Number of products to skip"),
+    admin: dict = Depends(require_admin)
+):
+    """Filtered, sorted and paginated product grid with stock and sales (admin only)."""
+    db = await get_database()
+    
+    if sort not in PRODUCT_SORT_FIELDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tri invalide. Valeurs acceptées: {sorted(PRODUCT_SORT_FIELDS)}"
+        )
+    
+    match = {}
+    if q:
+        pattern = {"$regex": re.escape(q.strip()), "$options": "i"}
+        match["$or"] = [{"name": pattern}, {"brand": pattern}, {"ref": pattern}]
+    if brand:
+        match["brand"] = brand
+    if category:
+        match["category"] = category
+    if in_stock is not None:
+        match["in_stock"] = {"$ne": False} if in_stock else False
+    if low_stock is not None:
+        match["quantity"] = {"$lte": low_stock}
+    if promo is not None:
+        match["discount_percentage"] = {"$gt": 0} if promo else {"$in": [0, None]}
+    if is_new is not None:
+        match["is_new"] = True if is_new else {"$ne": True}
+    if is_bestseller is not None:
+        match["is_bestseller"] = True if is_bestseller else {"$ne": True}
+    
+    direction = 1 if order == "asc" else -1
+    result = await db.products.aggregate([
+        {"$match": match},
+        {"$facet": {
+            "products": [
+                {"$sort": {sort: direction, "id": direction}},
+                {"$skip": offset},
+                {"$limit": limit},
+                {"$project": PRODUCT_GRID_PROJECTION}
+            ],
+            "total": [{"$count": "count"}]
+        }}
+    ]).to_list(1)
+    
+    facets = result[0] if result else {"products": [], "total": []}
+    return {
+        "products": facets["products"],
+        "total": facets["total"][0]["count"] if facets["total"] else 0,
+        "limit": limit,
+        "offset": offset
+    }
+
+
 @router.post("/products")
 async def create_product(
     product_data: ProductCreate,
@@ -238,6 +407,10 @@ async def create_product(
     else:
         price = product_data.price_tnd
     
+    # in_stock = pas de rupture forcée (in_stock: false) et, si le stock est suivi, quantité positive
+    stock_disabled = product_data.in_stock is False
+    in_stock = not stock_disabled and (product_data.quantity is None or product_data.quantity > 0)
+    
     product = {
         "id": product_id,
         "name": product_data.name,
@@ -249,82 +422,207 @@ async def create_product(
         "description": product_data.description or "",
         "image_url": product_data.image_url or "",
         "volume": product_data.volume or "",
-        "in_stock": product_data.in_stock if product_data.in_stock is not None else True,
+        "quantity": product_data.quantity,
+        "in_stock": in_stock,
+        "stock_disabled": stock_disabled,
         "is_new": product_data.is_new or False,
         "is_bestseller": product_data.is_bestseller or False,
+        **initial_rating_aggregates(),
         "created_at": now,
         "updated_at": now
     }
     
     await db.products.insert_one(product)
+    invalidate_catalog()
     
     product.pop("_id", None)
     return product
 
 
+# Nombre maximum de produits modifiables par requête groupée
+BULK_MAX_ITEMS = 1000
+
+
+def _bulk_filter_query(product_filter: BulkProductFilter) -> dict:
+    """Translate a bulk filter into a MongoDB query."""
+    query = {}
+    if product_filter.ids is not None:
+        query["id"] = {"$in": product_filter.ids}
+    if product_filter.brand:
+        query["brand"] = product_filter.brand
+    if product_filter.category:
+        query["category"] = product_filter.category
+    if product_filter.in_stock is not None:
+        query["in_stock"] = {"$ne": False} if product_filter.in_stock else False
+    if product_filter.promo is not None:
+        query["discount_percentage"] = {"$gt": 0} if product_filter.promo else {"$in": [0, None]}
+    return query
+
+
+@router.post("/products/bulk")
+async def bulk_update_products(
+    operation: BulkProductOperation,
+    admin: dict = Depends(require_admin)
+):
+    """Apply many product updates with one unordered bulk_write (admin only)."""
+    db = await get_database()
+    now = datetime.now(timezone.utc)
+    
+    # Modification par filtre : une seule UpdateMany
+    if operation.items is None:
+        if operation.filter is None or operation.patch is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Fournir soit items, soit filter et patch"
+            )
+        query = _bulk_filter_query(operation.filter)
+        if not query:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Le filtre doit contenir au moins un critère"
+            )
+        patch = operation.patch.model_dump(exclude_none=True)
+        errors = validate_product_patch(patch)
+        if errors:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=" ; ".join(errors)
+            )
+        result = await db.products.bulk_write(
+            [UpdateMany(query, build_product_update_pipeline(patch, now))],
+            ordered=False
+        )
+        invalidate_catalog()
+        return {"matched": result.matched_count, "modified": result.modified_count}
+    
+    if operation.filter is not None or operation.patch is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Fournir soit items, soit filter et patch"
+        )
+    if len(operation.items) > BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Au maximum {BULK_MAX_ITEMS} produits par requête"
+        )
+    
+    # Validation complète avant toute écriture
+    patches = []
+    invalid = []
+    seen = set()
+    for item in operation.items:
+        patch = item.patch.model_dump(exclude_none=True)
+        errors = validate_product_patch(patch)
+        if item.id in seen:
+            errors.append("Produit présent plusieurs fois")
+        seen.add(item.id)
+        if errors:
+            invalid.append({"id": item.id, "errors": errors})
+        patches.append((item.id, patch))
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "Modifications invalides", "errors": invalid}
+        )
+    
+    existing = await db.products.find({"id": {"$in": list(seen)}}, {"_id": 0, "id": 1}).to_list(None)
+    existing_ids = {p["id"] for p in existing}
+    
+    operations = []
+    operation_ids = []
+    for product_id, patch in patches:
+        if product_id in existing_ids:
+            operations.append(UpdateOne({"id": product_id}, build_product_update_pipeline(patch, now)))
+            operation_ids.append(product_id)
+    
+    failed = {}
+    if operations:
+        try:
+            await db.products.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed[operation_ids[error["index"]]] = error.get("errmsg", "Erreur d'écriture")
+        invalidate_catalog()
+    
+    results = []
+    for product_id, _ in patches:
+        if product_id not in existing_ids:
+            results.append({"id": product_id, "status": "not_found"})
+        elif product_id in failed:
+            results.append({"id": product_id, "status": "error", "error": failed[product_id]})
+        else:
+            results.append({"id": product_id, "status": "updated"})
+    
+    return {
+        "updated": sum(1 for r in results if r["status"] == "updated"),
+        "results": results
+    }
+
+
+@router.post("/products/reprice")
+async def reprice_products(data: RepriceRequest, admin: dict = Depends(require_admin)):
+    """Reprice the catalog from EUR prices; dry run (diff and stats only) by default (admin only)."""
+    db = await get_database()
+    
+    if data.margin is not None and data.margin >= 10:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La marge doit être une fraction (ex. 0.4 pour 40%)"
+        )
+    if data.rounding not in ROUNDING_RULES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Arrondi invalide. Valeurs acceptées: {list(ROUNDING_RULES)}"
+        )
+    
+    try:
+        return await reprice_catalog(
+            db,
+            exchange_rate=data.exchange_rate,
+            margin=data.margin,
+            rounding=data.rounding,
+            cost_factor=data.cost_factor,
+            dry_run=data.dry_run,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
 @router.put("/products/{product_id}")
 async def update_product(
     product_id: str,
     data: ProductUpdate,
     admin: dict = Depends(require_admin)
 ):
-    """Update product (admin only)."""
+    """Update product in one atomic find_one_and_update (admin only)."""
     db = await get_database()
     
-    # Get current product
-    product = await db.products.find_one({"id": product_id})
-    if not product:
+    patch = data.model_dump(exclude_none=True)
+    errors = validate_product_patch(patch)
+    if errors:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Produit non trouvé"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="; ".join(errors)
         )
     
-    update_data = {"updated_at": datetime.now(timezone.utc)}
-    
-    # Update fields if provided
-    if data.name is not None:
-        update_data["name"] = data.name
-    if data.brand is not None:
-        update_data["brand"] = data.brand
-    if data.category is not None:
-        update_data["category"] = data.category
-    if data.description is not None:
-        update_data["description"] = data.description
-    if data.image_url is not None:
-        update_data["image_url"] = data.image_url
-    if data.volume is not None:
-        update_data["volume"] = data.volume
-    if data.in_stock is not None:
-        update_data["in_stock"] = data.in_stock
-    if data.is_new is not None:
-        update_data["is_new"] = data.is_new
-    if data.is_bestseller is not None:
-        update_data["is_bestseller"] = data.is_bestseller
-    
-    # Handle price and promo
-    if data.original_price_tnd is not None:
-        update_data["original_price_tnd"] = data.original_price_tnd
-    if data.discount_percentage is not None:
-        update_data["discount_percentage"] = data.discount_percentage
-    if data.price_tnd is not None:
-        update_data["price_tnd"] = data.price_tnd
-    
-    # Recalculate price if promo changed
-    if data.discount_percentage is not None:
-        original = data.original_price_tnd or product.get("original_price_tnd") or product.get("price_tnd")
-        if data.discount_percentage > 0:
-            update_data["price_tnd"] = int(original * (1 - data.discount_percentage / 100))
-            update_data["original_price_tnd"] = original
-        else:
-            update_data["price_tnd"] = original
-            update_data["discount_percentage"] = 0
-    
-    await db.products.update_one(
+    # Le prix remisé est recalculé par le serveur à partir du prix d'origine stocké
+    product = await db.products.find_one_and_update(
         {"id": product_id},
-        {"$set": update_data}
+        build_product_update_pipeline(patch, datetime.now(timezone.utc)),
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
+    if not product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Produit non trouvé"
+        )
+    invalidate_catalog()
     
-    return {"message": "Produit mis à jour"}
+    return {"message": "Produit mis à jour", "product": product}
 
 
 @router.delete("/products/{product_id}")
@@ -333,6 +631,7 @@ async def delete_product(product_id: str, admin: dict = Depends(require_admin)):
     db = await get_database()
     
     result = await db.products.delete_one({"id": product_id})
+    invalidate_catalog()
     
     if result.deleted_count == 0:
         raise HTTPException(
@@ -343,110 +642,333 @@ async def delete_product(product_id: str, admin: dict = Depends(require_admin)):
     return {"message": "Produit supprimé"}
 
 
-@router.post("/products/{product_id}/toggle-bestseller")
-async def toggle_bestseller(product_id: str, admin: dict = Depends(require_admin)):
-    """Toggle product bestseller status."""
+async def _toggle_product_flag(product_id: str, pipeline: list) -> dict:
+    """Apply a toggle pipeline and return the updated product in one round trip."""
     db = await get_database()
     
-    product = await db.products.find_one({"id": product_id})
-    
+    product = await db.products.find_one_and_update(
+        {"id": product_id},
+        pipeline,
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Produit non trouvé"
         )
-    
-    new_status = not product.get("is_bestseller", False)
-    
-    await db.products.update_one(
-        {"id": product_id},
-        {"$set": {"is_bestseller": new_status, "updated_at": datetime.now(timezone.utc)}}
+    invalidate_catalog()
+    return product
+
+
+@router.post("/products/{product_id}/toggle-bestseller")
+async def toggle_bestseller(product_id: str, admin: dict = Depends(require_admin)):
+    """Toggle product bestseller status."""
+    product = await _toggle_product_flag(
+        product_id, toggle_flag_pipeline("is_bestseller", False, datetime.now(timezone.utc))
     )
-    
-    return {"message": "Statut best-seller mis à jour", "is_bestseller": new_status}
+    return {"message": "Statut best-seller mis à jour", "is_bestseller": product["is_bestseller"], "product": product}
 
 
 @router.post("/products/{product_id}/toggle-new")
 async def toggle_new(product_id: str, admin: dict = Depends(require_admin)):
     """Toggle product new status."""
+    product = await _toggle_product_flag(
+        product_id, toggle_flag_pipeline("is_new", False, datetime.now(timezone.utc))
+    )
+    return {"message": "Statut nouveau mis à jour", "is_new": product["is_new"], "product": product}
+
+
+@router.post("/products/{product_id}/toggle-stock")
+async def toggle_stock(product_id: str, admin: dict = Depends(require_admin)):
+    """Toggle the manual out-of-stock override; in_stock also follows the tracked quantity."""
+    product = await _toggle_product_flag(product_id, toggle_stock_pipeline(datetime.now(timezone.utc)))
+    return {
+        "message": "Statut stock mis à jour",
+        "in_stock": product["in_stock"],
+        "stock_disabled": product["stock_disabled"],
+        "product": product
+    }
+
+
+# ==================== PROMOTIONS ====================
+
+async def _validate_promotion(
+    db, product_ids: List[str], discount: int, start_date, end_date, promotion_id: Optional[str] = None
+) -> None:
+    """Raise a 400 when a promotion's products, discount or dates are invalid,
+    and a 409 when it overlaps another promotion on the same products."""
+    if not product_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Sélectionnez au moins un produit"
+        )
+    if not 0 < discount < 100:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La remise doit être comprise entre 1 et 99%"
+        )
+    if end_date is not None and end_date <= start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La date de fin doit être postérieure à la date de début"
+        )
+    found = await db.products.distinct("id", {"id": {"$in": product_ids}})
+    missing = sorted(set(product_ids) - set(found))
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Produits introuvables: {missing}"
+        )
+    overlapping = await overlapping_promotions(db, product_ids, start_date, end_date, exclude_id=promotion_id)
+    if overlapping:
+        shared = sorted(set(product_ids) & {pid for p in overlapping for pid in promotion_product_ids(p)})
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Période en conflit avec la promotion {overlapping[0].get('name') or overlapping[0]['id']} "
+                   f"sur les produits : {shared}"
+        )
+
+
+@router.get("/promotions")
+async def get_promotions(
+    promotion_status: Optional[str] = Query(None, alias="status", description="scheduled, running or ended"),
+    admin: dict = Depends(require_admin)
+):
+    """Get all promotions, latest start first (admin only)."""
     db = await get_database()
     
-    product = await db.products.find_one({"id": product_id})
+    query = {"status": promotion_status} if promotion_status else {}
+    return await db.promotions.find(query, {"_id": 0}).sort("start_date", -1).to_list(1000)
+
+
+@router.post("/promotions")
+async def create_promotion(data: PromotionCreate, admin: dict = Depends(require_admin)):
+    """Create a promotion; it is applied and reverted by the promotion scheduler (admin only)."""
+    db = await get_database()
     
-    if not product:
+    now = datetime.now(timezone.utc)
+    product_ids = list(dict.fromkeys(data.product_ids + ([data.product_id] if data.product_id else [])))
+    start_date = as_utc(data.start_date) or now
+    end_date = as_utc(data.end_date)
+    await _validate_promotion(db, product_ids, data.discount_percentage, start_date, end_date)
+    
+    promotion = Promotion(
+        name=data.name,
+        product_ids=product_ids,
+        discount_percentage=data.discount_percentage,
+        start_date=start_date,
+        end_date=end_date,
+        created_by=admin["id"],
+    ).model_dump(mode="python")
+    promotion["status"] = promotion["status"].value
+    await db.promotions.insert_one(promotion)
+    promotion.pop("_id", None)
+    
+    # Promotion immédiate : appliquée avant de répondre
+    if start_date <= now:
+        await process_due_promotions(db)
+        promotion = await db.promotions.find_one({"id": promotion["id"]}, {"_id": 0})
+    promotion_scheduler.wake()
+    
+    return promotion
+
+
+@router.put("/promotions/{promotion_id}")
+async def update_promotion(promotion_id: str, data: PromotionUpdate, admin: dict = Depends(require_admin)):
+    """Update a promotion not yet ended (admin only)."""
+    db = await get_database()
+    
+    promotion = await db.promotions.find_one({"id": promotion_id}, {"_id": 0})
+    if not promotion:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Produit non trouvé"
+            detail="Promotion non trouvée"
+        )
+    if promotion.get("status") == ENDED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Promotion terminée, créez-en une nouvelle"
         )
     
-    new_status = not product.get("is_new", False)
-    
-    await db.products.update_one(
-        {"id": product_id},
-        {"$set": {"is_new": new_status, "updated_at": datetime.now(timezone.utc)}}
+    updates = data.model_dump(exclude_none=True)
+    for field in ("start_date", "end_date"):
+        if field in updates:
+            updates[field] = as_utc(updates[field])
+    merged = {**promotion, **updates}
+    await _validate_promotion(
+        db,
+        promotion_product_ids(merged),
+        merged["discount_percentage"],
+        as_utc(merged["start_date"]),
+        as_utc(merged.get("end_date")),
+        promotion_id=promotion_id
     )
     
-    return {"message": "Statut nouveau mis à jour", "is_new": new_status}
+    # Produits ou remise modifiés pendant la promotion : on retire puis on réapplique
+    if promotion.get("status") == RUNNING and ({"product_ids", "discount_percentage"} & updates.keys()):
+        await revert_promotion(db, promotion)
+        updates["status"] = SCHEDULED
+    
+    updates["updated_at"] = datetime.now(timezone.utc)
+    await db.promotions.update_one({"id": promotion_id}, {"$set": updates})
+    await process_due_promotions(db)
+    promotion_scheduler.wake()
+    
+    return await db.promotions.find_one({"id": promotion_id}, {"_id": 0})
 
 
-@router.post("/products/{product_id}/toggle-stock")
-async def toggle_stock(product_id: str, admin: dict = Depends(require_admin)):
-    """Toggle product stock status."""
+@router.delete("/promotions/{promotion_id}")
+async def delete_promotion(promotion_id: str, admin: dict = Depends(require_admin)):
+    """Delete a promotion, removing its discounts if it is running (admin only)."""
     db = await get_database()
     
-    product = await db.products.find_one({"id": product_id})
-    
-    if not product:
+    promotion = await db.promotions.find_one_and_delete({"id": promotion_id}, {"_id": 0})
+    if not promotion:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Produit non trouvé"
+            detail="Promotion non trouvée"
         )
+    await revert_promotion(db, promotion)
+    promotion_scheduler.wake()
     
-    new_status = not product.get("in_stock", True)
+    return {"message": "Promotion supprimée"}
+
+
+# ==================== AVIS ====================
+
+class ModerateReview(BaseModel):
+    status: str  # approved ou rejected
+
+
+@router.get("/reviews")
+async def get_reviews_for_moderation(
+    response: Response,
+    review_status: str = Query(PENDING_REVIEW, alias="status", description="pending, approved or rejected"),
+    limit: int = Query(50, ge=1, le=200, description="Number of reviews to return"),
+    cursor: Optional[str] = Query(None, description="Cursor returned in X-Next-Cursor"),
+    admin: dict = Depends(require_admin)
+):
+    """Get reviews by moderation status, oldest first (admin only)."""
+    db = await get_database()
     
-    await db.products.update_one(
-        {"id": product_id},
-        {"$set": {"in_stock": new_status, "updated_at": datetime.now(timezone.utc)}}
+    if review_status not in REVIEW_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Statut invalide. Statuts valides: {list(REVIEW_STATUSES)}"
+        )
+    
+    query = {"status": review_status}
+    if cursor:
+        after = decode_cursor(cursor, "created_at", "id")
+        query["$or"] = [
+            {"created_at": {"$gt": after["created_at"]}},
+            {"created_at": after["created_at"], "id": {"$gt": after["id"]}},
+        ]
+    
+    reviews = await db.reviews.find(query, {"_id": 0}).sort(
+        [("created_at", 1), ("id", 1)]
+    ).limit(limit).to_list(limit)
+    
+    if len(reviews) == limit:
+        last = reviews[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"created_at": last["created_at"], "id": last["id"]})
+    
+    return reviews
+
+
+@router.put("/reviews/{review_id}/moderate")
+async def moderate_review(review_id: str, data: ModerateReview, admin: dict = Depends(require_admin)):
+    """Approve or reject a review; the product rating follows (admin only)."""
+    db = await get_database()
+    
+    if data.status not in (APPROVED_REVIEW, REJECTED_REVIEW):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Statut invalide. Statuts valides: ['approved', 'rejected']"
+        )
+    
+    now = datetime.now(timezone.utc)
+    previous = await db.reviews.find_one_and_update(
+        {"id": review_id},
+        {"$set": {"status": data.status, "moderated_by": admin["id"], "moderated_at": now}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
     )
+    if not previous:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Avis non trouvé"
+        )
+    
+    review = {**previous, "status": data.status}
+    await apply_rating_change(db, review["product_id"], counted_rating(previous), counted_rating(review))
     
-    return {"message": "Statut stock mis à jour", "in_stock": new_status}
+    return {"message": "Avis modéré", "status": data.status}
 
 
 # ==================== CLIENTS ====================
 
+# Tri possibles de la liste des clients (toujours décroissant, départage par id)
+CLIENT_SORT_FIELDS = {"created_at", "total_spent", "orders_count"}
+
+
 @router.get("/clients")
-async def get_all_clients(admin: dict = Depends(require_admin)):
-    """Get all clients (admin only)."""
+async def get_all_clients(
+    response: Response,
+    sort: str = Query("created_at", description="created_at, total_spent or orders_count"),
+    search: Optional[str] = Query(None, description="Search in name, email or phone"),
+    limit: int = Query(100, ge=1, le=500, description="Number of clients to return"),
+    cursor: Optional[str] = Query(None, description="Cursor returned in X-Next-Cursor"),
+    admin: dict = Depends(require_admin)
+):
+    """Get all clients with their precomputed order stats (admin only)."""
     db = await get_database()
     
-    # Get all clients
-    clients = await db.users.find({"role": "client"}).to_list(100)
-    
-    result = []
-    for client in clients:
-        # Count orders for each client
-        orders_count = await db.orders.count_documents({"user_id": client["id"]})
-        
-        # Calculate total spent
-        pipeline = [
-            {"$match": {"user_id": client["id"], "status": {"$ne": "cancelled"}}},
-            {"$group": {"_id": None, "total": {"$sum": "$total_tnd"}}}
+    if sort not in CLIENT_SORT_FIELDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tri invalide. Valeurs acceptées: {sorted(CLIENT_SORT_FIELDS)}"
+        )
+    
+    match = {"role": "client"}
+    if search:
+        pattern = {"$regex": re.escape(search.strip()), "$options": "i"}
+        match["$or"] = [
+            {"email": pattern},
+            {"first_name": pattern},
+            {"last_name": pattern},
+            {"phone": pattern},
         ]
-        total_result = await db.orders.aggregate(pipeline).to_list(1)
-        total_spent = total_result[0]["total"] if total_result else 0
-        
-        result.append({
-            "id": client["id"],
-            "email": client["email"],
-            "first_name": client["first_name"],
-            "last_name": client["last_name"],
-            "phone": client["phone"],
-            "created_at": client["created_at"],
-            "orders_count": orders_count,
-            "total_spent": total_spent
-        })
-    
-    return result
+    
+    after = None
+    if cursor:
+        last = decode_cursor(cursor, "value", "id")
+        after = {"$or": [
+            {sort: {"$lt": last["value"]}},
+            {sort: last["value"], "id": {"$lt": last["id"]}},
+        ]}
+    
+    # Compteurs précalculés sur chaque client (services/client_stats) : tri et pagination
+    # servis par les index role/<tri>/id, sans jointure sur les commandes
+    query = {"$and": [match, after]} if after else match
+    clients = await db.users.find(query, {
+        "_id": 0,
+        "id": 1,
+        "email": 1,
+        "first_name": 1,
+        "last_name": 1,
+        "phone": 1,
+        "created_at": 1,
+        "orders_count": 1,
+        "total_spent": 1
+    }).sort([(sort, -1), ("id", -1)]).limit(limit).to_list(limit)
+    
+    if len(clients) == limit:
+        last = clients[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"value": last.get(sort), "id": last["id"]})
+    
+    return clients
 
 
 @router.get("/clients/{client_id}")
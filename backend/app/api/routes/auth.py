@@ -7,8 +7,9 @@ from datetime import datetime, timezone
 
 from app.db.connection import get_database
 from app.core.security import (
-    verify_password,
-    get_password_hash,
+    get_password_hash_async,
+    verify_and_update_password_async,
+    PasswordHashingOverloaded,
     create_access_token,
     decode_access_token
 )
@@ -119,6 +120,15 @@ async def signup(user_data: UserSignup):
             detail="Ce numéro de téléphone est déjà utilisé"
         )
     
+    # Hash du mot de passe hors de la boucle asyncio
+    try:
+        hashed_password = await get_password_hash_async(user_data.password)
+    except PasswordHashingOverloaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service momentanément surchargé, veuillez réessayer"
+        )
+    
     # Create user
     import uuid
     user_id = str(uuid.uuid4())
@@ -127,13 +137,15 @@ async def signup(user_data: UserSignup):
     new_user = {
         "id": user_id,
         "email": user_data.email.lower(),
-        "hashed_password": get_password_hash(user_data.password),
+        "hashed_password": hashed_password,
         "first_name": user_data.first_name,
         "last_name": user_data.last_name,
         "phone": user_data.phone,
         "role": UserRole.CLIENT.value,
         "is_active": True,
         "is_verified": False,
+        "orders_count": 0,
+        "total_spent": 0,
         "created_at": now,
         "updated_at": now
     }
@@ -171,8 +183,18 @@ async def login(user_data: UserLogin):
             detail="Email ou mot de passe incorrect"
         )
     
-    # Verify password
-    if not verify_password(user_data.password, user["hashed_password"]):
+    # Verify password (dans le pool de hachage, pas sur la boucle asyncio)
+    try:
+        valid, new_hash = await verify_and_update_password_async(
+            user_data.password, user.get("hashed_password", "")
+        )
+    except PasswordHashingOverloaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service momentanément surchargé, veuillez réessayer"
+        )
+    
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou mot de passe incorrect"
@@ -185,6 +207,13 @@ async def login(user_data: UserLogin):
             detail="Compte désactivé"
         )
     
+    # Ré-hachage transparent des anciens hash SHA-256 (comptes actifs uniquement)
+    if new_hash:
+        await db.users.update_one(
+            {"id": user["id"], "hashed_password": user["hashed_password"]},
+            {"$set": {"hashed_password": new_hash, "updated_at": datetime.now(timezone.utc)}}
+        )
+    
     # Create access token
     access_token = create_access_token(data={"sub": user["id"]})
     
@@ -1,7 +1,224 @@
-"""Cart routes."""
-from fastapi import APIRouter
+"""Cart routes - server-side cart kept in memory and flushed to MongoDB in batches."""
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from pydantic import BaseModel, Field
+from typing import List
+
+from app.db.connection import get_database
+from app.api.routes.auth import get_current_user
+from app.services.catalog import catalog
+from app.services.carts import CART_MAX_QUANTITY, cart_store
+from app.services.checkout import compute_order_totals
+from app.services.copurchases import copurchases
 
 router = APIRouter()
 
-# Placeholder for cart routes
 
+# Schemas
+class CartItemAdd(BaseModel):
+    product_id: str
+    quantity: int = Field(1, ge=1)
+
+
+class CartItemUpdate(BaseModel):
+    quantity: int = Field(..., ge=0)  # 0 = retirer l'article
+
+
+class CartMerge(BaseModel):
+    items: List[CartItemAdd] = []
+
+
+def _available_quantity(product: dict) -> int:
+    """Maximum quantity a cart line may hold for this product."""
+    if not product.get("in_stock", True):
+        return 0
+    stock = product.get("quantity")
+    return CART_MAX_QUANTITY if stock is None else min(stock, CART_MAX_QUANTITY)
+
+
+def _checked_product(product_id: str, quantity: int) -> dict:
+    """Return the catalog product, or raise when it is unknown or not available in that quantity."""
+    product = catalog.get_product(product_id)
+    if product is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Produit non trouvé"
+        )
+    available = _available_quantity(product)
+    if available == 0:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Produit en rupture de stock"
+        )
+    if quantity > available:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Stock insuffisant : {available} disponible(s) au maximum"
+        )
+    return product
+
+
+def _cart_response(entry) -> dict:
+    """Price the cart with current catalog prices and flag unavailable lines."""
+    items = []
+    warnings = []
+    subtotal = 0
+    for product_id, quantity in entry.items.items():
+        product = catalog.get_product(product_id)
+        if product is None:
+            warnings.append(f"Produit retiré du catalogue : {product_id}")
+            continue
+        available = _available_quantity(product)
+        unit_price = int(product.get("price_tnd") or 0)
+        line = {
+            "id": product_id,
+            "product_id": product_id,
+            "name": product.get("name"),
+            "brand": product.get("brand"),
+            "image_url": product.get("image_url"),
+            "price_tnd": unit_price,
+            "original_price_tnd": product.get("original_price_tnd", unit_price),
+            "discount_percentage": product.get("discount_percentage", 0),
+            "in_stock": available > 0,
+            "available_quantity": available,
+            "quantity": quantity,
+            "total_price_tnd": unit_price * quantity,
+        }
+        if quantity > available:
+            warnings.append(f"{product.get('name')} : {available} disponible(s) seulement")
+        else:
+            subtotal += unit_price * quantity
+        items.append(line)
+
+    return {
+        "items": items,
+        "count": sum(line["quantity"] for line in items),
+        **compute_order_totals(subtotal),
+        "warnings": warnings,
+    }
+
+
+@router.get("/cart")
+async def get_cart(current_user: dict = Depends(get_current_user)):
+    """Get the current user's cart, priced from the catalog."""
+    db = await get_database()
+    entry = await cart_store.get(db, current_user["id"])
+    return _cart_response(entry)
+
+
+@router.get("/cart/recommendations")
+async def get_cart_recommendations(
+    limit: int = Query(4, ge=1, le=12),
+    current_user: dict = Depends(get_current_user)
+):
+    """Products frequently bought with the cart's items."""
+    db = await get_database()
+    entry = await cart_store.get(db, current_user["id"])
+    
+    recommendations = []
+    for product_id, count in copurchases.basket_complements(list(entry.items)):
+        product = catalog.get_product(product_id)
+        if product is None or _available_quantity(product) == 0:
+            continue
+        recommendations.append({
+            "id": product_id,
+            "name": product.get("name"),
+            "brand": product.get("brand"),
+            "image_url": product.get("image_url"),
+            "price_tnd": product.get("price_tnd", 0),
+            "original_price_tnd": product.get("original_price_tnd", product.get("price_tnd", 0)),
+            "discount_percentage": product.get("discount_percentage", 0),
+            "bought_together_count": count,
+        })
+        if len(recommendations) == limit:
+            break
+    
+    return recommendations
+
+
+@router.post("/cart/items")
+async def add_to_cart(data: CartItemAdd, current_user: dict = Depends(get_current_user)):
+    """Add a product to the cart (quantities add up)."""
+    db = await get_database()
+    entry = await cart_store.get(db, current_user["id"])
+    
+    quantity = entry.items.get(data.product_id, 0) + data.quantity
+    _checked_product(data.product_id, quantity)
+    entry.items[data.product_id] = quantity
+    entry.touch()
+    
+    return _cart_response(entry)
+
+
+@router.put("/cart/items/{product_id}")
+async def update_cart_item(product_id: str, data: CartItemUpdate, current_user: dict = Depends(get_current_user)):
+    """Set the quantity of a cart line (0 removes it)."""
+    db = await get_database()
+    entry = await cart_store.get(db, current_user["id"])
+    
+    if product_id not in entry.items:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Article absent du panier"
+        )
+    if data.quantity == 0:
+        del entry.items[product_id]
+    else:
+        _checked_product(product_id, data.quantity)
+        entry.items[product_id] = data.quantity
+    entry.touch()
+    
+    return _cart_response(entry)
+
+
+@router.delete("/cart/items/{product_id}")
+async def remove_from_cart(product_id: str, current_user: dict = Depends(get_current_user)):
+    """Remove a product from the cart."""
+    db = await get_database()
+    entry = await cart_store.get(db, current_user["id"])
+    
+    if entry.items.pop(product_id, None) is not None:
+        entry.touch()
+    
+    return _cart_response(entry)
+
+
+@router.delete("/cart")
+async def clear_cart(current_user: dict = Depends(get_current_user)):
+    """Empty the cart."""
+    db = await get_database()
+    entry = await cart_store.get(db, current_user["id"])
+    
+    if entry.items:
+        entry.items.clear()
+        entry.touch()
+    
+    return _cart_response(entry)
+
+
+@router.post("/cart/merge")
+async def merge_cart(data: CartMerge, current_user: dict = Depends(get_current_user)):
+    """Merge the guest cart (localStorage) into the user's cart at login.
+
+    The larger quantity wins for products in both carts, so merging the same
+    guest cart twice does not double it; unknown or unavailable products are
+    skipped and quantities are capped to the available stock.
+    """
+    db = await get_database()
+    entry = await cart_store.get(db, current_user["id"])
+    
+    skipped = []
+    for item in data.items:
+        product = catalog.get_product(item.product_id)
+        available = _available_quantity(product) if product else 0
+        if available == 0:
+            skipped.append(item.product_id)
+            continue
+        quantity = min(max(entry.items.get(item.product_id, 0), item.quantity), available)
+        if entry.items.get(item.product_id) != quantity:
+            entry.items[item.product_id] = quantity
+            entry.touch()
+    
+    response = _cart_response(entry)
+    if skipped:
+        response["warnings"].append(f"{len(skipped)} article(s) indisponible(s) non ajouté(s)")
+    return response
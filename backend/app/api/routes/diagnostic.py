@@ -1,7 +1,52 @@
 """Diagnostic routes."""
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from app.services.diagnostic import (
+    CONCERNS,
+    ROUTINES,
+    SKIN_TYPES,
+    diagnostic_engine,
+    questionnaire,
+)
 
 router = APIRouter()
 
-# Placeholder for diagnostic routes
 
+# Schemas
+class DiagnosticAnswers(BaseModel):
+    skin_type: str
+    concerns: List[str] = Field(default_factory=list, max_length=len(CONCERNS))
+    routine: str = "complete"
+    budget_max_tnd: Optional[int] = Field(None, gt=0)
+
+
+@router.get("/diagnostic/questions")
+async def get_diagnostic_questions():
+    """Questions du diagnostic de peau"""
+    return questionnaire()
+
+
+@router.post("/diagnostic")
+async def run_diagnostic(answers: DiagnosticAnswers):
+    """Routine recommandée à partir des réponses au diagnostic"""
+    if answers.skin_type not in SKIN_TYPES:
+        raise HTTPException(status_code=400, detail=f"Type de peau invalide. Valeurs possibles: {', '.join(SKIN_TYPES)}")
+    unknown = [c for c in answers.concerns if c not in CONCERNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Préoccupation(s) inconnue(s): {', '.join(unknown)}")
+    if answers.routine not in ROUTINES:
+        raise HTTPException(status_code=400, detail=f"Routine invalide. Valeurs possibles: {', '.join(ROUTINES)}")
+
+    result = diagnostic_engine.recommend(
+        answers.skin_type,
+        list(dict.fromkeys(answers.concerns)),
+        answers.routine,
+        answers.budget_max_tnd,
+    )
+    return {
+        "skin_type": answers.skin_type,
+        "concerns": answers.concerns,
+        **result,
+    }
@@ -1,13 +1,24 @@
 """Order routes."""
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
 from pydantic import BaseModel
+from pymongo.errors import DuplicateKeyError
 from typing import List, Optional
 from datetime import datetime, timezone
 import uuid
 
 from app.db.connection import get_database
+from app.api.pagination import encode_cursor, decode_cursor, NEXT_CURSOR_HEADER
 from app.api.routes.auth import get_current_user
 from app.models.order import OrderStatus, PaymentMethod
+from app.services.checkout import resolve_order_items, compute_order_totals
+from app.services.inventory import reserve_stock, release_stock
+from app.services.order_numbers import allocate_order_number
+from app.services.sales_rollups import record_order_created
+from app.services.product_sales import record_product_sales
+from app.services.copurchases import record_order_pairs
+from app.services.client_stats import record_client_order
+from app.services.carts import clear_user_cart
+from app.services.order_status import transition_order, CLIENT_CANCELLABLE_STATUSES
 
 router = APIRouter(prefix="/api/orders", tags=["orders"])
 
@@ -15,11 +26,12 @@ router = APIRouter(prefix="/api/orders", tags=["orders"])
 # Schemas
 class OrderItemCreate(BaseModel):
     product_id: str
-    product_name: str
-    product_image: str
-    brand: str
     quantity: int
-    unit_price_tnd: int
+    # Informations envoyées par le client : ignorées, recalculées côté serveur
+    product_name: Optional[str] = None
+    product_image: Optional[str] = None
+    brand: Optional[str] = None
+    unit_price_tnd: Optional[int] = None
 
 
 class ShippingAddress(BaseModel):
@@ -51,13 +63,8 @@ class StatusUpdate(BaseModel):
     status: str
 
 
-# Helper function to generate order number
-def generate_order_number():
-    """Generate unique order number: ORD-YYYYMMDD-XXXX"""
-    now = datetime.now(timezone.utc)
-    date_part = now.strftime("%Y%m%d")
-    random_part = uuid.uuid4().hex[:4].upper()
-    return f"ORD-{date_part}-{random_part}"
+# Tentatives d'insertion si un numéro entre en collision avec un ancien numéro aléatoire
+ORDER_NUMBER_ATTEMPTS = 3
 
 
 # Routes
@@ -73,14 +80,14 @@ async def create_order(order_data: OrderCreate, current_user: dict = Depends(get
             detail="Le panier est vide"
         )
     
-    # Calculate totals
-    subtotal = sum(item.unit_price_tnd * item.quantity for item in order_data.items)
-    delivery_fee = 0 if subtotal >= 100 else 7
-    total = subtotal + delivery_fee
+    # Résoudre les produits (une seule requête $in) et calculer les totaux côté serveur
+    items, subtotal = await resolve_order_items(db, order_data.items)
+    totals = compute_order_totals(subtotal)
+    total = totals["total_tnd"]
     
     # Create order
     order_id = str(uuid.uuid4())
-    order_number = generate_order_number()
+    order_number = await allocate_order_number(db)
     now = datetime.now(timezone.utc)
     
     order = {
@@ -90,11 +97,9 @@ async def create_order(order_data: OrderCreate, current_user: dict = Depends(get
         "user_email": current_user["email"],
         "user_phone": current_user.get("phone", ""),
         "user_name": f"{current_user.get('first_name', '')} {current_user.get('last_name', '')}".strip(),
-        "items": [item.dict() for item in order_data.items],
-        "subtotal_tnd": subtotal,
-        "delivery_fee_tnd": delivery_fee,
-        "discount_tnd": 0,
-        "total_tnd": total,
+        "items": items,
+        "items_count": len(items),
+        **totals,
         "shipping_address": order_data.shipping_address.dict(),
         "delivery_notes": order_data.delivery_notes,
         "payment_method": order_data.payment_method,
@@ -112,7 +117,27 @@ async def create_order(order_data: OrderCreate, current_user: dict = Depends(get
         "delivered_at": None
     }
     
-    await db.orders.insert_one(order)
+    # Réserver le stock (une seule écriture groupée), puis enregistrer la commande
+    await reserve_stock(db, items)
+    try:
+        for attempt in range(ORDER_NUMBER_ATTEMPTS):
+            try:
+                await db.orders.insert_one(order)
+                break
+            except DuplicateKeyError:
+                if attempt == ORDER_NUMBER_ATTEMPTS - 1:
+                    raise
+                order_number = await allocate_order_number(db)
+                order["order_number"] = order_number
+    except Exception:
+        await release_stock(db, items)
+        raise
+    
+    await record_order_created(db, order)
+    await record_product_sales(db, order)
+    await record_order_pairs(db, order)
+    await record_client_order(db, order)
+    await clear_user_cart(db, current_user["id"])
     
     return OrderResponse(
         id=order_id,
@@ -124,25 +149,45 @@ async def create_order(order_data: OrderCreate, current_user: dict = Depends(get
 
 
 @router.get("/my-orders")
-async def get_my_orders(current_user: dict = Depends(get_current_user)):
+async def get_my_orders(
+    response: Response,
+    limit: int = Query(100, ge=1, le=100, description="Number of orders to return"),
+    cursor: Optional[str] = Query(None, description="Cursor returned in X-Next-Cursor"),
+    current_user: dict = Depends(get_current_user)
+):
     """Get current user's orders."""
     db = await get_database()
     
-    orders = await db.orders.find(
-        {"user_id": current_user["id"]}
-    ).sort("created_at", -1).to_list(100)
-    
-    return [
-        {
-            "id": order["id"],
-            "order_number": order["order_number"],
-            "status": order["status"],
-            "total_tnd": order["total_tnd"],
-            "items_count": len(order["items"]),
-            "created_at": order["created_at"]
-        }
-        for order in orders
-    ]
+    match = {"user_id": current_user["id"]}
+    if cursor:
+        # Pagination par curseur sur (created_at, id), servie par l'index user_id/created_at/id
+        after = decode_cursor(cursor, "created_at", "id")
+        match["$or"] = [
+            {"created_at": {"$lt": after["created_at"]}},
+            {"created_at": after["created_at"], "id": {"$lt": after["id"]}},
+        ]
+    
+    # Projection côté serveur : ni les articles, ni les adresses, ni l'historique
+    orders = await db.orders.aggregate([
+        {"$match": match},
+        {"$sort": {"created_at": -1, "id": -1}},
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0,
+            "id": 1,
+            "order_number": 1,
+            "status": 1,
+            "total_tnd": 1,
+            "items_count": {"$ifNull": ["$items_count", {"$size": {"$ifNull": ["$items", []]}}]},
+            "created_at": 1
+        }}
+    ]).to_list(limit)
+    
+    if len(orders) == limit:
+        last = orders[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"created_at": last["created_at"], "id": last["id"]})
+    
+    return orders
 
 
 @router.get("/{order_id}")
@@ -177,47 +222,15 @@ async def cancel_order(order_id: str, current_user: dict = Depends(get_current_u
     """Cancel an order (only if pending or confirmed)."""
     db = await get_database()
     
-    # Trouver la commande de l'utilisateur
-    order = await db.orders.find_one({
-        "id": order_id,
-        "user_id": current_user["id"]
-    })
-    
-    if not order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Commande non trouvée"
-        )
-    
-    # Vérifier si la commande peut être annulée
-    cancellable_statuses = [OrderStatus.PENDING.value, OrderStatus.CONFIRMED.value]
-    if order["status"] not in cancellable_statuses:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Cette commande ne peut plus être annulée. Elle est déjà en préparation ou livrée."
-        )
-    
-    now = datetime.now(timezone.utc)
-    
-    # Mettre à jour le statut
-    status_history = order.get("status_history", [])
-    status_history.append({
-        "status": OrderStatus.CANCELLED.value,
-        "changed_at": now,
-        "changed_by": "client"
-    })
-    
-    await db.orders.update_one(
-        {"id": order_id},
-        {
-            "$set": {
-                "status": OrderStatus.CANCELLED.value,
-                "status_history": status_history,
-                "updated_at": now,
-                "cancelled_at": now,
-                "cancelled_by": "client"
-            }
-        }
+    # Transition atomique, limitée aux commandes du client encore annulables
+    await transition_order(
+        db,
+        order_id,
+        OrderStatus.CANCELLED.value,
+        changed_by="client",
+        query={"user_id": current_user["id"]},
+        from_statuses=CLIENT_CANCELLABLE_STATUSES,
+        error_detail="Cette commande ne peut plus être annulée. Elle est déjà en préparation ou livrée."
     )
     
     return {"message": "Commande annulée avec succès", "status": OrderStatus.CANCELLED.value}
@@ -239,52 +252,11 @@ async def update_order_status(
             detail="Accès non autorisé"
         )
     
-    # Trouver la commande
-    order = await db.orders.find_one({"id": order_id})
-    
-    if not order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Commande non trouvée"
-        )
-    
-    # Valider le nouveau statut
-    valid_statuses = [s.value for s in OrderStatus]
-    if status_data.status not in valid_statuses:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Statut invalide. Statuts valides: {valid_statuses}"
-        )
-    
-    now = datetime.now(timezone.utc)
-    
-    # Préparer les mises à jour
-    updates = {
-        "status": status_data.status,
-        "updated_at": now
-    }
-    
-    # Ajouter des timestamps spécifiques selon le statut
-    if status_data.status == OrderStatus.CONFIRMED.value:
-        updates["confirmed_at"] = now
-    elif status_data.status == OrderStatus.DELIVERED.value:
-        updates["delivered_at"] = now
-    elif status_data.status == OrderStatus.CANCELLED.value:
-        updates["cancelled_at"] = now
-        updates["cancelled_by"] = "admin"
-    
-    # Ajouter à l'historique
-    status_history = order.get("status_history", [])
-    status_history.append({
-        "status": status_data.status,
-        "changed_at": now,
-        "changed_by": f"admin:{current_user['email']}"
-    })
-    updates["status_history"] = status_history
-    
-    await db.orders.update_one(
-        {"id": order_id},
-        {"$set": updates}
+    await transition_order(
+        db,
+        order_id,
+        status_data.status,
+        changed_by=f"admin:{current_user['email']}"
     )
     
     return {
@@ -3,18 +3,26 @@ from fastapi import APIRouter, HTTPException, Query
 from typing import List, Optional
 from pymongo import MongoClient
 from pathlib import Path
-import json
-import unicodedata
 from difflib import SequenceMatcher
+from app.db.monitoring import mongo_listeners, register_client
 from app.models.product import Product
 from app.schemas.product import ProductListResponse, BrandWithCount, CategoryWithCount
+from app.services.catalog import catalog, normalize_text
+from app.services.catalog_snapshot import load_catalog_data
+from app.services.copurchases import copurchases
+from app.services.reviews import initial_rating_aggregates
+from app.services.similarity import similar_products
 
 router = APIRouter()
 
 # Connexion MongoDB synchrone
-mongo_client = MongoClient("mongodb://localhost:27017")
+mongo_client = MongoClient("mongodb://localhost:27017", event_listeners=mongo_listeners("sync"))
+register_client("sync", mongo_client)
 db = mongo_client.kbeauty
 
+# Catalogue en mémoire pour la recherche, les suggestions et "vouliez-vous dire"
+catalog.set_loader(lambda: list(db.products.find({}, {"_id": 0})))
+
 
 # ============================================
 # MAPPINGS STRICTS
@@ -149,16 +157,6 @@ BRAND_MAPPINGS = {
 }
 
 
-def normalize_text(text):
-    """Retire les accents d'un texte."""
-    if not text:
-        return ""
-    return ''.join(
-        c for c in unicodedata.normalize('NFD', text)
-        if unicodedata.category(c) != 'Mn'
-    ).lower()
-
-
 def get_category_match(search_term):
     """Retourne la catégorie MongoDB si le terme correspond à une catégorie."""
     normalized = normalize_text(search_term)
@@ -299,6 +297,48 @@ def get_search_suggestions(search_term, all_products):
     return suggestions, list(brands), list(categories)
 
 
+def filter_catalog(products, brand=None, category=None, min_price=None, max_price=None):
+    """Apply the list filters to in-memory products (same semantics as the MongoDB query)."""
+    brand_lower = brand.lower() if brand else None
+    category_lower = category.lower() if category else None
+    results = []
+    for p in products:
+        if brand_lower and (p.get('brand') or '').lower() != brand_lower:
+            continue
+        if category_lower and (p.get('category') or '').lower() != category_lower:
+            continue
+        price = p.get('price_tnd')
+        if min_price is not None and (price is None or price < min_price):
+            continue
+        if max_price is not None and (price is None or price > max_price):
+            continue
+        results.append(p)
+    return results
+
+
+def _product_model(p):
+    """Product model of a cached catalog document (recommendation lists)."""
+    return Product(
+        id=p.get("id"),
+        name=p.get("name"),
+        brand=p.get("brand"),
+        category=p.get("category"),
+        price_tnd=p.get("price_tnd", 0),
+        price=p.get("price_tnd", 0),
+        original_price_tnd=p.get("original_price_tnd", p.get("price_tnd", 0)),
+        original_price=p.get("original_price_tnd", p.get("price_tnd", 0)),
+        discount_percentage=p.get("discount_percentage", 0),
+        description=p.get("description", ""),
+        image_url=p.get("image_url", "/images/products/placeholder.png"),
+        volume=p.get("format") or p.get("volume", ""),
+        in_stock=p.get("in_stock", True),
+        is_new=p.get("is_new", False),
+        is_bestseller=p.get("is_bestseller", False),
+        rating=p.get("rating"),
+        review_count=p.get("review_count", 0),
+    )
+
+
 def load_products_from_json():
     """Load products from JSON file into MongoDB if collection is empty."""
     count = db.products.count_documents({})
@@ -310,8 +350,8 @@ def load_products_from_json():
             print(f"⚠️  JSON file not found at: {json_path}")
             return 0
         
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # Lecture via le snapshot binaire (compilé au besoin), sinon le JSON
+        data = load_catalog_data(json_path)
         
         products = data.get('products', [])
         
@@ -335,8 +375,7 @@ def load_products_from_json():
                     "in_stock": p.get("in_stock", True),
                     "is_new": p.get("is_new", False),
                     "is_bestseller": p.get("is_bestseller", False),
-                    "rating": p.get("rating"),
-                    "review_count": p.get("review_count", 0),
+                    **initial_rating_aggregates(p.get("rating"), p.get("review_count", 0)),
                     "description": p.get("description", ""),
                     "description_short": p.get("description_short", ""),
                     "created_at": p.get("created_at"),
@@ -345,6 +384,7 @@ def load_products_from_json():
                 docs.append(doc)
             
             db.products.insert_many(docs)
+            catalog.invalidate()
             count = len(docs)
             print(f"✅ Imported {count} products from JSON into MongoDB")
         else:
@@ -390,8 +430,8 @@ async def get_products(
     
     # Si recherche, utiliser le système STRICT
     if search:
-        # Récupérer tous les produits de base
-        base_products = list(db.products.find(query))
+        # Filtrer le catalogue en mémoire plutôt que relire toute la collection
+        base_products = filter_catalog(catalog.get_products(), brand, category, min_price, max_price)
         
         # Appliquer la recherche stricte
         filtered_products = search_products_strict(search, base_products)
@@ -474,7 +514,7 @@ async def get_suggestions(
 ):
     """Get search suggestions for autocomplete."""
     
-    all_products = list(db.products.find({}))
+    all_products = catalog.get_products()
     suggestions, brands, categories = get_search_suggestions(q, all_products)
     
     return {
@@ -506,7 +546,7 @@ async def did_you_mean(
             suggestions.append((brand, ratio))
     
     # Chercher dans les noms de produits
-    all_products = list(db.products.find({}, {"name": 1, "brand": 1}))
+    all_products = catalog.get_products()
     for product in all_products:
         name = product.get('name', '')
         for word in name.split():
@@ -568,6 +608,48 @@ async def get_bestsellers(
     return product_models
 
 
+@router.get("/products/{product_id}/frequently-bought-together", response_model=List[Product])
+async def get_frequently_bought_together(
+    product_id: str,
+    limit: int = Query(4, ge=1, le=12, description="Number of products to return")
+):
+    """Produits souvent achetés avec ce produit (table de co-achats précalculée)."""
+    if catalog.get_product(product_id) is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    product_models = []
+    for other_id, _ in copurchases.complements(product_id):
+        p = catalog.get_product(other_id)
+        if p is None or not p.get("in_stock", True):
+            continue
+        product_models.append(_product_model(p))
+        if len(product_models) == limit:
+            break
+    
+    return product_models
+
+
+@router.get("/products/{product_id}/similar", response_model=List[Product])
+async def get_similar_products(
+    product_id: str,
+    limit: int = Query(8, ge=1, le=12, description="Number of products to return")
+):
+    """Produits similaires (voisins TF-IDF précalculés)."""
+    if catalog.get_product(product_id) is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    product_models = []
+    for other_id, _ in similar_products.similar(product_id):
+        p = catalog.get_product(other_id)
+        if p is None or not p.get("in_stock", True):
+            continue
+        product_models.append(_product_model(p))
+        if len(product_models) == limit:
+            break
+    
+    return product_models
+
+
 @router.get("/products/{product_id}", response_model=Product)
 async def get_product(product_id: str):
     """Get a single product by ID from MongoDB."""
@@ -595,6 +677,7 @@ async def get_product(product_id: str):
         "is_bestseller": p.get("is_bestseller", False),
         "rating": p.get("rating"),
         "review_count": p.get("review_count", 0),
+        "rating_histogram": p.get("rating_histogram"),
     }
     
     return Product(**product_data)
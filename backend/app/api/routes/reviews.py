@@ -1,7 +1,161 @@
 """Review routes."""
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
+from pydantic import BaseModel, Field
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from typing import Optional
+from datetime import datetime, timezone
+import uuid
+
+from app.db.connection import get_database
+from app.api.pagination import encode_cursor, decode_cursor, NEXT_CURSOR_HEADER
+from app.api.routes.auth import get_current_user
+from app.models.order import OrderStatus
+from app.services.reviews import (
+    APPROVED,
+    PENDING,
+    REVIEW_PUBLIC_PROJECTION,
+    REVIEWS_REQUIRE_MODERATION,
+    apply_rating_change,
+    counted_rating,
+)
 
 router = APIRouter()
 
-# Placeholder for review routes
 
+# Schemas
+class ReviewCreate(BaseModel):
+    rating: int = Field(..., ge=1, le=5)
+    title: Optional[str] = Field(None, max_length=120)
+    comment: Optional[str] = Field(None, max_length=2000)
+
+
+class ReviewUpdate(BaseModel):
+    rating: Optional[int] = Field(None, ge=1, le=5)
+    title: Optional[str] = Field(None, max_length=120)
+    comment: Optional[str] = Field(None, max_length=2000)
+
+
+@router.get("/products/{product_id}/reviews")
+async def get_product_reviews(
+    product_id: str,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100, description="Number of reviews to return"),
+    cursor: Optional[str] = Query(None, description="Cursor returned in X-Next-Cursor"),
+):
+    """Get the published reviews of a product, most recent first."""
+    db = await get_database()
+    
+    query = {"product_id": product_id, "status": APPROVED}
+    if cursor:
+        # Pagination par curseur sur (created_at, id), servie par l'index product_id/status/created_at/id
+        after = decode_cursor(cursor, "created_at", "id")
+        query["$or"] = [
+            {"created_at": {"$lt": after["created_at"]}},
+            {"created_at": after["created_at"], "id": {"$lt": after["id"]}},
+        ]
+    
+    reviews = await db.reviews.find(query, REVIEW_PUBLIC_PROJECTION).sort(
+        [("created_at", -1), ("id", -1)]
+    ).limit(limit).to_list(limit)
+    
+    if len(reviews) == limit:
+        last = reviews[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"created_at": last["created_at"], "id": last["id"]})
+    
+    return reviews
+
+
+@router.post("/products/{product_id}/reviews", status_code=status.HTTP_201_CREATED)
+async def create_review(product_id: str, data: ReviewCreate, current_user: dict = Depends(get_current_user)):
+    """Review a product (one review per user and product)."""
+    db = await get_database()
+    
+    if not await db.products.find_one({"id": product_id}, {"_id": 1}):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Produit non trouvé"
+        )
+    
+    # Achat vérifié : une commande livrée contenant le produit
+    verified = await db.orders.find_one({
+        "user_id": current_user["id"],
+        "status": OrderStatus.DELIVERED.value,
+        "items.product_id": product_id,
+    }, {"_id": 1}) is not None
+    
+    now = datetime.now(timezone.utc)
+    review = {
+        "id": str(uuid.uuid4()),
+        "product_id": product_id,
+        "user_id": current_user["id"],
+        "user_name": f"{current_user.get('first_name', '')} {current_user.get('last_name', '')[:1]}.".strip(),
+        "rating": data.rating,
+        "title": data.title,
+        "comment": data.comment,
+        "verified_purchase": verified,
+        "status": PENDING if REVIEWS_REQUIRE_MODERATION else APPROVED,
+        "created_at": now,
+        "updated_at": now,
+    }
+    try:
+        await db.reviews.insert_one(review)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Vous avez déjà donné votre avis sur ce produit"
+        )
+    
+    await apply_rating_change(db, product_id, None, counted_rating(review))
+    
+    review.pop("_id", None)
+    return review
+
+
+@router.put("/reviews/{review_id}")
+async def update_review(review_id: str, data: ReviewUpdate, current_user: dict = Depends(get_current_user)):
+    """Edit one's own review; with moderation enabled it goes back to the queue."""
+    db = await get_database()
+    
+    updates = data.model_dump(exclude_none=True)
+    updates["updated_at"] = datetime.now(timezone.utc)
+    if REVIEWS_REQUIRE_MODERATION:
+        updates["status"] = PENDING
+    
+    previous = await db.reviews.find_one_and_update(
+        {"id": review_id, "user_id": current_user["id"]},
+        {"$set": updates},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+    if not previous:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Avis non trouvé"
+        )
+    
+    review = {**previous, **updates}
+    await apply_rating_change(db, review["product_id"], counted_rating(previous), counted_rating(review))
+    
+    return review
+
+
+@router.delete("/reviews/{review_id}")
+async def delete_review(review_id: str, current_user: dict = Depends(get_current_user)):
+    """Delete one's own review (admins can delete any review)."""
+    db = await get_database()
+    
+    query = {"id": review_id}
+    if current_user.get("role") != "admin":
+        query["user_id"] = current_user["id"]
+    
+    review = await db.reviews.find_one_and_delete(query, {"_id": 0, "product_id": 1, "rating": 1, "status": 1})
+    if not review:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Avis non trouvé"
+        )
+    
+    await apply_rating_change(db, review["product_id"], counted_rating(review), None)
+    
+    return {"message": "Avis supprimé"}
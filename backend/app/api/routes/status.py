@@ -1,9 +1,8 @@
 """Status check routes."""
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.models.status_check import StatusCheck, StatusCheckCreate
 from app.api.deps import get_db
-from datetime import datetime
 from typing import List
 
 router = APIRouter()
@@ -30,15 +29,9 @@ async def create_status_check(input: StatusCheckCreate, db: AsyncIOMotorDatabase
 
 
 @router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks(db: AsyncIOMotorDatabase = Depends(get_db)):
-    """Get all status checks."""
-    # Exclude MongoDB's _id field from the query results
-    status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
-    
-    # Convert ISO string timestamps back to datetime objects
-    for check in status_checks:
-        if isinstance(check['timestamp'], str):
-            check['timestamp'] = datetime.fromisoformat(check['timestamp'])
-    
-    return status_checks
-
+async def get_status_checks(
+    limit: int = Query(100, ge=1, le=1000, description="Number of status checks to return"),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get the latest status checks (ISO timestamps are parsed by the response model)."""
+    return await db.status_checks.find({}, {"_id": 0}).sort("timestamp", -1).limit(limit).to_list(limit)
@@ -10,6 +10,9 @@ load_dotenv(ROOT_DIR / '.env')
 MONGO_URL = os.environ.get('MONGO_URL') or os.environ.get('MONGO_URI')
 DB_NAME = os.environ.get('DB_NAME', 'kbeauty')  # Valeur par défaut 'kbeauty'
 
+# Paniers inactifs supprimés par l'index TTL (app/db/indexes.py)
+CART_TTL_DAYS = int(os.environ.get('CART_TTL_DAYS', '30'))
+
 # CORS configuration
 CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
 
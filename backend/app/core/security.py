@@ -1,27 +1,129 @@
 """Security utilities for authentication."""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
+from passlib.context import CryptContext
+import asyncio
+import base64
 import hashlib
+import hmac
+import json
 import os
+import time
 
 # Configuration JWT
 SECRET_KEY = os.environ.get("SECRET_KEY", "k-beauty-secret-key-change-in-production-2026")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 jours
 
+# Backend de vérification : "jose" (défaut) ou "hmac" (vérification HS256 directe, plus rapide)
+JWT_BACKEND = os.environ.get("JWT_BACKEND", "jose").lower()
+
+# Cache des tokens déjà vérifiés (clé = empreinte SHA-256 du token)
+TOKEN_CACHE_MAX_SIZE = int(os.environ.get("TOKEN_CACHE_MAX_SIZE", "10000"))
+
+# Hachage des mots de passe : le premier schéma sert aux nouveaux hash,
+# les suivants sont encore acceptés mais ré-hachés à la connexion
+PASSWORD_SCHEMES = [s.strip() for s in os.environ.get("PASSWORD_SCHEMES", "bcrypt").split(",") if s.strip()]
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+
+# Pool de threads dédié au hachage (bcrypt bloquerait la boucle asyncio)
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+_SECRET_BYTES = SECRET_KEY.encode()
+_token_cache: "OrderedDict[bytes, tuple]" = OrderedDict()
+
+pwd_context = CryptContext(schemes=PASSWORD_SCHEMES, deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_stats = {"pending": 0, "completed": 0, "rejected": 0}
+
+
+class PasswordHashingOverloaded(Exception):
+    """Raised when the password hashing queue is full."""
+
+
+def _legacy_sha256(password: str) -> str:
+    """Legacy hash: single SHA-256 salted with SECRET_KEY."""
+    return hashlib.sha256((password + SECRET_KEY).encode()).hexdigest()
+
+
+def _is_legacy_hash(hashed_password: str) -> bool:
+    """Legacy hashes are 64 hex characters, with no scheme prefix."""
+    if len(hashed_password) != 64:
+        return False
+    try:
+        int(hashed_password, 16)
+    except ValueError:
+        return False
+    return True
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password and return a new hash when the stored one is outdated."""
+    if not hashed_password:
+        return False, None
+    if _is_legacy_hash(hashed_password):
+        if hmac.compare_digest(_legacy_sha256(plain_password), hashed_password):
+            return True, pwd_context.hash(plain_password)
+        return False, None
+    try:
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    except ValueError:
+        # Hash dans un format inconnu
+        return False, None
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash."""
-    # Utiliser SHA256 + salt (plus simple et compatible)
-    password_hash = hashlib.sha256((plain_password + SECRET_KEY).encode()).hexdigest()
-    return password_hash == hashed_password
+    valid, _ = verify_and_update_password(plain_password, hashed_password)
+    return valid
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password."""
-    # Utiliser SHA256 + salt (plus simple et compatible)
-    return hashlib.sha256((password + SECRET_KEY).encode()).hexdigest()
+    return pwd_context.hash(password)
+
+
+async def _run_in_hash_pool(func, *args):
+    """Run a hashing function in the bounded pool, rejecting work when the queue is full."""
+    if _hash_stats["pending"] >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+        _hash_stats["rejected"] += 1
+        raise PasswordHashingOverloaded()
+
+    _hash_stats["pending"] += 1
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_stats["pending"] -= 1
+    _hash_stats["completed"] += 1
+    return result
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop."""
+    return await _run_in_hash_pool(get_password_hash, password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password (and compute its rehash) without blocking the event loop."""
+    return await _run_in_hash_pool(verify_and_update_password, plain_password, hashed_password)
+
+
+def password_hashing_stats() -> dict:
+    """Return the current state of the password hashing pool."""
+    pending = _hash_stats["pending"]
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_queue": PASSWORD_HASH_MAX_QUEUE,
+        "in_flight": min(pending, PASSWORD_HASH_WORKERS),
+        "queue_depth": max(0, pending - PASSWORD_HASH_WORKERS),
+        "completed": _hash_stats["completed"],
+        "rejected": _hash_stats["rejected"],
+    }
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -36,10 +138,76 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def decode_access_token(token: str) -> Optional[dict]:
-    """Decode and verify a JWT access token."""
+def _b64url_decode(segment: str) -> bytes:
+    """Decode a base64url segment without padding."""
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _decode_hs256(token: str) -> Optional[dict]:
+    """Verify an HS256 token with hmac directly, without going through python-jose."""
+    try:
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        signature = _b64url_decode(signature_b64)
+        expected = hmac.new(_SECRET_BYTES, f"{header_b64}.{payload_b64}".encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, signature):
+            return None
+        header = json.loads(_b64url_decode(header_b64))
+        payload = json.loads(_b64url_decode(payload_b64))
+    except (ValueError, TypeError):
+        return None
+
+    if not isinstance(header, dict) or header.get("alg") != ALGORITHM or not isinstance(payload, dict):
+        return None
+
+    now = time.time()
+    exp = payload.get("exp")
+    if exp is not None and (not isinstance(exp, (int, float)) or exp <= now):
+        return None
+    nbf = payload.get("nbf")
+    if nbf is not None and (not isinstance(nbf, (int, float)) or nbf > now):
+        return None
+    return payload
+
+
+def _verify_token(token: str) -> Optional[dict]:
+    """Run the full signature and claims verification with the configured backend."""
+    if JWT_BACKEND == "hmac":
+        return _decode_hs256(token)
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """Decode and verify a JWT access token."""
+    key = hashlib.sha256(token.encode()).digest()
+    now = time.time()
+
+    cached = _token_cache.get(key)
+    if cached is not None:
+        payload, exp = cached
+        if exp > now:
+            _token_cache.move_to_end(key)
+            return dict(payload)
+        # Token expiré : on le retire du cache
+        del _token_cache[key]
+        return None
+
+    payload = _verify_token(token)
+    if payload is None:
+        return None
+
+    # On ne met en cache que les tokens qui expirent (tous ceux émis par create_access_token)
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)) and TOKEN_CACHE_MAX_SIZE > 0:
+        _token_cache[key] = (payload, float(exp))
+        if len(_token_cache) > TOKEN_CACHE_MAX_SIZE:
+            _token_cache.popitem(last=False)
+
+    return dict(payload)
+
+
+def clear_token_cache() -> None:
+    """Drop every cached token verification."""
+    _token_cache.clear()
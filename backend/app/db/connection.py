@@ -3,6 +3,8 @@ from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 
+from app.db.monitoring import mongo_listeners, register_client
+
 logger = logging.getLogger(__name__)
 
 # Configuration directe (fallback si .env ne fonctionne pas)
@@ -18,7 +20,8 @@ async def get_database():
     """Get database instance."""
     global client, db
     if client is None:
-        client = AsyncIOMotorClient(MONGO_URL)
+        client = AsyncIOMotorClient(MONGO_URL, event_listeners=mongo_listeners("motor"))
+        register_client("motor", client)
         db = client[DB_NAME]
         logger.info(f"Database connection established to {DB_NAME}")
     return db
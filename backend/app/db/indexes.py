@@ -0,0 +1,116 @@
+"""MongoDB index definitions, created at startup."""
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+from typing import List
+import logging
+
+from app.core.config import CART_TTL_DAYS
+
+logger = logging.getLogger(__name__)
+
+# collection -> liste de (clés, options)
+INDEXES = {
+    "products": [
+        # Obligatoire : la réservation de stock suppose un seul document par "id"
+        ([("id", ASCENDING)], {"unique": True, "name": "id_unique"}),
+        # Filtres de la grille produits admin
+        ([("brand", ASCENDING)], {"name": "brand"}),
+        ([("category", ASCENDING)], {"name": "category"}),
+        # Top ventes (dashboard, bestsellers automatiques)
+        ([("sold_quantity", DESCENDING)], {"name": "sold_quantity"}),
+        ([("sales_7d", DESCENDING)], {"name": "sales_7d"}),
+        ([("sales_30d", DESCENDING)], {"name": "sales_30d"}),
+    ],
+    "orders": [
+        ([("id", ASCENDING)], {"unique": True, "name": "id_unique"}),
+        ([("order_number", ASCENDING)], {"unique": True, "name": "order_number_unique"}),
+        # Historique client (my-orders) paginé par curseur
+        (
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            {"name": "user_created_at"}
+        ),
+        # Exports et listes admin filtrés par période et statut
+        ([("created_at", ASCENDING)], {"name": "created_at"}),
+        ([("status", ASCENDING), ("created_at", ASCENDING)], {"name": "status_created_at"}),
+    ],
+    "users": [
+        ([("role", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {"name": "role_created_at"}),
+        # Liste admin des clients triée par statistique (compteurs précalculés)
+        ([("role", ASCENDING), ("total_spent", DESCENDING), ("id", DESCENDING)], {"name": "role_total_spent"}),
+        ([("role", ASCENDING), ("orders_count", DESCENDING), ("id", DESCENDING)], {"name": "role_orders_count"}),
+    ],
+    "sales_daily": [
+        ([("day", ASCENDING)], {"name": "day"}),
+    ],
+    "product_sales_daily": [
+        ([("day", ASCENDING)], {"name": "day"}),
+    ],
+    "product_pairs": [
+        # Rechargement de la table des co-achats
+        ([("count", ASCENDING)], {"name": "count"}),
+    ],
+    "status_checks": [
+        ([("timestamp", DESCENDING)], {"name": "timestamp"}),
+    ],
+    "carts": [
+        # Paniers inactifs supprimés automatiquement
+        ([("updated_at", ASCENDING)], {"name": "updated_at_ttl", "expireAfterSeconds": CART_TTL_DAYS * 86400}),
+    ],
+    "reviews": [
+        ([("id", ASCENDING)], {"unique": True, "name": "id_unique"}),
+        # Un avis par client et par produit
+        ([("product_id", ASCENDING), ("user_id", ASCENDING)], {"unique": True, "name": "product_user_unique"}),
+        # Avis publiés d'un produit, paginés par curseur
+        (
+            [("product_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            {"name": "product_status_created_at"}
+        ),
+        # File de modération
+        ([("status", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], {"name": "status_created_at"}),
+    ],
+    "promotions": [
+        ([("id", ASCENDING)], {"unique": True, "name": "id_unique"}),
+        # Prochaines échéances du planificateur de promotions
+        ([("status", ASCENDING), ("start_date", ASCENDING)], {"name": "status_start_date"}),
+        ([("status", ASCENDING), ("end_date", ASCENDING)], {"name": "status_end_date"}),
+    ],
+}
+
+# Index qui ne servent plus, supprimés au démarrage (collection -> noms)
+OBSOLETE_INDEXES = {
+    # Remplacé par les compteurs précalculés des clients (users.orders_count / total_spent)
+    "orders": ["user_status_total"],
+}
+
+
+async def ensure_indexes(db) -> List[dict]:
+    """Create every index declared in INDEXES (no-op when they already exist)
+    and drop the ones listed in OBSOLETE_INDEXES.
+
+    Returns the indexes that could not be created; a failed unique index
+    is flagged "required": the data no longer has the guarantee it gives.
+    """
+    for collection, names in OBSOLETE_INDEXES.items():
+        existing = await db[collection].index_information()
+        for name in names:
+            if name in existing:
+                try:
+                    await db[collection].drop_index(name)
+                    logger.info(f"🗑️  Obsolete index {collection}.{name} dropped")
+                except PyMongoError as e:
+                    logger.warning(f"⚠️  Obsolete index {collection}.{name} could not be dropped: {e}")
+    
+    failures = []
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                await db[collection].create_index(keys, **options)
+            except PyMongoError as e:
+                logger.error(f"❌ Index {collection}.{options.get('name', keys)} could not be created: {e}")
+                failures.append({
+                    "collection": collection,
+                    "index": options.get("name", str(keys)),
+                    "required": bool(options.get("unique")),
+                    "error": str(e),
+                })
+    return failures
@@ -0,0 +1,147 @@
+"""MongoDB client registry, connection pool (CMAP) and command monitoring."""
+from pymongo import monitoring
+from typing import Dict
+import threading
+
+from app.core.metrics import registry
+
+# Taille de pool par défaut de pymongo (maxPoolSize non précisé)
+DEFAULT_MAX_POOL_SIZE = 100
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Per-server connection counts of one client's pools.
+
+    Events come from the driver's threads (sync client) or the event loop
+    (Motor), so counters are updated under a lock; handlers only do a few
+    integer operations.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._pools: Dict[str, dict] = {}
+        self.checkout_failures = 0
+        self.pool_clears = 0
+
+    def _pool(self, address) -> dict:
+        key = f"{address[0]}:{address[1]}"
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = {"max_size": DEFAULT_MAX_POOL_SIZE, "open": 0, "checked_out": 0, "checkouts": 0}
+        return pool
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)["max_size"] = event.options.get("maxPoolSize", DEFAULT_MAX_POOL_SIZE)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._pool(event.address)["open"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["open"] = max(0, pool["open"] - 1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["checked_out"] += 1
+            pool["checkouts"] += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["checked_out"] = max(0, pool["checked_out"] - 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pools = {address: dict(pool) for address, pool in self._pools.items()}
+        for pool in pools.values():
+            pool["utilization"] = round(pool["checked_out"] / pool["max_size"], 4) if pool["max_size"] else None
+        return {
+            "pools": pools,
+            "checkout_failures": self.checkout_failures,
+            "pool_clears": self.pool_clears,
+        }
+
+
+MONGO_COMMAND_DURATION = registry.histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency by client and command name",
+    ("client", "command"),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+MONGO_COMMAND_FAILURES = registry.counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands by client and command name", ("client", "command")
+)
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Record the driver-measured duration of every command (no timing of our own)."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, self.name, event.command_name)
+
+    def failed(self, event):
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, self.name, event.command_name)
+        MONGO_COMMAND_FAILURES.inc(self.name, event.command_name)
+
+
+_monitors: Dict[str, PoolMonitor] = {}
+_clients: Dict[str, object] = {}
+
+
+def pool_monitor(name: str) -> PoolMonitor:
+    """Return the pool listener of a client name (to pass in event_listeners)."""
+    monitor = _monitors.get(name)
+    if monitor is None:
+        monitor = _monitors[name] = PoolMonitor(name)
+    return monitor
+
+
+def mongo_listeners(name: str) -> list:
+    """Pool and command listeners of a client, for MongoClient(event_listeners=...)."""
+    return [pool_monitor(name), CommandMonitor(name)]
+
+
+def register_client(name: str, client) -> None:
+    """Declare a MongoDB client (Motor or pymongo) for health checks."""
+    _clients[name] = client
+
+
+def registered_clients() -> Dict[str, object]:
+    return dict(_clients)
+
+
+def pool_stats() -> dict:
+    """Pool utilization of every monitored client."""
+    return {name: monitor.stats() for name, monitor in _monitors.items()}
@@ -6,7 +6,7 @@ from .brand import Brand
 from .user import User, UserCreate, UserLogin, UserResponse, UserUpdate, UserRole
 from .address import Address, AddressCreate
 from .order import Order, OrderCreate, OrderItem, OrderStatus, OrderStatusUpdate, PaymentMethod
-from .promotion import Promotion, PromotionCreate
+from .promotion import Promotion, PromotionCreate, PromotionUpdate, PromotionStatus
 
 __all__ = [
     # Existing
@@ -35,4 +35,6 @@ __all__ = [
     # Promotions
     "Promotion",
     "PromotionCreate",
+    "PromotionUpdate",
+    "PromotionStatus",
 ]
\ No newline at end of file
@@ -34,7 +34,7 @@ class Order(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    order_number: str  # Format: ORD-20250107-XXXX
+    order_number: str  # Format: ORD-20250107-NNNN (séquence du jour)
     user_id: str
     
     # Items
@@ -1,7 +1,7 @@
 """Product model."""
 from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Dict, Optional
 import uuid
 
 class Product(BaseModel):
@@ -20,6 +20,7 @@ class Product(BaseModel):
     image_url: str
     rating: Optional[float] = None
     review_count: Optional[int] = None
+    rating_histogram: Optional[Dict[str, int]] = None  # étoiles -> nombre d'avis
     is_new: bool = False
     is_bestseller: bool = False
     in_stock: bool = True
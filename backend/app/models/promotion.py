@@ -1,25 +1,50 @@
 """Promotion model for admin management."""
 from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime, timezone
-from typing import Optional
+from enum import Enum
+from typing import List, Optional
 import uuid
 
+
+class PromotionStatus(str, Enum):
+    """Promotion lifecycle, driven by the promotion scheduler."""
+    SCHEDULED = "scheduled"  # Programmée
+    RUNNING = "running"      # Appliquée aux produits
+    ENDED = "ended"          # Terminée (remises retirées)
+
+
 class Promotion(BaseModel):
     """Promotion model."""
     model_config = ConfigDict(extra="ignore")
     
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    product_id: str
+    name: Optional[str] = None
+    product_ids: List[str] = []
+    product_id: Optional[str] = None  # Ancien format (un seul produit)
     discount_percentage: int  # 10, 20, 30, etc.
     is_active: bool = True
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
+    status: PromotionStatus = PromotionStatus.SCHEDULED
+    applied_at: Optional[datetime] = None
+    ended_at: Optional[datetime] = None
     created_by: str  # Admin user ID
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class PromotionCreate(BaseModel):
     """Promotion creation model."""
-    product_id: str
+    name: Optional[str] = None
+    product_ids: List[str] = []
+    product_id: Optional[str] = None
     discount_percentage: int
     start_date: Optional[datetime] = None
-    end_date: Optional[datetime] = None
\ No newline at end of file
+    end_date: Optional[datetime] = None
+
+class PromotionUpdate(BaseModel):
+    """Promotion update model."""
+    name: Optional[str] = None
+    product_ids: Optional[List[str]] = None
+    discount_percentage: Optional[int] = None
+    is_active: Optional[bool] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
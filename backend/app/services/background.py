@@ -0,0 +1,86 @@
+"""In-process background tasks with liveness tracking."""
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTask:
+    """A named asyncio task and the last signs of life it gave."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.task: Optional[asyncio.Task] = None
+        self.started_at = datetime.now(timezone.utc)
+        self.last_heartbeat: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.runs = 0
+
+    def heartbeat(self) -> None:
+        self.last_heartbeat = datetime.now(timezone.utc)
+        self.runs += 1
+
+    def status(self) -> dict:
+        return {
+            "running": self.task is not None and not self.task.done(),
+            "started_at": self.started_at,
+            "last_heartbeat": self.last_heartbeat,
+            "runs": self.runs,
+            "last_error": self.last_error,
+        }
+
+
+_tasks: Dict[str, BackgroundTask] = {}
+
+
+def start_background_task(name: str, coroutine_factory: Callable[[BackgroundTask], Awaitable[None]]) -> BackgroundTask:
+    """Start a long-running task; it receives its BackgroundTask to report heartbeats."""
+    entry = BackgroundTask(name)
+
+    async def runner():
+        try:
+            await coroutine_factory(entry)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            entry.last_error = repr(e)
+            logger.exception(f"❌ Background task {name} crashed")
+
+    entry.task = asyncio.ensure_future(runner())
+    _tasks[name] = entry
+    return entry
+
+
+def start_periodic_task(name: str, interval: float, func: Callable[[], Awaitable[None]]) -> BackgroundTask:
+    """Run func() every ``interval`` seconds; an error is logged and the loop goes on."""
+
+    async def loop(entry: BackgroundTask):
+        while True:
+            try:
+                await func()
+                entry.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                entry.last_error = repr(e)
+                logger.error(f"❌ Background task {name} failed: {e}")
+            entry.heartbeat()
+            await asyncio.sleep(interval)
+
+    return start_background_task(name, loop)
+
+
+async def stop_background_tasks() -> None:
+    """Cancel every background task and wait for them to finish."""
+    tasks = [entry.task for entry in _tasks.values() if entry.task is not None]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _tasks.clear()
+
+
+def background_tasks_status() -> dict:
+    """Return the liveness of every registered background task."""
+    return {name: entry.status() for name, entry in _tasks.items()}
@@ -0,0 +1,63 @@
+"""Small in-process caches for expensive async computations."""
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import time
+
+# Caches nommés, exposés dans les métriques
+_named_caches: Dict[str, "AsyncTTLCache"] = {}
+
+
+class AsyncTTLCache:
+    """Cache the result of a coroutine for ``ttl`` seconds, with single-flight refresh.
+
+    When the value is stale, the first caller starts the refresh and every
+    concurrent caller awaits that same task instead of hitting the database.
+    """
+
+    def __init__(self, ttl: float, name: Optional[str] = None):
+        self.ttl = ttl
+        self._value: Any = None
+        self._expires_at = 0.0
+        self._refreshing: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        if name:
+            _named_caches[name] = self
+
+    async def get(self, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value, refreshing it with loader() when stale."""
+        if time.monotonic() < self._expires_at:
+            self.hits += 1
+            return self._value
+        self.misses += 1
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._refresh(loader))
+        # shield : l'annulation d'un appelant n'annule pas le calcul partagé
+        return await asyncio.shield(self._refreshing)
+
+    async def _refresh(self, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+            self._value = value
+            self._expires_at = time.monotonic() + self.ttl
+            return value
+        finally:
+            self._refreshing = None
+
+    def invalidate(self) -> None:
+        """Force the next get() to refresh."""
+        self._expires_at = 0.0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+def ttl_caches_stats() -> dict:
+    """Hit counts of every named AsyncTTLCache."""
+    return {name: cache.stats() for name, cache in _named_caches.items()}
@@ -0,0 +1,149 @@
+"""Server-side carts: in-process LRU with write-behind flushes to MongoDB."""
+from collections import OrderedDict
+from pymongo import DeleteOne, UpdateOne
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Paniers gardés en mémoire (les moins récemment utilisés sont évincés)
+CART_CACHE_SIZE = int(os.environ.get("CART_CACHE_SIZE", "10000"))
+# Au-delà, un panier en cache est relu depuis MongoDB (borne l'écart entre workers)
+CART_CACHE_TTL = float(os.environ.get("CART_CACHE_TTL", "60"))
+# Intervalle d'écriture groupée des paniers modifiés
+CART_FLUSH_INTERVAL = float(os.environ.get("CART_FLUSH_INTERVAL", "5"))
+CART_MAX_QUANTITY = int(os.environ.get("CART_MAX_QUANTITY", "99"))
+
+
+class CartEntry:
+    """A user's cart: product_id -> quantity, in insertion order."""
+
+    def __init__(self, user_id: str, items: Optional[Dict[str, int]] = None):
+        self.user_id = user_id
+        self.items: Dict[str, int] = dict(items or {})
+        self.loaded_at = time.monotonic()
+        self.updated_at = datetime.now(timezone.utc)
+        self.version = 0
+        self.flushed_version = 0
+
+    @property
+    def dirty(self) -> bool:
+        return self.version != self.flushed_version
+
+    def touch(self) -> None:
+        self.version += 1
+        self.updated_at = datetime.now(timezone.utc)
+
+
+class CartStore:
+    """Hot carts in an LRU; mutations are memory-only until the next flush.
+
+    Evicted carts with unflushed changes wait in ``_pending`` (still
+    readable) until the next flush writes them.
+    """
+
+    def __init__(self, max_size: int = CART_CACHE_SIZE, ttl: float = CART_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CartEntry]" = OrderedDict()
+        self._pending: Dict[str, CartEntry] = {}
+        self.hits = 0
+        self.misses = 0
+        self.flushed = 0
+
+    async def get(self, db, user_id: str) -> CartEntry:
+        """Return the user's cart, loading it from MongoDB on a miss."""
+        entry = self._entries.get(user_id)
+        if entry is not None and (entry.dirty or time.monotonic() - entry.loaded_at < self.ttl):
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry
+        entry = self._pending.pop(user_id, None)
+        if entry is None:
+            self.misses += 1
+            doc = await db.carts.find_one({"_id": user_id}, {"items": 1})
+            # Un autre appel a pu charger le panier pendant l'attente
+            current = self._entries.get(user_id)
+            if current is not None and current.dirty:
+                return current
+            items = {item["product_id"]: item["quantity"] for item in (doc or {}).get("items", [])}
+            entry = CartEntry(user_id, items)
+        self._put(entry)
+        return entry
+
+    def _put(self, entry: CartEntry) -> None:
+        self._entries[entry.user_id] = entry
+        self._entries.move_to_end(entry.user_id)
+        while len(self._entries) > self.max_size:
+            _, evicted = self._entries.popitem(last=False)
+            if evicted.dirty:
+                self._pending[evicted.user_id] = evicted
+
+    def forget(self, user_id: str) -> None:
+        """Drop a cart from memory without writing it (e.g. after it was cleared in MongoDB)."""
+        self._entries.pop(user_id, None)
+        self._pending.pop(user_id, None)
+
+    async def flush(self, db) -> int:
+        """Write every dirty cart in one unordered bulk_write; empty carts are deleted."""
+        dirty = [e for e in self._entries.values() if e.dirty] + list(self._pending.values())
+        if not dirty:
+            return 0
+        operations = []
+        versions = []
+        for entry in dirty:
+            versions.append((entry, entry.version))
+            if entry.items:
+                operations.append(UpdateOne(
+                    {"_id": entry.user_id},
+                    {"$set": {
+                        "user_id": entry.user_id,
+                        "items": [{"product_id": pid, "quantity": qty} for pid, qty in entry.items.items()],
+                        "updated_at": entry.updated_at,
+                    }},
+                    upsert=True
+                ))
+            else:
+                operations.append(DeleteOne({"_id": entry.user_id}))
+        await db.carts.bulk_write(operations, ordered=False)
+        for entry, version in versions:
+            entry.flushed_version = version
+            if self._pending.get(entry.user_id) is entry and not entry.dirty:
+                del self._pending[entry.user_id]
+        self.flushed += len(operations)
+        return len(operations)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "cached": len(self._entries),
+            "pending": len(self._pending),
+            "dirty": sum(1 for e in self._entries.values() if e.dirty) + len(self._pending),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "flushed": self.flushed,
+        }
+
+
+cart_store = CartStore()
+
+
+async def flush_carts(db) -> int:
+    """Persist the carts modified since the last flush (periodic task and shutdown)."""
+    return await cart_store.flush(db)
+
+
+async def clear_user_cart(db, user_id: str) -> None:
+    """Empty a user's cart (after an order); written by the next flush."""
+    try:
+        entry = await cart_store.get(db, user_id)
+    except Exception as e:
+        logger.error(f"❌ Cart of user {user_id} could not be cleared: {e}")
+        return
+    if entry.items:
+        entry.items.clear()
+        entry.touch()
@@ -0,0 +1,107 @@
+"""In-memory product catalog shared by the public product routes."""
+from typing import Callable, Dict, List, Optional
+import logging
+import os
+import threading
+import time
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Durée de vie max d'une copie du catalogue (borne la désynchronisation entre workers)
+CATALOG_CACHE_TTL = float(os.environ.get("CATALOG_CACHE_TTL", "60"))
+
+
+def normalize_text(text):
+    """Retire les accents d'un texte."""
+    if not text:
+        return ""
+    return ''.join(
+        c for c in unicodedata.normalize('NFD', text)
+        if unicodedata.category(c) != 'Mn'
+    ).lower()
+
+
+class CatalogCache:
+    """Hold every product document in memory, reloaded on invalidation or after a TTL.
+
+    ``version`` increases on every invalidation; listeners registered with
+    ``add_listener`` are called with the product list after each reload so
+    derived indexes can be rebuilt from the same snapshot.
+    """
+
+    def __init__(self, ttl: float = CATALOG_CACHE_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+        self._products: Optional[List[dict]] = None
+        self._by_id: Dict[str, dict] = {}
+        self._loader: Optional[Callable[[], List[dict]]] = None
+        self._listeners: List[Callable[[List[dict]], None]] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.reloads = 0
+
+    def set_loader(self, loader: Callable[[], List[dict]]) -> None:
+        """Set the function returning every product document."""
+        self._loader = loader
+
+    def add_listener(self, listener: Callable[[List[dict]], None]) -> None:
+        """Call listener(products) after every reload."""
+        self._listeners.append(listener)
+
+    def get_products(self) -> List[dict]:
+        """Return the cached products, reloading them when missing or expired."""
+        products = self._products
+        if products is not None and time.monotonic() - self.loaded_at < self.ttl:
+            self.hits += 1
+            return products
+        with self._lock:
+            if self._products is None or time.monotonic() - self.loaded_at >= self.ttl:
+                self._reload()
+            return self._products
+
+    def get_product(self, product_id: str) -> Optional[dict]:
+        """Return one cached product by id (None when unknown)."""
+        self.get_products()
+        return self._by_id.get(product_id)
+
+    def _reload(self) -> None:
+        self.reloads += 1
+        products = self._loader() if self._loader else []
+        self._by_id = {p.get("id"): p for p in products}
+        self._products = products
+        self.loaded_at = time.monotonic()
+        for listener in self._listeners:
+            try:
+                listener(products)
+            except Exception:
+                logger.exception("❌ Catalog listener failed")
+
+    def invalidate(self) -> None:
+        """Drop the cached products; the next read reloads them."""
+        with self._lock:
+            self.version += 1
+            self._products = None
+
+    def stats(self) -> dict:
+        """Version, age and size of the cached catalog."""
+        products = self._products
+        return {
+            "version": self.version,
+            "loaded": products is not None,
+            "age_seconds": round(time.monotonic() - self.loaded_at, 3) if self.loaded_at is not None else None,
+            "products": len(products) if products is not None else 0,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "reloads": self.reloads,
+            "hit_ratio": round(self.hits / (self.hits + self.reloads), 4) if self.hits + self.reloads else None,
+        }
+
+
+catalog = CatalogCache()
+
+
+def invalidate_catalog() -> None:
+    """Invalidate the in-memory catalog after a product write."""
+    catalog.invalidate()
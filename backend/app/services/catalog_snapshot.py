@@ -0,0 +1,257 @@
+"""Compact, memory-mapped binary snapshot of data/products.json.
+
+Layout: magic, format version and header length, a JSON header (source
+file stamp, metadata, brands, categories, column table), then 8-byte
+aligned column blocks. Numeric fields are NumPy arrays; text fields are an
+offsets array plus one UTF-8 blob. The file is opened with np.memmap, so
+columns are zero-copy views and every worker shares the same pages.
+
+The snapshot is lossless: a field goes to its column only when the value
+has the column's exact type, a per-row bitmask records which columns the
+product actually had, and every other field (unknown, null, or of another
+type) is kept in a per-row JSON object.
+"""
+from pathlib import Path
+from typing import Dict, List, Optional
+import json
+import logging
+import os
+import struct
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"KBCATSNP"
+FORMAT_VERSION = 2
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGN = 8
+
+# Compile automatiquement le snapshot quand il manque ou qu'il est périmé
+CATALOG_SNAPSHOT_AUTOCOMPILE = os.environ.get("CATALOG_SNAPSHOT_AUTOCOMPILE", "true").lower() in ("1", "true", "yes")
+
+STRING_FIELDS = (
+    "id", "ref", "name", "brand", "category", "category_fr", "format",
+    "image_url", "image_file", "description", "description_short",
+    "created_at", "updated_at",
+)
+INT_FIELDS = ("price", "original_price", "discount_percentage", "review_count")
+FLOAT_FIELDS = ("price_eur", "rating")
+FLAG_FIELDS = ("in_stock", "is_new", "is_bestseller")
+
+# Champ -> type exact accepté dans sa colonne ; bit de présence = position dans cette liste
+COLUMN_FIELDS = (
+    [(field, str) for field in STRING_FIELDS]
+    + [(field, int) for field in INT_FIELDS]
+    + [(field, float) for field in FLOAT_FIELDS]
+    + [(field, bool) for field in FLAG_FIELDS]
+)
+COLUMN_TYPES = dict(COLUMN_FIELDS)
+PRESENCE_BITS = {field: bit for bit, (field, _) in enumerate(COLUMN_FIELDS)}
+# Champs hors colonnes, par ligne
+EXTRA_FIELD = "extra"
+
+
+def snapshot_path_for(json_path: Path) -> Path:
+    return Path(json_path).with_suffix(".snapshot")
+
+
+def _source_stamp(json_path: Path) -> dict:
+    stat = os.stat(json_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+# ============================================
+# COMPILATION
+# ============================================
+
+def _encode_strings(values: List[Optional[str]]) -> Dict[str, np.ndarray]:
+    texts = [v or "" for v in values]
+    # Offsets en caractères : le blob est décodé une fois puis découpé
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in texts], out=offsets[1:])
+    return {
+        "offsets": offsets,
+        "data": np.frombuffer("".join(texts).encode("utf-8"), dtype=np.uint8),
+        "nulls": np.array([v is None for v in values], dtype=np.uint8),
+    }
+
+
+def _in_column(field: str, value) -> bool:
+    """True when value round-trips exactly through the field's column (type(True) is not int)."""
+    return field in COLUMN_TYPES and type(value) is COLUMN_TYPES[field]
+
+
+def _build_columns(products: List[dict]) -> Dict[str, np.ndarray]:
+    def values(field, default):
+        return [p[field] if _in_column(field, p.get(field)) else default for p in products]
+
+    columns: Dict[str, np.ndarray] = {}
+    for field in STRING_FIELDS:
+        for part, array in _encode_strings(values(field, None)).items():
+            columns[f"{field}.{part}"] = array
+    for field in INT_FIELDS:
+        columns[field] = np.array(values(field, 0), dtype=np.int64)
+    for field in FLOAT_FIELDS:
+        columns[field] = np.array(values(field, np.nan), dtype=np.float64)
+    flags = np.zeros(len(products), dtype=np.uint8)
+    for bit, field in enumerate(FLAG_FIELDS):
+        flags |= np.array(values(field, False), dtype=np.uint8) << bit
+    columns["flags"] = flags
+
+    presence = np.zeros(len(products), dtype=np.uint32)
+    extras = []
+    for i, p in enumerate(products):
+        extra = {}
+        for field, value in p.items():
+            if _in_column(field, value):
+                presence[i] |= 1 << PRESENCE_BITS[field]
+            else:
+                extra[field] = value
+        extras.append(json.dumps(extra, ensure_ascii=False) if extra else None)
+    columns["presence"] = presence
+    for part, array in _encode_strings(extras).items():
+        columns[f"{EXTRA_FIELD}.{part}"] = array
+    return columns
+
+
+def compile_snapshot(json_path: Path, snapshot_path: Optional[Path] = None) -> Path:
+    """Compile products.json into a binary snapshot (written atomically)."""
+    json_path = Path(json_path)
+    snapshot_path = Path(snapshot_path) if snapshot_path else snapshot_path_for(json_path)
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    products = data.get("products", [])
+
+    columns = _build_columns(products)
+
+    # Les offsets dépendent de la taille du header : on itère jusqu'à ce qu'elle soit stable
+    table = {name: {"dtype": array.dtype.str, "count": int(array.size), "offset": 0} for name, array in columns.items()}
+    header = {
+        "source": _source_stamp(json_path),
+        "count": len(products),
+        "metadata": data.get("metadata", {}),
+        "brands": data.get("brands", []),
+        "categories": data.get("categories", []),
+        "columns": table,
+    }
+    header_bytes = b""
+    while True:
+        previous = header_bytes
+        header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        if len(header_bytes) == len(previous):
+            break
+        position = _PREAMBLE.size + len(header_bytes)
+        for name, array in columns.items():
+            position += -position % _ALIGN
+            table[name]["offset"] = position
+            position += array.nbytes
+
+    tmp_path = snapshot_path.with_name(snapshot_path.name + f".{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in columns.items():
+            f.write(b"\0" * (table[name]["offset"] - f.tell()))
+            f.write(array.tobytes())
+    # Remplacement atomique : les workers qui ont déjà mappé l'ancien fichier le gardent
+    os.replace(tmp_path, snapshot_path)
+    return snapshot_path
+
+
+# ============================================
+# LECTURE
+# ============================================
+
+class CatalogSnapshot:
+    """Read-only view over a memory-mapped catalog snapshot."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._buffer = np.memmap(self.path, dtype=np.uint8, mode="r")
+        magic, version, header_length = _PREAMBLE.unpack_from(self._buffer[:_PREAMBLE.size].tobytes())
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Not a catalog snapshot (v{FORMAT_VERSION}): {self.path}")
+        header = bytes(self._buffer[_PREAMBLE.size:_PREAMBLE.size + header_length])
+        self.header = json.loads(header.decode("utf-8"))
+        self.count = self.header["count"]
+        self._strings_cache: Dict[str, List[Optional[str]]] = {}
+
+    def is_fresh(self, json_path: Path) -> bool:
+        """True when the snapshot was compiled from the current products.json."""
+        return self.header["source"] == _source_stamp(json_path)
+
+    def column(self, name: str) -> np.ndarray:
+        """Zero-copy view of a column."""
+        spec = self.header["columns"][name]
+        dtype = np.dtype(spec["dtype"])
+        start = spec["offset"]
+        return self._buffer[start:start + spec["count"] * dtype.itemsize].view(dtype)
+
+    def strings(self, field: str) -> List[Optional[str]]:
+        """Decode a text column (cached)."""
+        if field not in self._strings_cache:
+            offsets = self.column(f"{field}.offsets").tolist()
+            text = self.column(f"{field}.data").tobytes().decode("utf-8")
+            values = [text[start:end] for start, end in zip(offsets, offsets[1:])]
+            nulls_name = f"{field}.nulls"
+            if nulls_name in self.header["columns"]:
+                for i in np.flatnonzero(self.column(nulls_name)).tolist():
+                    values[i] = None
+            self._strings_cache[field] = values
+        return self._strings_cache[field]
+
+    def products(self) -> List[dict]:
+        """Rebuild the product dicts exactly as they are in products.json."""
+        columns = {field: self.strings(field) for field in STRING_FIELDS}
+        columns.update({field: self.column(field).tolist() for field in INT_FIELDS + FLOAT_FIELDS})
+        flags = self.column("flags")
+        columns.update({field: ((flags >> bit) & 1).astype(bool).tolist() for bit, field in enumerate(FLAG_FIELDS)})
+        presence = self.column("presence").tolist()
+        extras = self.strings(EXTRA_FIELD)
+
+        products = []
+        for i in range(self.count):
+            mask = presence[i]
+            product = {field: columns[field][i] for field, bit in PRESENCE_BITS.items() if mask >> bit & 1}
+            if extras[i] is not None:
+                product.update(json.loads(extras[i]))
+            products.append(product)
+        return products
+
+    def data(self) -> dict:
+        """Same structure as products.json: metadata, brands, categories, products."""
+        return {
+            "metadata": self.header["metadata"],
+            "brands": self.header["brands"],
+            "categories": self.header["categories"],
+            "products": self.products(),
+        }
+
+
+def load_catalog_data(json_path: Path) -> dict:
+    """Load products.json through its snapshot, (re)compiling it when stale.
+
+    Falls back to json.load when the snapshot cannot be read or written
+    (read-only deployment, concurrent compile).
+    """
+    json_path = Path(json_path)
+    snapshot_path = snapshot_path_for(json_path)
+    if snapshot_path.exists():
+        try:
+            snapshot = CatalogSnapshot(snapshot_path)
+            if snapshot.is_fresh(json_path):
+                return snapshot.data()
+            logger.info(f"Catalog snapshot {snapshot_path.name} is stale")
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Catalog snapshot unreadable: {e}")
+
+    if CATALOG_SNAPSHOT_AUTOCOMPILE:
+        try:
+            compile_snapshot(json_path, snapshot_path)
+            return CatalogSnapshot(snapshot_path).data()
+        except OSError as e:
+            logger.warning(f"⚠️  Catalog snapshot could not be compiled: {e}")
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        return json.load(f)
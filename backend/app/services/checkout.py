@@ -0,0 +1,92 @@
+"""Checkout helpers: server-side resolution and pricing of order items."""
+from fastapi import HTTPException, status
+from typing import List, Tuple
+
+# Livraison offerte à partir de 100 TND, sinon 7 TND
+FREE_DELIVERY_THRESHOLD_TND = 100
+DELIVERY_FEE_TND = 7
+
+# Champs produits nécessaires pour construire une ligne de commande
+CHECKOUT_PRODUCT_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "name": 1,
+    "brand": 1,
+    "image_url": 1,
+    "price_tnd": 1,
+    "in_stock": 1,
+    "quantity": 1,
+}
+
+
+async def resolve_order_items(db, items) -> Tuple[List[dict], int]:
+    """Resolve cart items against the catalog in a single $in query.
+
+    Name, image, brand and unit price always come from the product document,
+    never from the client. Duplicate lines are merged. Returns the order lines
+    and the subtotal in TND.
+    """
+    quantities = {}
+    for item in items:
+        if item.quantity <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Quantité invalide"
+            )
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+    products = await db.products.find(
+        {"id": {"$in": list(quantities)}},
+        CHECKOUT_PRODUCT_PROJECTION
+    ).to_list(len(quantities))
+    products_by_id = {p["id"]: p for p in products}
+
+    missing = [pid for pid in quantities if pid not in products_by_id]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Produit(s) introuvable(s) : {', '.join(missing)}"
+        )
+
+    unavailable = []
+    lines = []
+    subtotal = 0
+    for product_id, quantity in quantities.items():
+        product = products_by_id[product_id]
+        stock = product.get("quantity")
+        if not product.get("in_stock", True) or (stock is not None and stock < quantity):
+            unavailable.append(product.get("name") or product_id)
+            continue
+
+        unit_price = int(product.get("price_tnd") or 0)
+        lines.append({
+            "product_id": product_id,
+            "product_name": product.get("name", ""),
+            "product_image": product.get("image_url", ""),
+            "brand": product.get("brand", ""),
+            "quantity": quantity,
+            "unit_price_tnd": unit_price,
+            "total_price_tnd": unit_price * quantity,
+            # Stock suivi (champ quantity) : la ligne sera réservée à la création
+            "stock_reserved": stock is not None,
+        })
+        subtotal += unit_price * quantity
+
+    if unavailable:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Produit(s) en rupture de stock : {', '.join(unavailable)}"
+        )
+
+    return lines, subtotal
+
+
+def compute_order_totals(subtotal: int) -> dict:
+    """Compute delivery fee and total for a subtotal in TND."""
+    delivery_fee = 0 if subtotal >= FREE_DELIVERY_THRESHOLD_TND else DELIVERY_FEE_TND
+    return {
+        "subtotal_tnd": subtotal,
+        "delivery_fee_tnd": delivery_fee,
+        "discount_tnd": 0,
+        "total_tnd": subtotal + delivery_fee,
+    }
@@ -0,0 +1,56 @@
+"""Per-client order counters kept on the user documents (admin client list)."""
+from pymongo import UpdateOne
+import logging
+
+logger = logging.getLogger(__name__)
+
+# orders_count : toutes les commandes ; total_spent : hors commandes annulées
+CLIENT_STATS_FIELDS = ("orders_count", "total_spent")
+
+
+async def record_client_order(db, order: dict) -> None:
+    """Count a new order in its client's counters."""
+    try:
+        await db.users.update_one(
+            {"id": order["user_id"]},
+            {"$inc": {"orders_count": 1, "total_spent": order.get("total_tnd", 0)}}
+        )
+    except Exception as e:
+        logger.error(f"❌ Client stats update failed for order {order.get('id')}: {e}")
+
+
+async def record_client_cancellation(db, order: dict) -> None:
+    """Remove a cancelled order from its client's total spent (it stays in orders_count)."""
+    try:
+        await db.users.update_one(
+            {"id": order["user_id"]},
+            {"$inc": {"total_spent": -order.get("total_tnd", 0)}}
+        )
+    except Exception as e:
+        logger.error(f"❌ Client stats update failed for order {order.get('id')}: {e}")
+
+
+async def rebuild_client_stats(db) -> int:
+    """Recompute every client's counters from the orders (one $group over the collection)."""
+    totals = await db.orders.aggregate([
+        {"$group": {
+            "_id": "$user_id",
+            "orders_count": {"$sum": 1},
+            "total_spent": {"$sum": {"$cond": [{"$ne": ["$status", "cancelled"]}, "$total_tnd", 0]}},
+        }}
+    ]).to_list(None)
+
+    await db.users.update_many({}, {"$set": {"orders_count": 0, "total_spent": 0}})
+    if totals:
+        await db.users.bulk_write([
+            UpdateOne({"id": row["_id"]}, {"$set": {"orders_count": row["orders_count"], "total_spent": row["total_spent"]}})
+            for row in totals
+        ], ordered=False)
+    return len(totals)
+
+
+async def ensure_client_stats(db) -> None:
+    """Build the counters on first start when some clients do not have them yet."""
+    if await db.users.find_one({"role": "client", "orders_count": {"$exists": False}}, {"_id": 1}):
+        count = await rebuild_client_stats(db)
+        logger.info(f"✅ Client stats rebuilt ({count} clients with orders)")
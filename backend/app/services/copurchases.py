@@ -0,0 +1,234 @@
+"""Frequently bought together: product co-occurrence counts from orders."""
+from pymongo import UpdateOne
+from typing import Dict, List, Tuple
+import heapq
+import logging
+import os
+
+import numpy as np
+
+from app.db.indexes import INDEXES
+
+logger = logging.getLogger(__name__)
+
+PAIRS_COLLECTION = "product_pairs"
+# Table reconstruite à part puis renommée : les lecteurs ne voient jamais une table vide
+PAIRS_REBUILD_COLLECTION = "product_pairs_rebuild"
+
+# Compléments gardés par produit dans la table précalculée
+COPURCHASE_TOP_K = int(os.environ.get("COPURCHASE_TOP_K", "12"))
+# Relecture de la table depuis MongoDB (commandes passées sur les autres workers)
+COPURCHASE_REFRESH_SECONDS = int(os.environ.get("COPURCHASE_REFRESH_SECONDS", "900"))
+# Un couple doit avoir été acheté ensemble au moins ce nombre de fois
+COPURCHASE_MIN_COUNT = int(os.environ.get("COPURCHASE_MIN_COUNT", "1"))
+COPURCHASE_BATCH_SIZE = int(os.environ.get("COPURCHASE_BATCH_SIZE", "1000"))
+
+
+def basket_product_ids(order: dict) -> List[str]:
+    """Distinct product ids of an order, in line order."""
+    return list(dict.fromkeys(item["product_id"] for item in order.get("items") or [] if item.get("product_id")))
+
+
+def count_pairs(baskets: List[List[str]]) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """Sparse co-occurrence matrix (COO, both directions) of a list of baskets.
+
+    Baskets of the same size are stacked into one (baskets x size) index
+    matrix and expanded with triu_indices, then pair keys (row * n + col)
+    are counted with np.unique: no Python loop over pairs.
+    Returns (product ids, rows, cols, counts).
+    """
+    ids = sorted({pid for basket in baskets for pid in basket})
+    if not ids:
+        empty = np.zeros(0, dtype=np.int64)
+        return ids, empty, empty, empty
+    position = {pid: i for i, pid in enumerate(ids)}
+    n = len(ids)
+
+    by_size: Dict[int, List[List[int]]] = {}
+    for basket in baskets:
+        if len(basket) > 1:
+            by_size.setdefault(len(basket), []).append([position[pid] for pid in basket])
+
+    keys = []
+    for size, rows in by_size.items():
+        matrix = np.array(rows, dtype=np.int64)
+        upper_a, upper_b = np.triu_indices(size, 1)
+        a = matrix[:, upper_a].ravel()
+        b = matrix[:, upper_b].ravel()
+        keys.append(a * n + b)
+        keys.append(b * n + a)
+    if not keys:
+        empty = np.zeros(0, dtype=np.int64)
+        return ids, empty, empty, empty
+
+    unique, counts = np.unique(np.concatenate(keys), return_counts=True)
+    return ids, unique // n, unique % n, counts
+
+
+class CoPurchaseIndex:
+    """Per-product co-purchase counts and their precomputed top-k complements.
+
+    Lookups read ``top`` (a dict of short lists); an order only recomputes
+    the top lists of its own products.
+    """
+
+    def __init__(self, top_k: int = COPURCHASE_TOP_K, min_count: int = COPURCHASE_MIN_COUNT):
+        self.top_k = top_k
+        self.min_count = min_count
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self.top: Dict[str, List[Tuple[str, int]]] = {}
+        self.loaded = False
+
+    def _rank(self, product_id: str) -> None:
+        others = self.counts.get(product_id)
+        best = heapq.nlargest(
+            self.top_k,
+            ((other, count) for other, count in (others or {}).items() if count >= self.min_count),
+            key=lambda pair: (pair[1], pair[0])
+        )
+        if best:
+            self.top[product_id] = best
+        else:
+            self.top.pop(product_id, None)
+
+    def replace(self, rows: List[dict]) -> None:
+        """Load the whole table from product_pairs rows (product_id, other_id, count)."""
+        counts: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            if row.get("count", 0) > 0:
+                counts.setdefault(row["product_id"], {})[row["other_id"]] = row["count"]
+        self.counts = counts
+        self.top = {}
+        for product_id in counts:
+            self._rank(product_id)
+        self.loaded = True
+
+    def add_basket(self, product_ids: List[str], sign: int = 1) -> None:
+        for product_id in product_ids:
+            others = self.counts.setdefault(product_id, {})
+            for other in product_ids:
+                if other != product_id:
+                    count = others.get(other, 0) + sign
+                    if count > 0:
+                        others[other] = count
+                    else:
+                        others.pop(other, None)
+            if not others:
+                del self.counts[product_id]
+            self._rank(product_id)
+
+    def complements(self, product_id: str) -> List[Tuple[str, int]]:
+        """Precomputed (other_id, count) list, most bought together first."""
+        return self.top.get(product_id, [])
+
+    def basket_complements(self, product_ids: List[str]) -> List[Tuple[str, int]]:
+        """Complements of a whole cart: counts summed over its products, cart items excluded."""
+        scores: Dict[str, int] = {}
+        for product_id in product_ids:
+            for other, count in self.top.get(product_id, []):
+                scores[other] = scores.get(other, 0) + count
+        for product_id in product_ids:
+            scores.pop(product_id, None)
+        return sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "products": len(self.top),
+            "pairs": sum(len(others) for others in self.counts.values()),
+            "top_k": self.top_k,
+        }
+
+
+copurchases = CoPurchaseIndex()
+
+
+async def record_order_pairs(db, order: dict, sign: int = 1) -> None:
+    """Add (sign=1, creation) or remove (sign=-1, cancellation) an order's product pairs."""
+    product_ids = basket_product_ids(order)
+    if len(product_ids) < 2:
+        return
+    copurchases.add_basket(product_ids, sign)
+    try:
+        await db[PAIRS_COLLECTION].bulk_write([
+            UpdateOne(
+                {"_id": f"{product_id}|{other}"},
+                {
+                    "$inc": {"count": sign},
+                    "$setOnInsert": {"product_id": product_id, "other_id": other},
+                },
+                upsert=True
+            )
+            for product_id in product_ids
+            for other in product_ids
+            if other != product_id
+        ], ordered=False)
+    except Exception as e:
+        logger.error(f"❌ Co-purchase update failed for order {order.get('id')}: {e}")
+
+
+async def load_copurchases(db) -> int:
+    """Reload the in-process table from product_pairs."""
+    rows = await db[PAIRS_COLLECTION].find(
+        {"count": {"$gt": 0}},
+        {"_id": 0, "product_id": 1, "other_id": 1, "count": 1}
+    ).to_list(None)
+    copurchases.replace(rows)
+    return len(rows)
+
+
+async def rebuild_copurchases(db) -> int:
+    """Recount every pair from the orders (excluding cancelled) and replace product_pairs.
+
+    Orders are streamed and counted COPURCHASE_BATCH_SIZE baskets at a time,
+    so memory follows the number of distinct pairs, not of orders. The table
+    is written to a side collection renamed over product_pairs at the end.
+    Run it while no order is being created, otherwise concurrent increments
+    may be lost.
+    """
+    totals: Dict[Tuple[str, str], int] = {}
+
+    def add(baskets: List[List[str]]) -> None:
+        ids, rows, cols, counts = count_pairs(baskets)
+        for row, col, count in zip(rows.tolist(), cols.tolist(), counts.tolist()):
+            key = (ids[row], ids[col])
+            totals[key] = totals.get(key, 0) + count
+
+    baskets = []
+    async for order in db.orders.find(
+        {"status": {"$ne": "cancelled"}, "items.1": {"$exists": True}},
+        {"_id": 0, "items.product_id": 1}
+    ).batch_size(COPURCHASE_BATCH_SIZE):
+        baskets.append(basket_product_ids(order))
+        if len(baskets) >= COPURCHASE_BATCH_SIZE:
+            add(baskets)
+            baskets = []
+    add(baskets)
+
+    staging = db[PAIRS_REBUILD_COLLECTION]
+    await staging.drop()
+    if not totals:
+        await db[PAIRS_COLLECTION].delete_many({})
+    else:
+        rows = [
+            {"_id": f"{product_id}|{other}", "product_id": product_id, "other_id": other, "count": count}
+            for (product_id, other), count in totals.items()
+        ]
+        for start in range(0, len(rows), COPURCHASE_BATCH_SIZE):
+            await staging.insert_many(rows[start:start + COPURCHASE_BATCH_SIZE], ordered=False)
+        # Le renommage n'emporte pas les index de l'ancienne table
+        for keys, options in INDEXES.get(PAIRS_COLLECTION, []):
+            await staging.create_index(keys, **options)
+        await staging.rename(PAIRS_COLLECTION, dropTarget=True)
+
+    await load_copurchases(db)
+    return len(totals)
+
+
+async def ensure_copurchases(db) -> None:
+    """Build product_pairs on first start when orders already exist, then load the table."""
+    if await db[PAIRS_COLLECTION].find_one({}, {"_id": 1}) is None and await db.orders.find_one({}, {"_id": 1}):
+        count = await rebuild_copurchases(db)
+        logger.info(f"✅ Co-purchase pairs rebuilt ({count} pairs)")
+        return
+    await load_copurchases(db)
@@ -0,0 +1,255 @@
+"""Skin diagnostic: questionnaire rules compiled into NumPy masks over the catalog."""
+from typing import Dict, List, Optional
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from app.services.catalog import catalog, normalize_text
+
+# Étapes de routine -> catégories du catalogue
+ROUTINE_STEPS = {
+    "cleanser": ("Nettoyant", ("Foam Cleanser", "Cleansing Oil", "Cleansing Balm", "Cleansing Powder")),
+    "toner": ("Lotion tonique", ("Toner", "Toner Pads", "Essence")),
+    "serum": ("Sérum", ("Serum", "Ampoule")),
+    "moisturizer": ("Crème hydratante", ("Moisturizer", "Gel Cream")),
+    "sunscreen": ("Protection solaire", ("Sunscreen", "Sun Stick")),
+}
+ROUTINES = {
+    "essential": ("cleanser", "moisturizer", "sunscreen"),
+    "complete": ("cleanser", "toner", "serum", "moisturizer", "sunscreen"),
+}
+
+# Caractéristiques recherchées dans le nom et la description : chaque motif doit
+# commencer un mot du texte normalisé ("ride" ne trouve pas "hybride")
+FEATURES = {
+    "niacinamide": ("Niacinamide", ("niacinamide",)),
+    "bha": ("BHA / acide salicylique", ("bha", "salicyl")),
+    "aha": ("AHA", ("aha", "glycoli", "lactic", "lactique")),
+    "pha": ("PHA / LHA", ("pha ", "lha", "gluconolactone")),
+    "tea_tree": ("Tea tree", ("tea tree", "arbre a the")),
+    "centella": ("Centella / cica", ("centella", "cica", "madecass")),
+    "heartleaf": ("Heartleaf", ("heartleaf", "houttuynia")),
+    "mugwort": ("Armoise", ("mugwort", "artemisia", "armoise")),
+    "panthenol": ("Panthénol", ("panthenol",)),
+    "vitamin_c": ("Vitamine C", ("vitamin c", "vitamine c", "ascorbi")),
+    "arbutin": ("Arbutine", ("arbutin",)),
+    "tranexamic": ("Acide tranexamique", ("tranexami", "txa")),
+    "rice": ("Riz", ("rice", "riz")),
+    "retinoid": ("Rétinol / bakuchiol", ("retinol", "retinal", "bakuchiol")),
+    "peptide": ("Peptides", ("peptide",)),
+    "collagen": ("Collagène", ("collagen", "collagene")),
+    "ginseng": ("Ginseng", ("ginseng",)),
+    "hyaluronic": ("Acide hyaluronique", ("hyaluron",)),
+    "ceramide": ("Céramides", ("ceramide",)),
+    "snail": ("Mucine d'escargot", ("snail", "escargot")),
+    "squalane": ("Squalane", ("squalane",)),
+    "propolis": ("Propolis", ("propolis",)),
+    "fragrance_free": ("Sans parfum", ("sans parfum", "fragrance free")),
+    "oily_skin": ("Peaux grasses", ("peau grasse", "peaux grasses", "matifi", "sebum")),
+    "dry_skin": ("Peaux sèches", ("peau seche", "peaux seches", "nourri")),
+    "sensitive_skin": ("Peaux sensibles", ("peau sensible", "peaux sensibles", "apais")),
+    "acne_claim": ("Imperfections", ("acne", "imperfection", "bouton")),
+    "spots_claim": ("Taches", ("tache", "pigment")),
+    "aging_claim": ("Anti-âge", ("ride", "anti-age", "fermete", "elasticite")),
+    "redness_claim": ("Rougeurs", ("rougeur",)),
+    "hydration_claim": ("Hydratation", ("hydrat", "deshydrat")),
+    "pores_claim": ("Pores", ("pore",)),
+    "radiance_claim": ("Éclat", ("eclat", "terne", "lumin")),
+    "alcohol": ("Alcool", ("alcohol denat", "alcool")),
+    "essential_oil": ("Huiles essentielles", ("essential oil", "huile essentielle", "limonene", "linalool")),
+}
+
+# Préoccupations -> poids des caractéristiques
+CONCERNS = {
+    "acne": ("Imperfections / acné", {"bha": 3, "niacinamide": 2, "tea_tree": 2, "centella": 1, "propolis": 1, "pha": 1, "acne_claim": 3}),
+    "pigmentation": ("Taches pigmentaires", {"tranexamic": 3, "arbutin": 3, "vitamin_c": 2, "niacinamide": 2, "rice": 1, "spots_claim": 3}),
+    "aging": ("Rides / perte de fermeté", {"retinoid": 3, "peptide": 3, "collagen": 2, "ginseng": 2, "aging_claim": 3}),
+    "redness": ("Rougeurs", {"centella": 3, "heartleaf": 2, "mugwort": 2, "panthenol": 2, "redness_claim": 3}),
+    "dehydration": ("Déshydratation", {"hyaluronic": 3, "ceramide": 2, "snail": 2, "squalane": 1, "hydration_claim": 2}),
+    "pores": ("Pores dilatés", {"bha": 3, "pha": 2, "niacinamide": 2, "pores_claim": 3}),
+    "dullness": ("Teint terne", {"vitamin_c": 3, "aha": 2, "rice": 2, "niacinamide": 1, "radiance_claim": 3}),
+}
+
+SKIN_TYPES = {
+    "dry": ("Sèche", {"ceramide": 2, "squalane": 2, "hyaluronic": 1, "snail": 1, "dry_skin": 2, "bha": -1}),
+    "oily": ("Grasse", {"niacinamide": 2, "bha": 2, "tea_tree": 1, "oily_skin": 2, "dry_skin": -1}),
+    "combination": ("Mixte", {"niacinamide": 1, "bha": 1, "hyaluronic": 1, "oily_skin": 1}),
+    "normal": ("Normale", {"hyaluronic": 1, "centella": 1}),
+    "sensitive": ("Sensible", {"centella": 2, "panthenol": 2, "mugwort": 1, "fragrance_free": 2, "sensitive_skin": 2}),
+}
+
+# Peau sensible : ces caractéristiques excluent le produit
+SENSITIVE_EXCLUSIONS = ("alcohol", "essential_oil", "retinoid", "aha")
+
+# Types de produits mieux adaptés à certains types de peau (bonus de catégorie)
+SKIN_TYPE_CATEGORY_BONUS = {
+    "oily": {"Gel Cream": 2, "Foam Cleanser": 1, "Toner Pads": 1},
+    "combination": {"Gel Cream": 1},
+    "dry": {"Cleansing Balm": 1, "Cleansing Oil": 1, "Moisturizer": 1},
+}
+
+ALTERNATIVES_PER_STEP = 3
+
+_NON_WORD = re.compile(r"[^a-z0-9%]+")
+
+
+class CompiledCatalog:
+    """Boolean feature matrix and per-step category masks of one catalog snapshot."""
+
+    def __init__(self, products: List[dict]):
+        self.products = products
+        self.feature_keys = list(FEATURES)
+        texts = np.array([_feature_text(p) for p in products], dtype=str)
+        # features[i, j] : le produit i mentionne la caractéristique j
+        self.features = np.zeros((len(products), len(self.feature_keys)), dtype=bool)
+        for j, key in enumerate(self.feature_keys):
+            for pattern in FEATURES[key][1]:
+                self.features[:, j] |= np.char.find(texts, " " + _normalize_pattern(pattern)) >= 0
+
+        categories = np.array([p.get("category") or "" for p in products], dtype=str)
+        self.categories = categories
+        self.step_masks = {step: np.isin(categories, cats) for step, (_, cats) in ROUTINE_STEPS.items()}
+        self.in_stock = np.array([bool(p.get("in_stock", True)) for p in products], dtype=bool)
+        self.prices = np.array([p.get("price_tnd") or 0 for p in products], dtype=np.int64)
+        # Départage : note moyenne et best-sellers
+        self.tiebreak = (
+            np.array([p.get("rating") or 0 for p in products], dtype=np.float64) * 0.1
+            + np.array([bool(p.get("is_bestseller")) for p in products], dtype=np.float64) * 0.5
+        )
+
+    def weights(self, mapping: Dict[str, int]) -> np.ndarray:
+        vector = np.zeros(len(self.feature_keys), dtype=np.float64)
+        for key, weight in mapping.items():
+            vector[self.feature_keys.index(key)] += weight
+        return vector
+
+
+class DiagnosticEngine:
+    """Recompiled by a catalog listener when the catalog content changed; requests only do array math."""
+
+    def __init__(self):
+        self._compiled: Optional[CompiledCatalog] = None
+        self._fingerprint: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def compile(self, products: List[dict]) -> None:
+        # Rechargement à l'expiration du TTL sans modification : rien à recompiler
+        fingerprint = _catalog_fingerprint(products)
+        if fingerprint == self._fingerprint and self._compiled is not None:
+            return
+        compiled = CompiledCatalog(products)
+        with self._lock:
+            self._compiled = compiled
+            self._fingerprint = fingerprint
+
+    def compiled(self) -> Optional[CompiledCatalog]:
+        # Relit le catalogue si expiré ; le listener recompile les masques
+        catalog.get_products()
+        return self._compiled
+
+    def recommend(
+        self,
+        skin_type: str,
+        concerns: List[str],
+        routine: str = "complete",
+        budget_max_tnd: Optional[int] = None,
+    ) -> dict:
+        compiled = self.compiled()
+        if compiled is None or not compiled.products:
+            return {"routine": [], "steps_missing": list(ROUTINES[routine]), "total_tnd": 0}
+
+        weights = compiled.weights(SKIN_TYPES[skin_type][1])
+        for concern in concerns:
+            weights += compiled.weights(CONCERNS[concern][1])
+        scores = compiled.features.astype(np.float64) @ weights + compiled.tiebreak
+        for category, bonus in SKIN_TYPE_CATEGORY_BONUS.get(skin_type, {}).items():
+            scores += (compiled.categories == category) * bonus
+
+        eligible = compiled.in_stock.copy()
+        if skin_type == "sensitive":
+            excluded = compiled.features[:, [compiled.feature_keys.index(k) for k in SENSITIVE_EXCLUSIONS]].any(axis=1)
+            eligible &= ~excluded
+        if budget_max_tnd is not None:
+            eligible &= compiled.prices <= budget_max_tnd
+
+        positive = weights > 0
+        steps = []
+        missing = []
+        for step in ROUTINES[routine]:
+            candidates = np.flatnonzero(compiled.step_masks[step] & eligible)
+            if candidates.size == 0:
+                missing.append(step)
+                continue
+            ranked = candidates[np.argsort(-scores[candidates], kind="stable")][:ALTERNATIVES_PER_STEP + 1]
+            best = ranked[0]
+            steps.append({
+                "step": step,
+                "label": ROUTINE_STEPS[step][0],
+                "product": _product_summary(compiled.products[best]),
+                "score": round(float(scores[best]), 2),
+                "reasons": [
+                    FEATURES[compiled.feature_keys[j]][0]
+                    for j in np.flatnonzero(compiled.features[best] & positive)
+                ],
+                "alternatives": [_product_summary(compiled.products[i]) for i in ranked[1:]],
+            })
+
+        total = sum(s["product"]["price_tnd"] for s in steps)
+        return {"routine": steps, "steps_missing": missing, "total_tnd": total}
+
+
+def _feature_text(product: dict) -> str:
+    text = normalize_text(f"{product.get('name') or ''} {product.get('description') or ''}")
+    return " " + _NON_WORD.sub(" ", text) + " "
+
+
+def _normalize_pattern(pattern: str) -> str:
+    # Même normalisation que le texte ("anti-age" -> "anti age"), espaces de bord conservés
+    return _NON_WORD.sub(" ", normalize_text(pattern))
+
+
+# Champs lus par la compilation et par les résumés de produits
+_FINGERPRINT_FIELDS = (
+    "id", "name", "brand", "category", "description", "price_tnd", "original_price_tnd",
+    "discount_percentage", "image_url", "rating", "in_stock", "is_bestseller",
+)
+
+
+def _catalog_fingerprint(products: List[dict]) -> int:
+    checksum = 0
+    for p in products:
+        checksum = zlib.crc32(repr(tuple(p.get(field) for field in _FINGERPRINT_FIELDS)).encode("utf-8"), checksum)
+    return checksum
+
+
+def _product_summary(p: dict) -> dict:
+    return {
+        "id": p.get("id"),
+        "name": p.get("name"),
+        "brand": p.get("brand"),
+        "category": p.get("category"),
+        "price_tnd": p.get("price_tnd", 0),
+        "original_price_tnd": p.get("original_price_tnd", p.get("price_tnd", 0)),
+        "discount_percentage": p.get("discount_percentage", 0),
+        "image_url": p.get("image_url"),
+        "rating": p.get("rating"),
+        "in_stock": p.get("in_stock", True),
+    }
+
+
+def questionnaire() -> dict:
+    """Questions and options of the diagnostic, for the storefront form."""
+    return {
+        "skin_types": [{"value": k, "label": label} for k, (label, _) in SKIN_TYPES.items()],
+        "concerns": [{"value": k, "label": label} for k, (label, _) in CONCERNS.items()],
+        "routines": [
+            {"value": name, "steps": [{"value": s, "label": ROUTINE_STEPS[s][0]} for s in steps]}
+            for name, steps in ROUTINES.items()
+        ],
+    }
+
+
+diagnostic_engine = DiagnosticEngine()
+catalog.add_listener(diagnostic_engine.compile)
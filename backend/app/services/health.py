@@ -0,0 +1,153 @@
+"""Readiness and deep health report of the API process."""
+from datetime import datetime, timezone
+from typing import Dict
+import asyncio
+import logging
+import os
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+import pymongo
+
+from app.core.metrics import registry
+from app.core.security import password_hashing_stats
+from app.db.monitoring import pool_stats, registered_clients
+from app.services.background import background_tasks_status
+from app.services.cache import AsyncTTLCache, ttl_caches_stats
+from app.services.carts import cart_store
+from app.services.catalog import catalog
+from app.services.copurchases import copurchases
+from app.services.promotions import promotion_scheduler
+from app.services.similarity import similar_products
+
+logger = logging.getLogger(__name__)
+
+# Sondes des load balancers : un seul calcul par seconde au plus
+HEALTH_CACHE_TTL = float(os.environ.get("HEALTH_CACHE_TTL", "1"))
+HEALTH_PING_TIMEOUT = float(os.environ.get("HEALTH_PING_TIMEOUT", "2"))
+
+# Étapes du démarrage (import des produits, index...) : nom -> résultat
+_startup_checks: Dict[str, dict] = {}
+
+
+def record_startup_check(name: str, ok: bool, detail=None) -> None:
+    """Remember the outcome of a startup step for readiness."""
+    _startup_checks[name] = {"ok": ok, "detail": detail, "at": datetime.now(timezone.utc)}
+
+
+def _sync_ping(client) -> None:
+    # Borne aussi la sélection du serveur : le thread ne reste pas bloqué 30 s
+    with pymongo.timeout(HEALTH_PING_TIMEOUT):
+        client.admin.command("ping")
+
+
+async def _ping(name: str, client) -> dict:
+    started = time.perf_counter()
+    try:
+        if isinstance(client, AsyncIOMotorClient):
+            # Motor exécute la commande dans un thread : wait_for seul rendrait la main
+            # mais laisserait ce thread bloqué ; le timeout pymongo le libère aussi
+            with pymongo.timeout(HEALTH_PING_TIMEOUT):
+                await client.admin.command("ping")
+        else:
+            # pymongo : appel bloquant hors de la boucle
+            await asyncio.get_running_loop().run_in_executor(None, _sync_ping, client)
+    except Exception as e:
+        return {"ok": False, "error": repr(e), "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+
+async def _build_report() -> dict:
+    clients = registered_clients()
+    pings = await asyncio.gather(*(_ping(name, client) for name, client in clients.items()))
+    mongo = dict(zip(clients, pings))
+    pools = pool_stats()
+    for name, stats in mongo.items():
+        stats["pool"] = pools.get(name)
+
+    tasks = background_tasks_status()
+    checks = {
+        "mongo": all(ping["ok"] for ping in pings) and bool(pings),
+        "startup": all(check["ok"] for check in _startup_checks.values()),
+        "background_tasks": all(task["running"] for task in tasks.values()),
+    }
+    return {
+        "status": "ready" if all(checks.values()) else "unavailable",
+        "checks": checks,
+        "checked_at": datetime.now(timezone.utc),
+        "mongo": mongo,
+        "startup": dict(_startup_checks),
+        "background_tasks": tasks,
+        "catalog": catalog.stats(),
+        "carts": cart_store.stats(),
+        "password_hashing": password_hashing_stats(),
+        "promotions": promotion_scheduler.status(),
+        "copurchases": copurchases.stats(),
+        "similar_products": similar_products.stats(),
+    }
+
+
+_report_cache = AsyncTTLCache(HEALTH_CACHE_TTL, name="health")
+
+
+async def health_report() -> dict:
+    """Full report, computed at most once per HEALTH_CACHE_TTL seconds."""
+    return await _report_cache.get(_build_report)
+
+
+def runtime_metrics():
+    """Scrape-time samples (caches, pools, hashing pool, background tasks) for /metrics."""
+    catalog_stats = catalog.stats()
+    cart_stats = cart_store.stats()
+    caches = {
+        "catalog": (catalog_stats["hits"], catalog_stats["reloads"]),
+        "carts": (cart_stats["hits"], cart_stats["misses"]),
+        **{name: (stats["hits"], stats["misses"]) for name, stats in ttl_caches_stats().items()},
+    }
+    yield "cache_hits_total", "counter", "Cache lookups served from memory", [
+        ({"cache": name}, hits) for name, (hits, _) in caches.items()
+    ]
+    yield "cache_misses_total", "counter", "Cache lookups that had to load from MongoDB", [
+        ({"cache": name}, misses) for name, (_, misses) in caches.items()
+    ]
+    yield "cache_hit_ratio", "gauge", "Hits / lookups since start", [
+        ({"cache": name}, hits / (hits + misses) if hits + misses else None) for name, (hits, misses) in caches.items()
+    ]
+    yield "catalog_version", "gauge", "Catalog invalidation counter", [({}, catalog_stats["version"])]
+    yield "catalog_age_seconds", "gauge", "Age of the cached catalog", [({}, catalog_stats["age_seconds"])]
+    yield "catalog_products", "gauge", "Products in the cached catalog", [({}, catalog_stats["products"])]
+    yield "carts_dirty", "gauge", "Carts modified since the last flush", [({}, cart_stats["dirty"])]
+
+    pools = [
+        (client, address, pool, stats)
+        for client, stats in pool_stats().items()
+        for address, pool in stats["pools"].items()
+    ]
+    yield "mongodb_pool_checked_out_connections", "gauge", "Connections in use", [
+        ({"client": client, "address": address}, pool["checked_out"]) for client, address, pool, _ in pools
+    ]
+    yield "mongodb_pool_open_connections", "gauge", "Connections open", [
+        ({"client": client, "address": address}, pool["open"]) for client, address, pool, _ in pools
+    ]
+    yield "mongodb_pool_max_size", "gauge", "maxPoolSize of the pool", [
+        ({"client": client, "address": address}, pool["max_size"]) for client, address, pool, _ in pools
+    ]
+    yield "mongodb_pool_checkout_failures_total", "counter", "Failed connection checkouts", [
+        ({"client": client}, stats["checkout_failures"]) for client, stats in pool_stats().items()
+    ]
+
+    hashing = password_hashing_stats()
+    yield "password_hashing_in_flight", "gauge", "Password hashes being computed", [({}, hashing["in_flight"])]
+    yield "password_hashing_queue_depth", "gauge", "Password hashes waiting for a worker", [({}, hashing["queue_depth"])]
+    yield "password_hashing_rejected_total", "counter", "Hashes rejected (pool saturated)", [({}, hashing["rejected"])]
+
+    tasks = background_tasks_status()
+    yield "background_task_up", "gauge", "1 when the background task is running", [
+        ({"task": name}, 1 if task["running"] else 0) for name, task in tasks.items()
+    ]
+    yield "background_task_runs_total", "counter", "Completed iterations of the background task", [
+        ({"task": name}, task["runs"]) for name, task in tasks.items()
+    ]
+
+
+registry.add_collector(runtime_metrics)
@@ -0,0 +1,84 @@
+"""Stock reservation with atomic conditional updates."""
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from typing import List, Optional
+
+from app.services.catalog import invalidate_catalog
+from app.services.product_updates import IN_STOCK_EXPRESSION
+
+
+def _stock_delta_pipeline(delta: int) -> list:
+    """Update pipeline applying a stock delta and keeping in_stock in sync with quantity
+    (a product put out of stock by an admin stays so)."""
+    return [
+        {"$set": {"quantity": {"$add": ["$quantity", delta]}}},
+        {"$set": {"in_stock": IN_STOCK_EXPRESSION}},
+    ]
+
+
+async def _apply_stock_delta(db, query: dict, delta: int) -> Optional[bool]:
+    """Apply a stock delta to the product matching query.
+
+    Returns None when nothing matched, otherwise whether in_stock flipped
+    (read from the document as it was just before the update).
+    """
+    before = await db.products.find_one_and_update(
+        query,
+        _stock_delta_pipeline(delta),
+        projection={"_id": 0, "quantity": 1, "in_stock": 1, "stock_disabled": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        return None
+    in_stock = before["quantity"] + delta > 0 and not before.get("stock_disabled", False)
+    return before.get("in_stock", True) != in_stock
+
+
+async def release_stock(db, items: List[dict]) -> None:
+    """Give back the stock reserved by order items."""
+    flipped = False
+    for item in items:
+        if item.get("stock_reserved"):
+            flipped |= bool(await _apply_stock_delta(
+                db, {"id": item["product_id"], "quantity": {"$type": "number"}}, item["quantity"]
+            ))
+    # Le catalogue en mémoire expose in_stock : on le recharge seulement s'il a changé
+    if flipped:
+        invalidate_catalog()
+
+
+async def reserve_stock(db, items: List[dict]) -> None:
+    """Atomically decrement stock for every item flagged stock_reserved.
+
+    Each line is one conditional update ``quantity >= requested`` (never an
+    upsert). A line that matches nothing, because the stock is too low or the
+    product was deleted since the order was priced, stops the reservation:
+    the lines already applied are given back and a 409 is raised.
+
+    The lines are not sent as one bulk write: its result only has aggregate
+    counts, so after a partial failure nothing says which lines to give back
+    (short of a marker field on every product, or a transaction, which a
+    standalone server does not offer). Each update also returns the document
+    as it was, which tells whether in_stock flipped. Lines are distinct
+    products (checkout merges duplicates), so an order costs one round trip
+    per product it contains.
+    """
+    lines = [item for item in items if item.get("stock_reserved")]
+    applied = []
+    flipped = False
+    for item in lines:
+        result = await _apply_stock_delta(
+            db, {"id": item["product_id"], "quantity": {"$gte": item["quantity"]}}, -item["quantity"]
+        )
+        if result is None:
+            await release_stock(db, applied)
+            if flipped:
+                invalidate_catalog()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Stock insuffisant pour : {item.get('product_name') or item['product_id']}"
+            )
+        flipped |= result
+        applied.append(item)
+    if flipped:
+        invalidate_catalog()
@@ -0,0 +1,124 @@
+"""Streaming export of orders as NDJSON or CSV."""
+from datetime import datetime
+from typing import AsyncIterator, Optional
+import csv
+import io
+import json
+
+# Taille des lots lus depuis le curseur MongoDB
+EXPORT_BATCH_SIZE = 500
+
+ORDER_EXPORT_FIELDS = [
+    "order_number",
+    "id",
+    "created_at",
+    "status",
+    "user_id",
+    "user_name",
+    "user_email",
+    "user_phone",
+    "payment_method",
+    "items_count",
+    "subtotal_tnd",
+    "delivery_fee_tnd",
+    "discount_tnd",
+    "total_tnd",
+    "governorate",
+    "city",
+    "postal_code",
+    "confirmed_at",
+    "delivered_at",
+    "cancelled_at",
+]
+
+ITEM_EXPORT_FIELDS = [
+    "product_id",
+    "product_name",
+    "brand",
+    "quantity",
+    "unit_price_tnd",
+    "total_price_tnd",
+]
+
+EXPORT_PROJECTION = {
+    "_id": 0,
+    "status_history": 0,
+}
+
+
+def build_export_query(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[str] = None,
+) -> dict:
+    """Build the orders filter for an export (start inclusive, end exclusive)."""
+    query = {}
+    if start or end:
+        query["created_at"] = {}
+        if start:
+            query["created_at"]["$gte"] = start
+        if end:
+            query["created_at"]["$lt"] = end
+    if status:
+        query["status"] = status
+    return query
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _order_row(order: dict) -> dict:
+    """Flatten an order into the export columns."""
+    address = order.get("shipping_address") or {}
+    items = order.get("items") or []
+    row = {field: order.get(field) for field in ORDER_EXPORT_FIELDS}
+    row["items_count"] = order.get("items_count", len(items))
+    row["governorate"] = address.get("governorate")
+    row["city"] = address.get("city")
+    row["postal_code"] = address.get("postal_code")
+    return row
+
+
+def _item_rows(order: dict):
+    """Yield one row per order line, prefixed with the order columns."""
+    row = _order_row(order)
+    for item in order.get("items") or []:
+        yield {**row, **{f"item_{field}": item.get(field) for field in ITEM_EXPORT_FIELDS}}
+
+
+async def stream_orders(db, query: dict, fmt: str = "ndjson", flatten_items: bool = False) -> AsyncIterator[bytes]:
+    """Yield an export chunk by chunk straight from a batched cursor.
+
+    Only one batch of orders is held in memory at a time, whatever the
+    date range; for CSV the header is sent before the first query returns.
+    """
+    cursor = db.orders.find(query, EXPORT_PROJECTION).sort("created_at", 1).batch_size(EXPORT_BATCH_SIZE)
+
+    if fmt == "csv":
+        columns = ORDER_EXPORT_FIELDS + ([f"item_{field}" for field in ITEM_EXPORT_FIELDS] if flatten_items else [])
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        yield buffer.getvalue().encode()
+
+        async for order in cursor:
+            buffer.seek(0)
+            buffer.truncate(0)
+            rows = _item_rows(order) if flatten_items else [_order_row(order)]
+            for row in rows:
+                writer.writerow({
+                    key: value.isoformat() if isinstance(value, datetime) else value
+                    for key, value in row.items()
+                })
+            yield buffer.getvalue().encode()
+        return
+
+    async for order in cursor:
+        if flatten_items:
+            chunk = "".join(json.dumps(row, default=_json_default, ensure_ascii=False) + "\n" for row in _item_rows(order))
+        else:
+            chunk = json.dumps(order, default=_json_default, ensure_ascii=False) + "\n"
+        yield chunk.encode()
@@ -0,0 +1,88 @@
+"""Per-day order number allocator backed by a counters collection."""
+from pymongo import ReturnDocument
+from datetime import datetime, timezone
+import asyncio
+import os
+
+# Nombre de numéros réservés par aller-retour MongoDB
+ORDER_NUMBER_BLOCK_SIZE = int(os.environ.get("ORDER_NUMBER_BLOCK_SIZE", "20"))
+
+
+class OrderNumberAllocator:
+    """Hand out ORD-YYYYMMDD-NNNN numbers from blocks reserved with one $inc.
+
+    Each worker reserves a block of consecutive sequence numbers for the
+    current day and serves them from memory. Blocks never overlap between
+    workers, so numbers stay unique; numbers left in a block when a worker
+    stops or the day changes are simply skipped (gaps are expected).
+    """
+
+    def __init__(self, block_size: int = ORDER_NUMBER_BLOCK_SIZE):
+        self.block_size = max(1, block_size)
+        self._day = None
+        self._next = 1
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    async def _reserve_block(self, db, day: str) -> None:
+        counter = await db.counters.find_one_and_update(
+            {"_id": f"order_number:{day}"},
+            {"$inc": {"seq": self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._day = day
+        self._end = counter["seq"]
+        self._next = self._end - self.block_size + 1
+
+    async def next(self, db) -> str:
+        """Return the next order number for today."""
+        day = datetime.now(timezone.utc).strftime("%Y%m%d")
+        async with self._lock:
+            if day != self._day or self._next > self._end:
+                await self._reserve_block(db, day)
+            seq = self._next
+            self._next += 1
+        return f"ORD-{day}-{seq:04d}"
+
+
+order_number_allocator = OrderNumberAllocator()
+
+
+async def allocate_order_number(db) -> str:
+    """Allocate a unique order number."""
+    return await order_number_allocator.next(db)
+
+
+async def dedupe_order_numbers(db) -> int:
+    """Renumber orders sharing an order_number so the unique index can be built.
+
+    Legacy data may hold duplicates (or orders without a number). The
+    oldest order of each group keeps its number; the others get it with a
+    -2, -3... suffix, which the allocator never produces, and keep the old
+    value in original_order_number. Orders without a number get a new one.
+    Returns the number of orders renumbered.
+    """
+    duplicates = db.orders.aggregate([
+        {"$sort": {"created_at": 1, "id": 1}},
+        {"$group": {"_id": "$order_number", "ids": {"$push": "$id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    renumbered = 0
+    async for group in duplicates:
+        number = group["_id"]
+        suffix = 1
+        for order_id in group["ids"][1:]:
+            if number is None:
+                new_number = await allocate_order_number(db)
+            else:
+                suffix += 1
+                while await db.orders.count_documents({"order_number": f"{number}-{suffix}"}, limit=1):
+                    suffix += 1
+                new_number = f"{number}-{suffix}"
+            await db.orders.update_one(
+                {"id": order_id},
+                {"$set": {"order_number": new_number, "original_order_number": number}}
+            )
+            renumbered += 1
+    return renumbered
@@ -0,0 +1,127 @@
+"""Order status state machine shared by client and admin routes."""
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from app.models.order import OrderStatus
+from app.services.inventory import release_stock
+from app.services.sales_rollups import record_status_change
+from app.services.product_sales import record_product_sales
+from app.services.copurchases import record_order_pairs
+from app.services.client_stats import record_client_cancellation
+
+PENDING = OrderStatus.PENDING.value
+CONFIRMED = OrderStatus.CONFIRMED.value
+PREPARING = OrderStatus.PREPARING.value
+SHIPPED = OrderStatus.SHIPPED.value
+DELIVERED = OrderStatus.DELIVERED.value
+CANCELLED = OrderStatus.CANCELLED.value
+
+# Transitions autorisées : on peut avancer (éventuellement en sautant une étape)
+# ou annuler, jamais revenir en arrière ni sortir d'un état final
+ALLOWED_TRANSITIONS = {
+    PENDING: {CONFIRMED, PREPARING, SHIPPED, DELIVERED, CANCELLED},
+    CONFIRMED: {PREPARING, SHIPPED, DELIVERED, CANCELLED},
+    PREPARING: {SHIPPED, DELIVERED, CANCELLED},
+    SHIPPED: {DELIVERED, CANCELLED},
+    DELIVERED: set(),
+    CANCELLED: set(),
+}
+
+# Le client ne peut annuler qu'avant la préparation
+CLIENT_CANCELLABLE_STATUSES = {PENDING, CONFIRMED}
+
+# Champs de l'ancienne version de la commande utiles aux effets de bord
+TRANSITION_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "user_id": 1,
+    "status": 1,
+    "items": 1,
+    "created_at": 1,
+    "total_tnd": 1,
+    "delivery_fee_tnd": 1,
+    "shipping_address.governorate": 1,
+}
+
+
+def allowed_sources(new_status: str) -> set:
+    """Return the statuses an order may be in to move to new_status."""
+    return {source for source, targets in ALLOWED_TRANSITIONS.items() if new_status in targets}
+
+
+async def transition_order(
+    db,
+    order_id: str,
+    new_status: str,
+    changed_by: str,
+    query: Optional[dict] = None,
+    from_statuses: Optional[Iterable[str]] = None,
+    error_detail: Optional[str] = None,
+) -> dict:
+    """Move an order to new_status in one atomic find_one_and_update.
+
+    The filter only matches when the current status allows the transition,
+    and the history entry is appended with $push, so concurrent transitions
+    cannot overwrite each other. ``query`` restricts the match (e.g. to the
+    owner of the order) and ``from_statuses`` narrows the allowed sources.
+    Returns the order as it was before the transition.
+    """
+    if new_status not in ALLOWED_TRANSITIONS:
+        valid_statuses = [s.value for s in OrderStatus]
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Statut invalide. Statuts valides: {valid_statuses}"
+        )
+
+    sources = allowed_sources(new_status)
+    if from_statuses is not None:
+        sources &= set(from_statuses)
+
+    now = datetime.now(timezone.utc)
+    updates = {"status": new_status, "updated_at": now}
+    if new_status == CONFIRMED:
+        updates["confirmed_at"] = now
+    elif new_status == DELIVERED:
+        updates["delivered_at"] = now
+    elif new_status == CANCELLED:
+        updates["cancelled_at"] = now
+        updates["cancelled_by"] = changed_by.split(":")[0]
+
+    match = {**(query or {}), "id": order_id}
+    previous = await db.orders.find_one_and_update(
+        {**match, "status": {"$in": sorted(sources)}},
+        {
+            "$set": updates,
+            "$push": {"status_history": {
+                "status": new_status,
+                "changed_at": now,
+                "changed_by": changed_by
+            }}
+        },
+        projection=TRANSITION_PROJECTION,
+        return_document=ReturnDocument.BEFORE
+    )
+
+    if previous is None:
+        # Échec : relire uniquement pour distinguer 404 et transition refusée
+        current = await db.orders.find_one(match, {"_id": 0, "status": 1})
+        if current is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Commande non trouvée"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=error_detail or f"Transition impossible : {current['status']} → {new_status}"
+        )
+
+    if new_status == CANCELLED:
+        await release_stock(db, previous.get("items", []))
+        await record_product_sales(db, previous, -1)
+        await record_order_pairs(db, previous, -1)
+        await record_client_cancellation(db, previous)
+    await record_status_change(db, previous, new_status)
+
+    return previous
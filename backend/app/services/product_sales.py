@@ -0,0 +1,188 @@
+"""Per-product sales counters, rolling windows and automatic bestsellers."""
+from pymongo import UpdateOne
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+
+from app.services.catalog import invalidate_catalog
+from app.services.sales_rollups import order_day
+
+logger = logging.getLogger(__name__)
+
+DAILY_COLLECTION = "product_sales_daily"
+
+# Fenêtres glissantes (en jours) recopiées sur les produits : sales_7d, sales_30d
+SALES_WINDOWS = (7, 30)
+SALES_WINDOWS_REFRESH_SECONDS = int(os.environ.get("SALES_WINDOWS_REFRESH_SECONDS", "600"))
+
+# Mode optionnel : is_bestseller déduit des ventes sur 30 jours
+AUTO_BESTSELLERS = os.environ.get("AUTO_BESTSELLERS", "false").lower() in ("1", "true", "yes")
+AUTO_BESTSELLERS_COUNT = int(os.environ.get("AUTO_BESTSELLERS_COUNT", "8"))
+AUTO_BESTSELLERS_WINDOW = int(os.environ.get("AUTO_BESTSELLERS_WINDOW", "30"))
+
+TOP_PRODUCTS_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "name": 1,
+    "image_url": 1,
+    "brand": 1,
+    "sold_quantity": 1,
+    "sold_revenue_tnd": 1,
+}
+
+
+async def record_product_sales(db, order: dict, sign: int = 1) -> None:
+    """Add (sign=1, creation) or remove (sign=-1, cancellation) an order's lines from the counters."""
+    items = order.get("items") or []
+    if not items:
+        return
+    day = order_day(order.get("created_at"))
+    product_updates = []
+    daily_updates = []
+    for item in items:
+        quantity = sign * item.get("quantity", 0)
+        revenue = sign * (item.get("total_price_tnd") or item.get("unit_price_tnd", 0) * item.get("quantity", 0))
+        product_updates.append(UpdateOne(
+            {"id": item["product_id"]},
+            {"$inc": {"sold_quantity": quantity, "sold_revenue_tnd": revenue}}
+        ))
+        daily_updates.append(UpdateOne(
+            {"_id": f"{item['product_id']}|{day}"},
+            {
+                "$inc": {"quantity": quantity, "revenue_tnd": revenue},
+                "$setOnInsert": {"product_id": item["product_id"], "day": day},
+            },
+            upsert=True
+        ))
+    try:
+        await db.products.bulk_write(product_updates, ordered=False)
+        await db[DAILY_COLLECTION].bulk_write(daily_updates, ordered=False)
+    except Exception as e:
+        logger.error(f"❌ Product sales update failed for order {order.get('id')}: {e}")
+
+
+async def refresh_sales_windows(db) -> int:
+    """Recompute sales_7d / sales_30d on products from the daily counters.
+
+    Reads at most (products x 30) daily rows and writes only products whose
+    window values change. With AUTO_BESTSELLERS, is_bestseller is set on the
+    top AUTO_BESTSELLERS_COUNT products of the configured window.
+    """
+    today = datetime.now(timezone.utc).date()
+    since = {window: (today - timedelta(days=window - 1)).isoformat() for window in SALES_WINDOWS}
+    oldest = min(since.values())
+
+    rows = await db[DAILY_COLLECTION].aggregate([
+        {"$match": {"day": {"$gte": oldest}}},
+        {"$group": {
+            "_id": "$product_id",
+            **{
+                f"sales_{window}d": {"$sum": {"$cond": [{"$gte": ["$day", since[window]]}, "$quantity", 0]}}
+                for window in SALES_WINDOWS
+            },
+        }},
+    ]).to_list(None)
+    windows = {row["_id"]: row for row in rows}
+
+    fields = [f"sales_{window}d" for window in SALES_WINDOWS]
+    bestseller_field = f"sales_{AUTO_BESTSELLERS_WINDOW}d"
+    bestsellers = set()
+    if AUTO_BESTSELLERS:
+        ranked = sorted(
+            (row for row in rows if row.get(bestseller_field, 0) > 0),
+            key=lambda row: row.get(bestseller_field, 0),
+            reverse=True
+        )
+        bestsellers = {row["_id"] for row in ranked[:AUTO_BESTSELLERS_COUNT]}
+
+    # Produits déjà porteurs de valeurs (à remettre à zéro s'ils sortent des fenêtres)
+    current_query = {"$or": [{field: {"$gt": 0}} for field in fields] + [{"id": {"$in": list(windows)}}]}
+    if AUTO_BESTSELLERS:
+        current_query["$or"].append({"is_bestseller": True})
+    projection = {"_id": 0, "id": 1, "is_bestseller": 1, **{field: 1 for field in fields}}
+    current = await db.products.find(current_query, projection).to_list(None)
+
+    operations = []
+    bestsellers_changed = False
+    for product in current:
+        row = windows.get(product["id"], {})
+        updates = {field: row.get(field, 0) for field in fields if product.get(field, 0) != row.get(field, 0)}
+        if AUTO_BESTSELLERS:
+            is_bestseller = product["id"] in bestsellers
+            if product.get("is_bestseller", False) != is_bestseller:
+                updates["is_bestseller"] = is_bestseller
+                bestsellers_changed = True
+        if updates:
+            operations.append(UpdateOne({"id": product["id"]}, {"$set": updates}))
+
+    if operations:
+        await db.products.bulk_write(operations, ordered=False)
+    if bestsellers_changed:
+        invalidate_catalog()
+    return len(operations)
+
+
+async def rebuild_product_sales(db) -> int:
+    """Recompute daily counters and lifetime totals from the orders (excluding cancelled)."""
+    await db.orders.aggregate([
+        {"$match": {"status": {"$ne": "cancelled"}}},
+        {"$unwind": "$items"},
+        {"$group": {
+            "_id": {
+                "product_id": "$items.product_id",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+            },
+            "quantity": {"$sum": "$items.quantity"},
+            "revenue_tnd": {"$sum": {"$ifNull": [
+                "$items.total_price_tnd",
+                {"$multiply": ["$items.unit_price_tnd", "$items.quantity"]}
+            ]}},
+        }},
+        {"$project": {
+            "_id": {"$concat": ["$_id.product_id", "|", "$_id.day"]},
+            "product_id": "$_id.product_id",
+            "day": "$_id.day",
+            "quantity": 1,
+            "revenue_tnd": 1,
+        }},
+        {"$out": DAILY_COLLECTION},
+    ]).to_list(None)
+
+    totals = await db[DAILY_COLLECTION].aggregate([
+        {"$group": {"_id": "$product_id", "quantity": {"$sum": "$quantity"}, "revenue_tnd": {"$sum": "$revenue_tnd"}}}
+    ]).to_list(None)
+
+    await db.products.update_many({}, {"$set": {"sold_quantity": 0, "sold_revenue_tnd": 0}})
+    if totals:
+        await db.products.bulk_write([
+            UpdateOne({"id": row["_id"]}, {"$set": {"sold_quantity": row["quantity"], "sold_revenue_tnd": row["revenue_tnd"]}})
+            for row in totals
+        ], ordered=False)
+    await refresh_sales_windows(db)
+    return len(totals)
+
+
+async def ensure_product_sales(db) -> None:
+    """Build the counters on first start when orders already exist."""
+    if await db[DAILY_COLLECTION].find_one({}, {"_id": 1}) is None and await db.orders.find_one({}, {"_id": 1}):
+        count = await rebuild_product_sales(db)
+        logger.info(f"✅ Product sales counters rebuilt ({count} products)")
+
+
+async def top_products(db, limit: int = 8) -> list:
+    """Top sellers by lifetime quantity, read with an indexed sort on products."""
+    products = await db.products.find(
+        {"sold_quantity": {"$gt": 0}},
+        TOP_PRODUCTS_PROJECTION
+    ).sort("sold_quantity", -1).limit(limit).to_list(limit)
+    return [
+        {
+            "_id": p["id"],
+            "product_name": p.get("name"),
+            "product_image": p.get("image_url"),
+            "brand": p.get("brand"),
+            "total_sold": p.get("sold_quantity", 0),
+            "total_revenue_tnd": p.get("sold_revenue_tnd", 0),
+        }
+        for p in products
+    ]
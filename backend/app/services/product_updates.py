@@ -0,0 +1,105 @@
+"""Server-side product updates expressed as aggregation-pipeline updates."""
+from datetime import datetime
+from typing import List
+
+# Champs modifiables tels quels
+PLAIN_FIELDS = (
+    "name", "brand", "category", "description", "image_url", "volume",
+    "in_stock", "is_new", "is_bestseller", "quantity",
+    "price_tnd", "original_price_tnd", "discount_percentage",
+)
+
+
+def validate_product_patch(patch: dict) -> List[str]:
+    """Return the validation errors of a product patch (empty list when valid)."""
+    errors = []
+    if not patch:
+        errors.append("Aucune modification fournie")
+    for field in ("name", "brand", "category"):
+        if field in patch and not str(patch[field]).strip():
+            errors.append(f"{field} ne peut pas être vide")
+    for field in ("price_tnd", "original_price_tnd", "quantity"):
+        if field in patch and patch[field] < 0:
+            errors.append(f"{field} doit être positif")
+    discount = patch.get("discount_percentage")
+    if discount is not None and not 0 <= discount < 100:
+        errors.append("discount_percentage doit être compris entre 0 et 99")
+    return errors
+
+
+def discounted_price_stage(discount) -> dict:
+    """Pipeline stage deriving price_tnd from original_price_tnd and a discount.
+
+    ``discount`` is a number or an aggregation expression. Like
+    ``original_price_tnd or price_tnd``, the original price falls back to the
+    current price when missing or not positive (0 means "no original price"),
+    and the discounted price is truncated like
+    ``int(original * (1 - discount / 100))``.
+    """
+    original = {"$cond": [{"$gt": ["$original_price_tnd", 0]}, "$original_price_tnd", "$price_tnd"]}
+    return {"$set": {
+        "original_price_tnd": original,
+        "discount_percentage": {"$cond": [{"$gt": [discount, 0]}, discount, 0]},
+        "price_tnd": {"$cond": [
+            {"$gt": [discount, 0]},
+            {"$toInt": {"$floor": {"$multiply": [original, {"$subtract": [1, {"$divide": [discount, 100]}]}]}}},
+            original
+        ]},
+    }}
+
+
+# in_stock dérivé : pas de rupture forcée par un admin (stock_disabled),
+# et stock non suivi ou positif
+IN_STOCK_EXPRESSION = {"$and": [
+    {"$ne": [{"$ifNull": ["$stock_disabled", False]}, True]},
+    {"$or": [
+        {"$eq": [{"$ifNull": ["$quantity", None]}, None]},
+        {"$gt": ["$quantity", 0]},
+    ]},
+]}
+
+
+def toggle_stock_pipeline(now: datetime) -> list:
+    """Update pipeline for the admin stock switch.
+
+    The switch sets the manual override (stock_disabled) rather than
+    in_stock itself, which is then derived: a product put out of stock
+    stays so when a release gives quantity back, and putting a tracked
+    product back in stock only shows it when quantity is positive.
+    """
+    return [
+        {"$set": {
+            "stock_disabled": {"$eq": [{"$ifNull": ["$in_stock", True]}, True]},
+            "updated_at": {"$literal": now},
+        }},
+        {"$set": {"in_stock": IN_STOCK_EXPRESSION}},
+    ]
+
+
+def toggle_flag_pipeline(field: str, default: bool, now: datetime) -> list:
+    """Update pipeline flipping a boolean field on the server (missing counts as ``default``)."""
+    return [{"$set": {
+        field: {"$eq": [{"$ifNull": [f"${field}", default]}, False]},
+        "updated_at": {"$literal": now},
+    }}]
+
+
+def build_product_update_pipeline(patch: dict, now: datetime) -> list:
+    """Translate a product patch into an update pipeline, without reading the document.
+
+    Values are wrapped in $literal so user input is never read as a field
+    path; an explicit in_stock sets the manual override (stock_disabled) and
+    in_stock is derived from it and the quantity; a discount re-derives
+    price_tnd on the server from the stored original price.
+    """
+    values = {field: {"$literal": patch[field]} for field in PLAIN_FIELDS if field in patch and field != "in_stock"}
+    if "in_stock" in patch:
+        values["stock_disabled"] = {"$literal": not patch["in_stock"]}
+    values["updated_at"] = {"$literal": now}
+
+    pipeline = [{"$set": values}]
+    if "quantity" in patch or "in_stock" in patch:
+        pipeline.append({"$set": {"in_stock": IN_STOCK_EXPRESSION}})
+    if "discount_percentage" in patch:
+        pipeline.append(discounted_price_stage("$discount_percentage"))
+    return pipeline
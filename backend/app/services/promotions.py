@@ -0,0 +1,259 @@
+"""Promotion scheduler: applies and reverts promotion discounts at their boundaries."""
+from pymongo import UpdateMany, UpdateOne
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+import asyncio
+import heapq
+import logging
+import os
+
+from app.models.promotion import PromotionStatus
+from app.services.background import BackgroundTask, start_background_task
+from app.services.catalog import invalidate_catalog
+from app.services.product_updates import discounted_price_stage
+
+logger = logging.getLogger(__name__)
+
+SCHEDULED = PromotionStatus.SCHEDULED.value
+RUNNING = PromotionStatus.RUNNING.value
+ENDED = PromotionStatus.ENDED.value
+
+START = "start"
+END = "end"
+
+# Nombre d'échéances à venir chargées dans le tas à chaque passage
+PROMOTION_EVENTS_PREFETCH = int(os.environ.get("PROMOTION_EVENTS_PREFETCH", "200"))
+# Sommeil max : rattrape les promotions créées ou modifiées par un autre worker
+PROMOTION_SCHEDULER_MAX_SLEEP = float(os.environ.get("PROMOTION_SCHEDULER_MAX_SLEEP", "300"))
+
+PROMOTION_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "product_ids": 1,
+    "product_id": 1,
+    "discount_percentage": 1,
+    "is_active": 1,
+    "start_date": 1,
+    "end_date": 1,
+    "status": 1,
+}
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Return an aware UTC datetime (MongoDB returns naive UTC datetimes)."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def promotion_product_ids(promotion: dict) -> List[str]:
+    """Products targeted by a promotion, including the legacy single product_id."""
+    ids = list(promotion.get("product_ids") or [])
+    if promotion.get("product_id") and promotion["product_id"] not in ids:
+        ids.append(promotion["product_id"])
+    return ids
+
+
+async def overlapping_promotions(
+    db,
+    product_ids: List[str],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    exclude_id: Optional[str] = None,
+) -> List[dict]:
+    """Promotions not yet ended that share a product with the window [start_date, end_date).
+
+    A product carries a single promotion at a time (promotion_id and
+    pre_promotion_discount): two overlapping promotions would restore the
+    wrong discount when the first one ends.
+    """
+    conditions = [
+        {"status": {"$ne": ENDED}},
+        {"$or": [{"product_ids": {"$in": product_ids}}, {"product_id": {"$in": product_ids}}]},
+    ]
+    if start_date is not None:
+        conditions.append({"$or": [{"end_date": None}, {"end_date": {"$gt": start_date}}]})
+    if end_date is not None:
+        conditions.append({"$or": [{"start_date": None}, {"start_date": {"$lt": end_date}}]})
+    if exclude_id is not None:
+        conditions.append({"id": {"$ne": exclude_id}})
+    return await db.promotions.find(
+        {"$and": conditions},
+        {"_id": 0, "id": 1, "name": 1, "product_ids": 1, "product_id": 1}
+    ).to_list(None)
+
+
+def apply_operations(promotion: dict, now: datetime) -> list:
+    """Bulk operations applying a promotion's discount to its products.
+
+    The discount the product had before is kept in pre_promotion_discount
+    (only the first time). Promotions on a same product never overlap
+    (see overlapping_promotions), so the revert restores that discount.
+    """
+    return [UpdateMany(
+        {"id": {"$in": promotion_product_ids(promotion)}},
+        [
+            {"$set": {
+                "promotion_id": {"$literal": promotion["id"]},
+                "pre_promotion_discount": {"$ifNull": [
+                    "$pre_promotion_discount",
+                    {"$ifNull": ["$discount_percentage", 0]}
+                ]},
+                "updated_at": {"$literal": now},
+            }},
+            discounted_price_stage({"$literal": promotion["discount_percentage"]}),
+        ]
+    )]
+
+
+def revert_operations(promotion: dict, now: datetime) -> list:
+    """Bulk operations restoring the pre-promotion discount of the products it still owns."""
+    return [UpdateMany(
+        {"id": {"$in": promotion_product_ids(promotion)}, "promotion_id": promotion["id"]},
+        [
+            discounted_price_stage({"$ifNull": ["$pre_promotion_discount", 0]}),
+            {"$set": {"updated_at": {"$literal": now}}},
+            {"$project": {"promotion_id": 0, "pre_promotion_discount": 0}},
+        ]
+    )]
+
+
+async def process_due_promotions(db, now: Optional[datetime] = None) -> int:
+    """Apply every promotion whose start has passed and revert every one that ended.
+
+    All product changes go out in one ordered bulk_write (reverts first, so a
+    promotion ending at midnight never overrides one starting at midnight),
+    followed by a single catalog invalidation. Operations are idempotent, so
+    several workers running the scheduler at once are harmless.
+    """
+    now = now or datetime.now(timezone.utc)
+
+    to_start = await db.promotions.find(
+        {"status": SCHEDULED, "is_active": True, "start_date": {"$lte": now}},
+        PROMOTION_PROJECTION
+    ).to_list(None)
+    to_end = await db.promotions.find(
+        {"status": RUNNING, "$or": [{"end_date": {"$lte": now}}, {"is_active": False}]},
+        PROMOTION_PROJECTION
+    ).to_list(None)
+
+    product_operations = []
+    status_operations = []
+    for promotion in to_end:
+        product_operations.extend(revert_operations(promotion, now))
+        status_operations.append(UpdateOne(
+            {"id": promotion["id"], "status": RUNNING},
+            {"$set": {"status": ENDED, "ended_at": now}}
+        ))
+    for promotion in to_start:
+        end_date = as_utc(promotion.get("end_date"))
+        if end_date is not None and end_date <= now:
+            # Fenêtre entièrement passée (ex. serveur arrêté) : rien à appliquer
+            status_operations.append(UpdateOne(
+                {"id": promotion["id"], "status": SCHEDULED},
+                {"$set": {"status": ENDED, "ended_at": now}}
+            ))
+            continue
+        product_operations.extend(apply_operations(promotion, now))
+        status_operations.append(UpdateOne(
+            {"id": promotion["id"], "status": SCHEDULED},
+            {"$set": {"status": RUNNING, "applied_at": now}}
+        ))
+
+    if product_operations:
+        await db.products.bulk_write(product_operations, ordered=True)
+        invalidate_catalog()
+    if status_operations:
+        await db.promotions.bulk_write(status_operations, ordered=False)
+    if to_start or to_end:
+        logger.info(f"✅ Promotions processed: {len(to_start)} started, {len(to_end)} ended")
+    return len(to_start) + len(to_end)
+
+
+async def revert_promotion(db, promotion: dict) -> None:
+    """Remove a running promotion's discounts immediately (edit or deletion)."""
+    if promotion.get("status") != RUNNING:
+        return
+    await db.products.bulk_write(revert_operations(promotion, datetime.now(timezone.utc)), ordered=True)
+    invalidate_catalog()
+
+
+class PromotionScheduler:
+    """Sleep until the next promotion boundary, then process what is due.
+
+    Upcoming start and end dates are read with date-indexed queries into a
+    heap; the scheduler wakes at its head, or earlier when ``wake()`` is
+    called after an admin change.
+    """
+
+    def __init__(self):
+        self._events: List[Tuple[datetime, str, str]] = []
+        self._wake = asyncio.Event()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    async def load_events(self, db) -> None:
+        """Refill the heap with the next start and end boundaries."""
+        limit = PROMOTION_EVENTS_PREFETCH
+        starts = await db.promotions.find(
+            {"status": SCHEDULED, "is_active": True},
+            {"_id": 0, "id": 1, "start_date": 1}
+        ).sort("start_date", 1).limit(limit).to_list(limit)
+        ends = await db.promotions.find(
+            {"status": RUNNING, "end_date": {"$ne": None}},
+            {"_id": 0, "id": 1, "end_date": 1}
+        ).sort("end_date", 1).limit(limit).to_list(limit)
+
+        events = [(as_utc(p["start_date"]), START, p["id"]) for p in starts if p.get("start_date")]
+        events += [(as_utc(p["end_date"]), END, p["id"]) for p in ends]
+        heapq.heapify(events)
+        self._events = events
+
+    def next_boundary(self) -> Optional[datetime]:
+        return self._events[0][0] if self._events else None
+
+    def _pop_due(self, now: datetime) -> int:
+        due = 0
+        while self._events and self._events[0][0] <= now:
+            heapq.heappop(self._events)
+            due += 1
+        return due
+
+    async def run(self, db, entry: BackgroundTask) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                now = datetime.now(timezone.utc)
+                self._pop_due(now)
+                await process_due_promotions(db, now)
+                await self.load_events(db)
+                entry.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                entry.last_error = repr(e)
+                logger.error(f"❌ Promotion scheduler failed: {e}")
+            entry.heartbeat()
+
+            delay = PROMOTION_SCHEDULER_MAX_SLEEP
+            boundary = self.next_boundary()
+            if boundary is not None:
+                delay = min(max((boundary - datetime.now(timezone.utc)).total_seconds(), 0), delay)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def status(self) -> dict:
+        return {"upcoming_events": len(self._events), "next_boundary": self.next_boundary()}
+
+
+promotion_scheduler = PromotionScheduler()
+
+
+def start_promotion_scheduler(db) -> BackgroundTask:
+    """Start the promotion scheduler in the background task registry."""
+    return start_background_task("promotions", lambda entry: promotion_scheduler.run(db, entry))
@@ -0,0 +1,245 @@
+"""Catalog repricing from EUR cost prices, exchange rate and margin, vectorized with NumPy."""
+from pymongo import UpdateOne
+from datetime import datetime, timezone
+from typing import List, Optional
+import logging
+import os
+
+import numpy as np
+
+from app.services.catalog import invalidate_catalog
+
+logger = logging.getLogger(__name__)
+
+# Valeurs du dernier calcul des prix (metadata de data/products.json)
+DEFAULT_EXCHANGE_RATE = float(os.environ.get("REPRICING_EXCHANGE_RATE", "3.3"))
+DEFAULT_MARGIN = float(os.environ.get("REPRICING_MARGIN", "0.40"))
+REPRICING_BATCH_SIZE = int(os.environ.get("REPRICING_BATCH_SIZE", "1000"))
+
+# Derniers paramètres appliqués (collection settings)
+PRICING_SETTINGS_ID = "pricing"
+
+# Arrondi du prix d'origine en TND
+ROUNDING_RULES = ("round", "floor", "ceil_5", "ceil_10", "ends_9")
+
+REPRICING_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "name": 1,
+    "price_eur": 1,
+    "price_tnd": 1,
+    "original_price_tnd": 1,
+    "discount_percentage": 1,
+}
+
+
+def validate_pricing_parameters(exchange_rate: float, margin: float, cost_factor: Optional[float]) -> None:
+    """Raise ValueError for parameters that would price products at 0 or below."""
+    if not exchange_rate > 0:
+        raise ValueError("Le taux de change doit être positif")
+    if not margin >= 0:
+        raise ValueError("La marge ne peut pas être négative")
+    if cost_factor is not None and not cost_factor > 0:
+        raise ValueError("Le facteur de coût doit être positif")
+
+
+def _apply_rounding(values: np.ndarray, rounding: str) -> np.ndarray:
+    if rounding == "round":
+        return np.rint(values)
+    if rounding == "floor":
+        return np.floor(values)
+    if rounding == "ceil_5":
+        return np.ceil(values / 5) * 5
+    if rounding == "ceil_10":
+        return np.ceil(values / 10) * 10
+    if rounding == "ends_9":
+        # 41 -> 49, 49 -> 49, 50 -> 59
+        return np.ceil((values + 1) / 10) * 10 - 1
+    raise ValueError(f"Unknown rounding rule: {rounding}")
+
+
+def load_price_arrays(products: List[dict]) -> dict:
+    """Columnar view of the catalog prices (missing EUR prices become NaN)."""
+    price_eur = np.array(
+        [p["price_eur"] if p.get("price_eur") is not None else np.nan for p in products],
+        dtype=np.float64
+    )
+    price = np.array([p.get("price_tnd") or 0 for p in products], dtype=np.int64)
+    original = np.array(
+        [p.get("original_price_tnd") or p.get("price_tnd") or 0 for p in products],
+        dtype=np.int64
+    )
+    discount = np.array([p.get("discount_percentage") or 0 for p in products], dtype=np.int64)
+    return {
+        "ids": [p["id"] for p in products],
+        "names": [p.get("name") for p in products],
+        "price_eur": price_eur,
+        "price": price,
+        "original": original,
+        "discount": discount,
+    }
+
+
+def implied_cost_factor(arrays: dict, exchange_rate: float, margin: float) -> float:
+    """Median ratio between current original prices and eur * rate * (1 + margin).
+
+    Current TND prices include costs (shipping, customs) that the metadata
+    does not record; calibrating on them keeps the price level when only the
+    rate or the margin changes.
+    """
+    base = arrays["price_eur"] * exchange_rate * (1 + margin)
+    mask = np.isfinite(base) & (base > 0) & (arrays["original"] > 0)
+    if not mask.any():
+        return 1.0
+    return float(np.median(arrays["original"][mask] / base[mask]))
+
+
+def plan_repricing(
+    products: List[dict],
+    exchange_rate: float = DEFAULT_EXCHANGE_RATE,
+    margin: float = DEFAULT_MARGIN,
+    rounding: str = "round",
+    cost_factor: Optional[float] = None,
+    sample_size: int = 20,
+) -> dict:
+    """Compute new prices for the whole catalog in one vectorized pass (no writes).
+
+    original_price_tnd = rounding(price_eur * exchange_rate * cost_factor * (1 + margin))
+    price_tnd = int(original * (1 - discount / 100)), as for manual discounts.
+    Products without price_eur keep their prices. ``cost_factor`` defaults
+    to the factor implied by the current prices at the default rate and margin.
+    Raises ValueError for invalid parameters or when any new price is <= 0.
+    """
+    if rounding not in ROUNDING_RULES:
+        raise ValueError(f"Unknown rounding rule: {rounding}")
+    validate_pricing_parameters(exchange_rate, margin, cost_factor)
+    arrays = load_price_arrays(products)
+    if cost_factor is None:
+        cost_factor = implied_cost_factor(arrays, DEFAULT_EXCHANGE_RATE, DEFAULT_MARGIN)
+
+    priced = np.isfinite(arrays["price_eur"]) & (arrays["price_eur"] > 0)
+    raw = np.where(priced, arrays["price_eur"], 0) * exchange_rate * cost_factor * (1 + margin)
+    new_original = np.where(priced, _apply_rounding(raw, rounding), arrays["original"]).astype(np.int64)
+    new_price = np.where(
+        arrays["discount"] > 0,
+        np.floor(new_original * (1 - arrays["discount"] / 100)),
+        new_original
+    ).astype(np.int64)
+
+    non_positive = priced & (new_price <= 0)
+    if non_positive.any():
+        raise ValueError(f"Plan refusé : {int(non_positive.sum())} produit(s) auraient un prix nul ou négatif")
+
+    changed = priced & ((new_original != arrays["original"]) | (new_price != arrays["price"]))
+    delta = new_price - arrays["price"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta_pct = np.where(arrays["price"] > 0, delta / arrays["price"] * 100, 0.0)
+
+    changed_idx = np.flatnonzero(changed)
+    largest = changed_idx[np.argsort(-np.abs(delta_pct[changed_idx]), kind="stable")][:sample_size]
+
+    stats = {
+        "products": len(products),
+        "priced": int(priced.sum()),
+        "skipped_no_price_eur": int((~priced).sum()),
+        "changed": int(changed.sum()),
+        "increased": int((changed & (delta > 0)).sum()),
+        "decreased": int((changed & (delta < 0)).sum()),
+        "mean_change_pct": round(float(delta_pct[changed].mean()), 2) if changed.any() else 0.0,
+        "median_change_pct": round(float(np.median(delta_pct[changed])), 2) if changed.any() else 0.0,
+        "max_increase_tnd": int(max(delta[changed].max(), 0)) if changed.any() else 0,
+        "max_decrease_tnd": int(min(delta[changed].min(), 0)) if changed.any() else 0,
+        "catalog_value_before_tnd": int(arrays["price"].sum()),
+        "catalog_value_after_tnd": int(new_price.sum()),
+    }
+    return {
+        "parameters": {
+            "exchange_rate": exchange_rate,
+            "margin": margin,
+            "rounding": rounding,
+            "cost_factor": round(cost_factor, 6),
+        },
+        "stats": stats,
+        "sample": [
+            {
+                "id": arrays["ids"][i],
+                "name": arrays["names"][i],
+                "price_eur": float(arrays["price_eur"][i]),
+                "original_price_tnd": [int(arrays["original"][i]), int(new_original[i])],
+                "price_tnd": [int(arrays["price"][i]), int(new_price[i])],
+                "change_pct": round(float(delta_pct[i]), 2),
+            }
+            for i in largest
+        ],
+        "changes": [
+            {
+                "id": arrays["ids"][i],
+                "old_price_tnd": int(arrays["price"][i]),
+                "original_price_tnd": int(new_original[i]),
+                "price_tnd": int(new_price[i]),
+            }
+            for i in changed_idx
+        ],
+    }
+
+
+async def apply_repricing(db, changes: List[dict], batch_size: int = REPRICING_BATCH_SIZE) -> dict:
+    """Write the changed rows in batched unordered bulk_writes, then invalidate the catalog once.
+
+    Each update only matches if price_tnd is still the one the plan was
+    computed from, so a concurrent edit is skipped rather than overwritten.
+    """
+    now = datetime.now(timezone.utc)
+    matched = modified = 0
+    for start in range(0, len(changes), batch_size):
+        batch = changes[start:start + batch_size]
+        result = await db.products.bulk_write([
+            UpdateOne(
+                {"id": change["id"], "price_tnd": change["old_price_tnd"]},
+                {"$set": {
+                    "original_price_tnd": change["original_price_tnd"],
+                    "price_tnd": change["price_tnd"],
+                    "updated_at": now,
+                }}
+            )
+            for change in batch
+        ], ordered=False)
+        matched += result.matched_count
+        modified += result.modified_count
+    if modified:
+        invalidate_catalog()
+    logger.info(f"✅ Repricing applied: {modified}/{len(changes)} products updated")
+    return {"planned": len(changes), "matched": matched, "modified": modified, "skipped": len(changes) - matched}
+
+
+async def reprice_catalog(
+    db,
+    exchange_rate: Optional[float] = None,
+    margin: Optional[float] = None,
+    rounding: str = "round",
+    cost_factor: Optional[float] = None,
+    dry_run: bool = True,
+) -> dict:
+    """Plan a repricing of every product and, unless dry_run, commit the changed rows.
+
+    Parameters left out fall back to the last applied ones (settings
+    document "pricing"), then to the products.json metadata values.
+    """
+    settings = await db.settings.find_one({"_id": PRICING_SETTINGS_ID}) or {}
+    exchange_rate = exchange_rate if exchange_rate is not None else settings.get("exchange_rate", DEFAULT_EXCHANGE_RATE)
+    margin = margin if margin is not None else settings.get("margin", DEFAULT_MARGIN)
+    if cost_factor is None:
+        cost_factor = settings.get("cost_factor")
+
+    products = await db.products.find({}, REPRICING_PROJECTION).to_list(None)
+    plan = plan_repricing(products, exchange_rate, margin, rounding, cost_factor)
+    changes = plan.pop("changes")
+    plan["dry_run"] = dry_run
+    if not dry_run:
+        plan["result"] = await apply_repricing(db, changes)
+        await db.settings.update_one(
+            {"_id": PRICING_SETTINGS_ID},
+            {"$set": {**plan["parameters"], "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+    return plan
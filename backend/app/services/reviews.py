@@ -0,0 +1,154 @@
+"""Product reviews: moderation states and incrementally maintained rating aggregates."""
+from pymongo import ReturnDocument, UpdateOne
+from typing import Optional
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+APPROVED = "approved"
+REJECTED = "rejected"
+REVIEW_STATUSES = (PENDING, APPROVED, REJECTED)
+
+# Avis publiés directement, ou après validation par un admin
+REVIEWS_REQUIRE_MODERATION = os.environ.get("REVIEWS_REQUIRE_MODERATION", "false").lower() in ("1", "true", "yes")
+
+REVIEW_PUBLIC_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "product_id": 1,
+    "user_name": 1,
+    "rating": 1,
+    "title": 1,
+    "comment": 1,
+    "verified_purchase": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+
+
+def counted_rating(review: Optional[dict]) -> Optional[int]:
+    """The rating a review contributes to the aggregates (only approved reviews count)."""
+    if review is None or review.get("status") != APPROVED:
+        return None
+    return review.get("rating")
+
+
+async def apply_rating_change(db, product_id: str, old_rating: Optional[int], new_rating: Optional[int]) -> None:
+    """Move a product's rating aggregates from old_rating to new_rating (None = not counted).
+
+    rating_sum, review_count and rating_histogram.<stars> change with one
+    atomic $inc; the displayed average is then set only if the counters
+    are still the ones it was computed from, so the last writer always
+    leaves a consistent rating.
+    """
+    if old_rating == new_rating:
+        return
+    inc = {}
+    for rating, sign in ((old_rating, -1), (new_rating, 1)):
+        if rating is None:
+            continue
+        inc["rating_sum"] = inc.get("rating_sum", 0) + sign * rating
+        inc["review_count"] = inc.get("review_count", 0) + sign
+        inc[f"rating_histogram.{rating}"] = inc.get(f"rating_histogram.{rating}", 0) + sign
+
+    try:
+        product = await db.products.find_one_and_update(
+            {"id": product_id},
+            {"$inc": inc},
+            projection={"rating_sum": 1, "review_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if product is None:
+            return
+        count = product.get("review_count", 0)
+        total = product.get("rating_sum", 0)
+        await db.products.update_one(
+            {"id": product_id, "rating_sum": total, "review_count": count},
+            {"$set": {"rating": round(total / count, 1) if count > 0 else None}}
+        )
+    except Exception as e:
+        # Compteurs désormais faux : scripts/rebuild_rating_aggregates.py les recalcule
+        logger.error(f"❌ Rating aggregates update failed for product {product_id}: {e}")
+
+
+def _empty_histogram() -> dict:
+    return {str(stars): 0 for stars in range(1, 6)}
+
+
+def initial_rating_aggregates(rating: Optional[float] = None, review_count: Optional[int] = 0) -> dict:
+    """Rating fields of a new product document.
+
+    An imported rating and review_count (products.json) are kept, with the
+    matching rating_sum so later reviews move the average from there; the
+    histogram only counts reviews written on this site.
+    """
+    count = review_count or 0
+    return {
+        "rating": rating if count > 0 else None,
+        "review_count": count,
+        "rating_sum": math.floor(rating * count + 0.5) if rating is not None and count > 0 else 0,
+        "rating_histogram": _empty_histogram(),
+    }
+
+
+async def rebuild_rating_aggregates(db) -> int:
+    """Recompute rating_sum, review_count, rating_histogram and rating of every product.
+
+    The approved reviews are the only source: products without any get
+    zero counters and no rating. Run it while no review is being moderated,
+    otherwise concurrent increments may be lost.
+    """
+    rows = await db.reviews.aggregate([
+        {"$match": {"status": APPROVED}},
+        {"$group": {"_id": {"product_id": "$product_id", "rating": "$rating"}, "count": {"$sum": 1}}},
+    ]).to_list(None)
+
+    aggregates = {}
+    for row in rows:
+        product = aggregates.setdefault(row["_id"]["product_id"], {
+            "rating_sum": 0, "review_count": 0, "rating_histogram": _empty_histogram()
+        })
+        stars = row["_id"]["rating"]
+        product["rating_sum"] += stars * row["count"]
+        product["review_count"] += row["count"]
+        product["rating_histogram"][str(stars)] = row["count"]
+
+    await db.products.update_many({}, {"$set": {
+        "rating_sum": 0, "review_count": 0, "rating_histogram": _empty_histogram(), "rating": None
+    }})
+    if aggregates:
+        await db.products.bulk_write([
+            UpdateOne({"id": product_id}, {"$set": {
+                **values, "rating": round(values["rating_sum"] / values["review_count"], 1)
+            }})
+            for product_id, values in aggregates.items()
+        ], ordered=False)
+    return len(aggregates)
+
+
+async def ensure_rating_aggregates(db) -> int:
+    """Give the rating fields to products created without them, leaving the others alone.
+
+    Only documents lacking rating_sum are touched, in one conditional
+    update: a product that received a review meanwhile already has it.
+    Use rebuild_rating_aggregates (script) to recompute everything.
+    """
+    count = {"$ifNull": ["$review_count", 0]}
+    result = await db.products.update_many(
+        {"rating_sum": {"$exists": False}},
+        [{"$set": {
+            "review_count": count,
+            "rating_sum": {"$cond": [
+                {"$and": [{"$gt": [count, 0]}, {"$ne": [{"$ifNull": ["$rating", None]}, None]}]},
+                {"$floor": {"$add": [{"$multiply": ["$rating", count]}, 0.5]}},
+                0
+            ]},
+            "rating_histogram": {"$ifNull": ["$rating_histogram", {"$literal": _empty_histogram()}]},
+        }}]
+    )
+    if result.modified_count:
+        logger.info(f"✅ Rating aggregates initialized on {result.modified_count} products")
+    return result.modified_count
@@ -0,0 +1,159 @@
+"""Daily sales rollups maintained incrementally from order events."""
+from pymongo import UpdateOne
+from datetime import datetime, timezone
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Une ligne par (jour UTC, statut, gouvernorat)
+ROLLUP_COLLECTION = "sales_daily"
+UNKNOWN_GOVERNORATE = "N/A"
+
+
+def order_day(value) -> str:
+    """UTC day (YYYY-MM-DD) of an order date; today when the date is missing."""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.strftime("%Y-%m-%d")
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def _rollup_update(order: dict, order_status: str, sign: int) -> UpdateOne:
+    """Build the $inc adding (sign=1) or removing (sign=-1) an order from its bucket."""
+    day = order_day(order.get("created_at"))
+    governorate = (order.get("shipping_address") or {}).get("governorate") or UNKNOWN_GOVERNORATE
+    items = sum(item.get("quantity", 0) for item in order.get("items") or [])
+    return UpdateOne(
+        {"_id": f"{day}|{order_status}|{governorate}"},
+        {
+            "$inc": {
+                "orders": sign,
+                "revenue_tnd": sign * (order.get("total_tnd") or 0),
+                "items": sign * items,
+                "delivery_fee_tnd": sign * (order.get("delivery_fee_tnd") or 0),
+            },
+            "$setOnInsert": {"day": day, "status": order_status, "governorate": governorate},
+        },
+        upsert=True
+    )
+
+
+async def record_order_created(db, order: dict) -> None:
+    """Add a new order to today's rollups."""
+    try:
+        await db[ROLLUP_COLLECTION].bulk_write([_rollup_update(order, order["status"], 1)])
+    except Exception as e:
+        # La commande est déjà enregistrée : un rebuild corrigera les agrégats
+        logger.error(f"❌ Sales rollup update failed for order {order.get('id')}: {e}")
+
+
+async def record_status_change(db, order: dict, new_status: str) -> None:
+    """Move an order from its previous status bucket to the new one."""
+    if order.get("status") == new_status:
+        return
+    try:
+        await db[ROLLUP_COLLECTION].bulk_write([
+            _rollup_update(order, order["status"], -1),
+            _rollup_update(order, new_status, 1),
+        ], ordered=False)
+    except Exception as e:
+        logger.error(f"❌ Sales rollup update failed for order {order.get('id')}: {e}")
+
+
+async def rebuild_sales_rollups(db) -> int:
+    """Recompute every rollup from the orders collection in one aggregation.
+
+    The result replaces the rollup collection atomically ($out). Run it while
+    no order is being created, otherwise concurrent increments may be lost.
+    """
+    day = {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}
+    governorate = {"$ifNull": ["$shipping_address.governorate", UNKNOWN_GOVERNORATE]}
+    await db.orders.aggregate([
+        {"$group": {
+            "_id": {"day": day, "status": "$status", "governorate": governorate},
+            "orders": {"$sum": 1},
+            "revenue_tnd": {"$sum": {"$ifNull": ["$total_tnd", 0]}},
+            "items": {"$sum": {"$sum": {"$ifNull": ["$items.quantity", []]}}},
+            "delivery_fee_tnd": {"$sum": {"$ifNull": ["$delivery_fee_tnd", 0]}},
+        }},
+        {"$project": {
+            "_id": {"$concat": ["$_id.day", "|", "$_id.status", "|", "$_id.governorate"]},
+            "day": "$_id.day",
+            "status": "$_id.status",
+            "governorate": "$_id.governorate",
+            "orders": 1,
+            "revenue_tnd": 1,
+            "items": 1,
+            "delivery_fee_tnd": 1,
+        }},
+        {"$out": ROLLUP_COLLECTION},
+    ]).to_list(None)
+    return await db[ROLLUP_COLLECTION].count_documents({})
+
+
+async def ensure_sales_rollups(db) -> None:
+    """Build the rollups on first start when orders already exist."""
+    if await db[ROLLUP_COLLECTION].find_one({}, {"_id": 1}) is None and await db.orders.find_one({}, {"_id": 1}):
+        count = await rebuild_sales_rollups(db)
+        logger.info(f"✅ Sales rollups rebuilt ({count} rows)")
+
+
+async def sales_by_status(db) -> dict:
+    """Return {status: {orders, revenue_tnd}} over all time, from the rollups only."""
+    rows = await db[ROLLUP_COLLECTION].aggregate([
+        {"$group": {
+            "_id": "$status",
+            "orders": {"$sum": "$orders"},
+            "revenue_tnd": {"$sum": "$revenue_tnd"},
+        }}
+    ]).to_list(None)
+    return {row["_id"]: row for row in rows}
+
+
+async def sales_timeseries(
+    db,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    status: Optional[str] = None,
+    governorate: Optional[str] = None,
+) -> dict:
+    """Return per-day and per-governorate totals for a day range (start inclusive, end exclusive)."""
+    match = {}
+    if start or end:
+        match["day"] = {}
+        if start:
+            match["day"]["$gte"] = start
+        if end:
+            match["day"]["$lt"] = end
+    if status:
+        match["status"] = status
+    else:
+        # Par défaut, les commandes annulées ne comptent pas dans les ventes
+        match["status"] = {"$ne": "cancelled"}
+    if governorate:
+        match["governorate"] = governorate
+
+    totals = {
+        "orders": {"$sum": "$orders"},
+        "revenue_tnd": {"$sum": "$revenue_tnd"},
+        "items": {"$sum": "$items"},
+        "delivery_fee_tnd": {"$sum": "$delivery_fee_tnd"},
+    }
+    result = await db[ROLLUP_COLLECTION].aggregate([
+        {"$match": match},
+        {"$facet": {
+            "series": [
+                {"$group": {"_id": "$day", **totals}},
+                {"$sort": {"_id": 1}},
+                {"$project": {"_id": 0, "day": "$_id", "orders": 1, "revenue_tnd": 1, "items": 1, "delivery_fee_tnd": 1}},
+            ],
+            "by_governorate": [
+                {"$group": {"_id": "$governorate", **totals}},
+                {"$sort": {"revenue_tnd": -1}},
+                {"$project": {"_id": 0, "governorate": "$_id", "orders": 1, "revenue_tnd": 1, "items": 1, "delivery_fee_tnd": 1}},
+            ],
+        }},
+    ]).to_list(1)
+    return result[0] if result else {"series": [], "by_governorate": []}
@@ -0,0 +1,282 @@
+"""Similar products: hashed TF-IDF vectors of the catalog text and precomputed cosine neighbours."""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from app.services.catalog import catalog, normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Dimension de l'espace des features hachées
+SIMILAR_HASH_DIM = int(os.environ.get("SIMILAR_HASH_DIM", "4096"))
+# Voisins gardés par produit (les produits en rupture sont filtrés à la lecture)
+SIMILAR_TOP_K = int(os.environ.get("SIMILAR_TOP_K", "12"))
+# Au-delà de cette part de produits modifiés, reconstruction complète (IDF recalculé)
+SIMILAR_REBUILD_RATIO = float(os.environ.get("SIMILAR_REBUILD_RATIO", "0.1"))
+SIMILAR_BLOCK_SIZE = 128
+
+# Poids des champs : la catégorie et la marque comptent plus qu'un mot de description
+FIELD_WEIGHTS = {
+    "description": 1.0,
+    "name": 2.0,
+    "category": 3.0,
+    "brand": 1.5,
+    "format": 0.5,
+}
+
+STOPWORDS = frozenset("""
+    a au aux avec ce ces cette dans de des du elle en est et il ils la le les leur lui ma mais
+    ne nos notre on ou par pas peu plus pour qui que sa sans se ses son sur ta te tes ton tous
+    tout tres un une vos votre vous the and for with of to in on is it your you this from
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _hash(feature: str) -> int:
+    # crc32 : stable entre processus (contrairement à hash())
+    return zlib.crc32(feature.encode("utf-8")) % SIMILAR_HASH_DIM
+
+
+def product_features(product: dict) -> Dict[int, float]:
+    """Hashed feature -> weighted sublinear term frequency of one product."""
+    features: Dict[int, float] = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        text = normalize_text(str(product.get(field) or ""))
+        if not text:
+            continue
+        if field in ("category", "brand", "format"):
+            # Valeur entière comme une seule feature : "Gel Cream" != "Cream"
+            counts = {f"{field}:{text.strip()}": 1}
+        else:
+            counts = {}
+            for token in _TOKEN.findall(text):
+                if len(token) > 1 and token not in STOPWORDS:
+                    counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            index = _hash(token)
+            features[index] = features.get(index, 0.0) + weight * (1 + math.log(count))
+    return features
+
+
+# Ligne creuse : (indices des features, poids)
+Row = Tuple[np.ndarray, np.ndarray]
+_EMPTY_ROW: Row = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32))
+
+
+def _sparse(features: Dict[int, float]) -> Row:
+    """(feature indices, term frequencies) arrays of a product_features() dict."""
+    indices = np.fromiter(features, dtype=np.int32, count=len(features))
+    values = np.fromiter(features.values(), dtype=np.float32, count=len(features))
+    return indices, values
+
+
+def _fingerprint(product: dict) -> int:
+    return zlib.crc32("\x1f".join(str(product.get(field) or "") for field in FIELD_WEIGHTS).encode("utf-8"))
+
+
+class SimilarityIndex:
+    """L2-normalized TF-IDF rows of the catalog and each product's top-k neighbours.
+
+    Rows are kept sparse (feature indices and weights): a product has a few
+    dozen features, so memory grows with the catalog text rather than with
+    products x SIMILAR_HASH_DIM. When only a few products changed, only
+    their rows and the neighbour lists they can affect are recomputed,
+    with the IDF of the last full build.
+
+    The catalog listener (``schedule``) runs the work on a dedicated thread,
+    out of the request that reloaded the catalog, and the previous lists
+    are served until it is done; reloads arriving during a build are
+    coalesced into one update with the latest products.
+    """
+
+    def __init__(self, top_k: int = SIMILAR_TOP_K):
+        self.top_k = top_k
+        self.ids: List[str] = []
+        self.position: Dict[str, int] = {}
+        self.rows: List[Row] = []
+        self.idf = np.ones(SIMILAR_HASH_DIM, dtype=np.float32)
+        self.fingerprints: Dict[str, int] = {}
+        self.neighbours: Dict[str, List[Tuple[str, float]]] = {}
+        self.full_builds = 0
+        self.incremental_updates = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="similarity")
+        self._pending: Optional[List[dict]] = None
+        self._scheduled = False
+        self._future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def _normalize(self, row: Row) -> Row:
+        indices, tf = row
+        values = tf * self.idf[indices]
+        norm = np.linalg.norm(values)
+        return (indices, values / norm) if norm > 0 else _EMPTY_ROW
+
+    def _dense(self, rows) -> np.ndarray:
+        """Dense copy of a few rows (one block at a time)."""
+        block = np.zeros((len(rows), SIMILAR_HASH_DIM), dtype=np.float32)
+        selected = [self.rows[row] for row in rows]
+        lengths = [len(indices) for indices, _ in selected]
+        if sum(lengths):
+            block[
+                np.repeat(np.arange(len(selected)), lengths),
+                np.concatenate([indices for indices, _ in selected])
+            ] = np.concatenate([values for _, values in selected])
+        return block
+
+    def _scores(self, rows: np.ndarray) -> np.ndarray:
+        """Cosine of the given rows against every row, shape (len(rows), len(self.ids)).
+
+        Rows are densified SIMILAR_BLOCK_SIZE at a time, so the temporaries
+        stay a few MB whatever the catalog size.
+        """
+        block = self._dense(rows)
+        # Seules les features présentes dans le bloc contribuent au produit scalaire
+        columns = np.flatnonzero(block.any(axis=0))
+        block = block[:, columns]
+        scores = np.empty((len(rows), len(self.rows)), dtype=np.float32)
+        for start in range(0, len(self.rows), SIMILAR_BLOCK_SIZE):
+            end = min(start + SIMILAR_BLOCK_SIZE, len(self.rows))
+            scores[:, start:end] = block @ self._dense(range(start, end))[:, columns].T
+        return scores
+
+    def _top(self, rows: np.ndarray) -> Dict[str, List[Tuple[str, float]]]:
+        """Neighbour lists of the given rows, computed block by block against every row."""
+        result = {}
+        k = min(self.top_k, len(self.ids) - 1)
+        if k <= 0:
+            return {self.ids[i]: [] for i in rows}
+        for start in range(0, len(rows), SIMILAR_BLOCK_SIZE):
+            block = rows[start:start + SIMILAR_BLOCK_SIZE]
+            # Scores opposés sur place : argpartition garde les k plus petits, sans copie
+            scores = self._scores(block)
+            np.negative(scores, out=scores)
+            scores[np.arange(len(block)), block] = 1.0
+            best = np.argpartition(scores, k - 1, axis=1)[:, :k]
+            best_scores = -np.take_along_axis(scores, best, axis=1)
+            order = np.argsort(-best_scores, axis=1, kind="stable")
+            best = np.take_along_axis(best, order, axis=1)
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            for row, columns, values in zip(block, best, best_scores):
+                result[self.ids[row]] = [
+                    (self.ids[column], float(value))
+                    for column, value in zip(columns, values)
+                    if value > 0
+                ]
+        return result
+
+    def build(self, products: List[dict]) -> None:
+        """Full rebuild: vocabulary weights (IDF), every row and every neighbour list."""
+        tf = [_sparse(product_features(p)) for p in products]
+        df = np.bincount(np.concatenate([indices for indices, _ in tf] or [_EMPTY_ROW[0]]), minlength=SIMILAR_HASH_DIM)
+        self.idf = (np.log((1 + len(products)) / (1 + df)) + 1).astype(np.float32)
+        self.ids = [p.get("id") for p in products]
+        self.position = {product_id: i for i, product_id in enumerate(self.ids)}
+        self.rows = [self._normalize(row) for row in tf]
+        self.fingerprints = {p.get("id"): _fingerprint(p) for p in products}
+        self.neighbours = self._top(np.arange(len(self.ids)))
+        self.full_builds += 1
+
+    def update(self, products: List[dict]) -> None:
+        """Apply the products whose text changed, or rebuild everything."""
+        current = {p.get("id"): p for p in products}
+        changed = [
+            product_id for product_id, product in current.items()
+            if self.fingerprints.get(product_id) != _fingerprint(product)
+        ]
+        removed = [product_id for product_id in self.fingerprints if product_id not in current]
+        if not changed and not removed:
+            return
+        if not self.ids or len(changed) + len(removed) > SIMILAR_REBUILD_RATIO * len(products):
+            self.build(products)
+            return
+
+        removed_set = set(removed)
+        if removed:
+            keep = [i for i, product_id in enumerate(self.ids) if product_id not in removed_set]
+            self.rows = [self.rows[i] for i in keep]
+            self.ids = [self.ids[i] for i in keep]
+        new_ids = [product_id for product_id in changed if product_id not in self.fingerprints]
+        if new_ids:
+            self.rows = self.rows + [_EMPTY_ROW] * len(new_ids)
+            self.ids = self.ids + new_ids
+        self.position = {product_id: i for i, product_id in enumerate(self.ids)}
+
+        changed_rows = np.array([self.position[product_id] for product_id in changed], dtype=np.int64)
+        for product_id in changed:
+            self.rows[self.position[product_id]] = self._normalize(_sparse(product_features(current[product_id])))
+        for product_id in removed:
+            self.fingerprints.pop(product_id, None)
+        for product_id in changed:
+            self.fingerprints[product_id] = _fingerprint(current[product_id])
+
+        # Listes à recalculer : produits modifiés, listes qui citent un produit
+        # modifié ou supprimé, et listes où un produit modifié entre désormais
+        touched = set(changed) | removed_set
+        stale = set(changed)
+        if changed:
+            floors = np.array([
+                listed[-1][1] if len(listed) >= self.top_k else 0.0
+                for listed in (self.neighbours.get(product_id, []) for product_id in self.ids)
+            ], dtype=np.float32)
+            entering = np.zeros(len(self.ids), dtype=bool)
+            for start in range(0, len(changed_rows), SIMILAR_BLOCK_SIZE):
+                entering |= (self._scores(changed_rows[start:start + SIMILAR_BLOCK_SIZE]) > floors).any(axis=0)
+            stale |= {self.ids[row] for row in np.flatnonzero(entering)}
+        stale |= {
+            product_id for product_id, listed in self.neighbours.items()
+            if product_id not in removed_set and any(other in touched for other, _ in listed)
+        }
+
+        neighbours = {product_id: listed for product_id, listed in self.neighbours.items() if product_id not in removed_set}
+        neighbours.update(self._top(np.array(sorted(self.position[p] for p in stale if p in self.position), dtype=np.int64)))
+        self.neighbours = neighbours
+        self.incremental_updates += 1
+
+    def schedule(self, products: List[dict]) -> Future:
+        """Catalog listener: queue an update on the similarity thread (the latest products win)."""
+        with self._lock:
+            self._pending = products
+            if self._scheduled:
+                return self._future
+            self._scheduled = True
+            self._future = self._executor.submit(self._run)
+            return self._future
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                products, self._pending = self._pending, None
+                if products is None:
+                    self._scheduled = False
+                    return
+            try:
+                self.update(products)
+            except Exception:
+                logger.exception("❌ Similar products update failed")
+
+    def similar(self, product_id: str) -> List[Tuple[str, float]]:
+        """Precomputed (other_id, cosine) list, most similar first."""
+        return self.neighbours.get(product_id, [])
+
+    def stats(self) -> dict:
+        return {
+            "products": len(self.ids),
+            "dimensions": SIMILAR_HASH_DIM,
+            "features": sum(len(indices) for indices, _ in self.rows),
+            "top_k": self.top_k,
+            "full_builds": self.full_builds,
+            "incremental_updates": self.incremental_updates,
+            "updating": self._scheduled,
+        }
+
+
+similar_products = SimilarityIndex()
+catalog.add_listener(similar_products.schedule)
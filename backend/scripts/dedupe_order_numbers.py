@@ -0,0 +1,27 @@
+"""Script to renumber orders sharing an order_number, then create the order_number_unique index."""
+import asyncio
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.connection import get_database
+from app.db.indexes import ensure_indexes
+from app.services.order_numbers import dedupe_order_numbers
+
+
+async def dedupe():
+    """Renumber duplicate order numbers and report the indexes still missing."""
+    db = await get_database()
+    
+    count = await dedupe_order_numbers(db)
+    print(f"✅ Commandes renumérotées : {count}")
+    
+    failures = await ensure_indexes(db)
+    for failure in failures:
+        print(f"❌ Index {failure['collection']}.{failure['index']} : {failure['error']}")
+    if not failures:
+        print("✅ Index MongoDB créés")
+
+
+if __name__ == "__main__":
+    asyncio.run(dedupe())
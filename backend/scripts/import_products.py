@@ -4,21 +4,26 @@ Script d'import des produits K-Beauty dans MongoDB
 Format JSON: { "metadata": {...}, "products": [...] }
 """
 
-import json
 import asyncio
+import os
+import sys
+from pathlib import Path
 from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.catalog_snapshot import load_catalog_data
+from app.services.reviews import initial_rating_aggregates
+
 async def import_products():
     # Connexion MongoDB
     client = AsyncIOMotorClient("mongodb://localhost:27017")
     db = client.kbeauty
     
-    # Charger le fichier JSON (chemin relatif depuis scripts/)
-    json_path = "../data/products.json"
-    
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # Charger le catalogue (snapshot binaire compilé au besoin, sinon le JSON)
+    json_path = Path(__file__).parent.parent / "data" / "products.json"
+    data = load_catalog_data(json_path)
     
     # Extraire les produits du tableau "products"
     products_list = data.get("products", [])
@@ -55,8 +60,7 @@ async def import_products():
             "in_stock": product.get("in_stock", True),
             "is_new": product.get("is_new", False),
             "is_bestseller": product.get("is_bestseller", False),
-            "rating": product.get("rating"),
-            "review_count": product.get("review_count", 0),
+            **initial_rating_aggregates(product.get("rating"), product.get("review_count", 0)),
             "created_at": now,
             "updated_at": now
         }
@@ -0,0 +1,20 @@
+"""Script to rebuild the product rating aggregates from the reviews collection."""
+import asyncio
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.connection import get_database
+from app.services.reviews import rebuild_rating_aggregates
+
+
+async def rebuild():
+    """Recompute rating_sum, review_count, rating_histogram and rating of every product."""
+    db = await get_database()
+    
+    count = await rebuild_rating_aggregates(db)
+    print(f"✅ Notes produits reconstruites : {count} produits avec avis")
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild())
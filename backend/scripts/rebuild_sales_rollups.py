@@ -0,0 +1,32 @@
+"""Script to rebuild the sales rollups, product sales counters, client stats and co-purchase pairs from the orders collection."""
+import asyncio
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.connection import get_database
+from app.services.sales_rollups import rebuild_sales_rollups
+from app.services.product_sales import rebuild_product_sales
+from app.services.client_stats import rebuild_client_stats
+from app.services.copurchases import rebuild_copurchases
+
+
+async def rebuild():
+    """Recompute sales_daily, the per-product and per-client counters and product_pairs."""
+    db = await get_database()
+    
+    count = await rebuild_sales_rollups(db)
+    print(f"✅ Agrégats de ventes reconstruits : {count} lignes")
+    
+    products = await rebuild_product_sales(db)
+    print(f"✅ Compteurs de ventes produits reconstruits : {products} produits")
+    
+    clients = await rebuild_client_stats(db)
+    print(f"✅ Statistiques clients reconstruites : {clients} clients avec commandes")
+    
+    pairs = await rebuild_copurchases(db)
+    print(f"✅ Co-achats reconstruits : {pairs} couples de produits")
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild())
@@ -0,0 +1,61 @@
+"""Script to reprice the catalog from EUR prices, exchange rate and margin (dry run by default)."""
+import argparse
+import asyncio
+import json
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.connection import get_database
+from app.services.repricing import ROUNDING_RULES, reprice_catalog
+
+
+def positive_float(value):
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError("doit être strictement positif")
+    return number
+
+
+def non_negative_float(value):
+    number = float(value)
+    if not number >= 0:
+        raise argparse.ArgumentTypeError("ne peut pas être négatif")
+    return number
+
+
+async def reprice(args):
+    """Print the repricing diff and apply it with --apply."""
+    db = await get_database()
+    
+    try:
+        plan = await reprice_catalog(
+            db,
+            exchange_rate=args.rate,
+            margin=args.margin,
+            rounding=args.rounding,
+            cost_factor=args.cost_factor,
+            dry_run=not args.apply,
+        )
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"⚙️  Paramètres : {plan['parameters']}")
+    print(f"📊 Statistiques : {json.dumps(plan['stats'], indent=2)}")
+    for row in plan["sample"]:
+        print(f"   {row['name']}: {row['price_tnd'][0]} → {row['price_tnd'][1]} TND ({row['change_pct']:+}%)")
+    
+    if args.apply:
+        print(f"✅ {plan['result']['modified']} produits mis à jour ({plan['result']['skipped']} ignorés, modifiés entre-temps)")
+    else:
+        print("ℹ️  Simulation uniquement, relancer avec --apply pour enregistrer")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=positive_float, help="EUR → TND exchange rate (default: last applied, then 3.3)")
+    parser.add_argument("--margin", type=non_negative_float, help="Margin as a fraction, e.g. 0.4 (default: last applied, then 0.4)")
+    parser.add_argument("--rounding", choices=ROUNDING_RULES, default="round")
+    parser.add_argument("--cost-factor", type=positive_float, help="Landed cost multiplier (default: calibrated on current prices)")
+    parser.add_argument("--apply", action="store_true", help="Write the new prices")
+    asyncio.run(reprice(parser.parse_args()))
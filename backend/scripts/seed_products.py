@@ -8,6 +8,11 @@ from pymongo.errors import ConnectionFailure
 from dotenv import load_dotenv
 import logging
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.catalog_snapshot import load_catalog_data
+from app.services.reviews import initial_rating_aggregates
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -34,8 +39,8 @@ PRODUCTS_JSON_PATH = Path(__file__).parent.parent / 'data' / 'products.json'
 def load_products():
     """Load products from JSON file."""
     try:
-        with open(PRODUCTS_JSON_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # Snapshot binaire (compilé au besoin), sinon le JSON
+        data = load_catalog_data(PRODUCTS_JSON_PATH)
         
         products = data.get('products', [])
         logger.info(f"Loaded {len(products)} products from {PRODUCTS_JSON_PATH}")
@@ -117,9 +122,14 @@ def seed_products(db):
             # Prepare product document
             # Convert datetime strings to datetime objects if needed
             # MongoDB will handle the rest
+            # Notes : initialisées à la création seulement, les avis du site les font ensuite évoluer
+            fields = {k: v for k, v in product.items() if k not in ('rating', 'review_count')}
             result = collection.update_one(
                 {'id': product_id},
-                {'$set': product},
+                {
+                    '$set': fields,
+                    '$setOnInsert': initial_rating_aggregates(product.get('rating'), product.get('review_count', 0)),
+                },
                 upsert=True
             )
             
@@ -1,12 +1,27 @@
 """Main application entry point."""
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.cors import CORSMiddleware
 import logging
 from pathlib import Path
 
 from app.core.config import CORS_ORIGINS, LOG_LEVEL
-from app.db.connection import close_database
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry as metrics_registry
+from app.api.middleware import MetricsMiddleware
+from app.db.connection import get_database, close_database
+from app.db.indexes import ensure_indexes
+from app.services.order_numbers import dedupe_order_numbers
+from app.services.sales_rollups import ensure_sales_rollups
+from app.services.product_sales import ensure_product_sales, refresh_sales_windows, SALES_WINDOWS_REFRESH_SECONDS
+from app.services.background import start_periodic_task, stop_background_tasks
+from app.services.promotions import start_promotion_scheduler
+from app.services.carts import CART_FLUSH_INTERVAL, flush_carts
+from app.services.health import health_report, record_startup_check
+from app.services.reviews import ensure_rating_aggregates
+from app.services.client_stats import ensure_client_stats
+from app.services.copurchases import ensure_copurchases, load_copurchases, COPURCHASE_REFRESH_SECONDS
 from app.api.routes import api_router
 from app.api.routes.auth import router as auth_router
 from app.api.routes.products import load_products_from_json
@@ -33,8 +48,13 @@ app.add_middleware(
     allow_origins=CORS_ORIGINS,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Le front (autre origine) doit pouvoir lire le curseur de la page suivante
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Métriques par route (ajouté en dernier : englobe aussi le CORS)
+app.add_middleware(MetricsMiddleware)
+
 # Include API routers
 app.include_router(api_router)
 app.include_router(auth_router)
@@ -55,13 +75,78 @@ async def startup_event():
     try:
         count = load_products_from_json()
         logger.info(f"✅ Loaded {count} products from JSON file with TND pricing")
+        record_startup_check("products_import", True, {"products": count})
     except Exception as e:
         logger.error(f"❌ Error loading products: {e}")
+        record_startup_check("products_import", False, repr(e))
+    
+    db = await get_database()
+    
+    try:
+        failures = await ensure_indexes(db)
+        # Numéros de commande en double (données anciennes) : renumérotés, puis index recréé
+        if any(failure["index"] == "order_number_unique" for failure in failures):
+            renumbered = await dedupe_order_numbers(db)
+            logger.warning(f"⚠️  {renumbered} order(s) renumbered to remove duplicate order numbers")
+            failures = await ensure_indexes(db)
+        if failures:
+            logger.warning(f"⚠️  {len(failures)} MongoDB index(es) could not be created")
+        else:
+            logger.info("✅ MongoDB indexes ensured")
+        # Un index unique manquant rend l'instance non prête ; les autres ne font que ralentir
+        record_startup_check(
+            "indexes",
+            not any(failure["required"] for failure in failures),
+            {"failures": failures} if failures else None
+        )
+    except Exception as e:
+        logger.error(f"❌ Error creating indexes: {e}")
+        record_startup_check("indexes", False, repr(e))
+    
+    try:
+        await ensure_sales_rollups(db)
+        await ensure_product_sales(db)
+        await ensure_client_stats(db)
+    except Exception as e:
+        logger.error(f"❌ Error building sales rollups: {e}")
+    
+    try:
+        await ensure_rating_aggregates(db)
+        record_startup_check("rating_aggregates", True)
+    except Exception as e:
+        logger.error(f"❌ Error building rating aggregates: {e}")
+        record_startup_check("rating_aggregates", False, repr(e))
+    
+    try:
+        await ensure_copurchases(db)
+    except Exception as e:
+        logger.error(f"❌ Error loading co-purchases: {e}")
+    
+    # Fenêtres de ventes 7/30 jours (et bestsellers automatiques si activés)
+    start_periodic_task(
+        "sales_windows",
+        SALES_WINDOWS_REFRESH_SECONDS,
+        lambda: refresh_sales_windows(db)
+    )
+    
+    # Co-achats enregistrés par les autres workers
+    start_periodic_task("copurchases", COPURCHASE_REFRESH_SECONDS, lambda: load_copurchases(db))
+    
+    # Application / retrait des promotions à leurs dates de début et de fin
+    start_promotion_scheduler(db)
+    
+    # Écriture groupée des paniers modifiés
+    start_periodic_task("cart_flush", CART_FLUSH_INTERVAL, lambda: flush_carts(db))
 
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     """Close database connection on shutdown."""
+    await stop_background_tasks()
+    try:
+        await flush_carts(await get_database())
+    except Exception as e:
+        logger.error(f"❌ Error flushing carts: {e}")
     await close_database()
     logger.info("Application shutdown complete")
 
@@ -80,5 +165,29 @@ async def root():
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy"}
\ No newline at end of file
+    """Liveness: the process answers (dependencies are checked by /health/ready)."""
+    return {"status": "healthy"}
+
+
+@app.get("/health/ready")
+async def readiness_check(response: Response):
+    """Readiness: MongoDB reachable, startup steps succeeded, background tasks alive (503 otherwise)."""
+    report = await health_report()
+    if report["status"] != "ready":
+        response.status_code = 503
+    return {"status": report["status"], "checks": report["checks"], "checked_at": report["checked_at"]}
+
+
+@app.get("/health/deep")
+async def deep_health_check(response: Response):
+    """Full report: ping latency and pool usage per MongoDB client, caches, background tasks."""
+    report = await health_report()
+    if report["status"] != "ready":
+        response.status_code = 503
+    return report
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics of this worker."""
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
@@ -0,0 +1,84 @@
+"""Shared test fixtures: backend on sys.path and an async MongoDB double built on mongomock."""
+import asyncio
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+
+class AsyncCursor:
+    """Motor-like cursor over a mongomock cursor."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, n):
+        self._cursor = self._cursor.limit(n)
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(0)
+        documents = list(self._cursor)
+        return documents if length is None else documents[:length]
+
+    def __aiter__(self):
+        self._iterator = iter(self._cursor)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncCollection:
+    """Motor-like collection: every call yields to the event loop first, so
+    concurrent coroutines interleave between database operations as they
+    would against a real server."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self._collection.find(*args, **kwargs))
+
+    def aggregate(self, *args, **kwargs):
+        return AsyncCursor(self._collection.aggregate(*args, **kwargs))
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if not callable(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            return attribute(*args, **kwargs)
+
+        return call
+
+
+class AsyncDatabase:
+    def __init__(self):
+        self._db = mongomock.MongoClient().kbeauty
+
+    def __getattr__(self, name):
+        return AsyncCollection(self._db[name])
+
+    def __getitem__(self, name):
+        return AsyncCollection(self._db[name])
+
+
+@pytest.fixture
+def db():
+    return AsyncDatabase()
@@ -0,0 +1,154 @@
+"""Login: legacy hash upgrade, deactivated accounts, the bounded hashing pool and its load."""
+from datetime import datetime, timezone
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.api.routes import auth
+from app.api.routes.auth import UserLogin, login
+from app.core import security
+
+
+@pytest.fixture
+def users(db, monkeypatch):
+    async def get_database():
+        return db
+
+    monkeypatch.setattr(auth, "get_database", get_database)
+    # Coût bcrypt minimal : on teste le flux, pas la robustesse du hash
+    monkeypatch.setattr(security, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=4))
+    return db.users
+
+
+def _user(email, hashed_password, **fields):
+    return {
+        "id": email, "email": email, "hashed_password": hashed_password,
+        "first_name": "A", "last_name": "B", "phone": "20000000", "role": "client", "is_active": True,
+        "created_at": datetime.now(timezone.utc),
+        **fields,
+    }
+
+
+def test_legacy_hash_is_upgraded_on_login(users):
+    async def scenario():
+        legacy = security._legacy_sha256("secret-123")
+        await users.insert_one(_user("a@example.com", legacy))
+
+        with pytest.raises(HTTPException) as error:
+            await login(UserLogin(email="a@example.com", password="wrong"))
+        assert error.value.status_code == 401
+        assert (await users.find_one({"id": "a@example.com"}))["hashed_password"] == legacy
+
+        response = await login(UserLogin(email="a@example.com", password="secret-123"))
+        assert security.decode_access_token(response.access_token)["sub"] == "a@example.com"
+        upgraded = (await users.find_one({"id": "a@example.com"}))["hashed_password"]
+        assert upgraded.startswith("$2") and security.verify_password("secret-123", upgraded)
+
+        # Le nouveau hash suffit, sans nouvelle réécriture
+        await login(UserLogin(email="a@example.com", password="secret-123"))
+        assert (await users.find_one({"id": "a@example.com"}))["hashed_password"] == upgraded
+
+    asyncio.run(scenario())
+
+
+def test_deactivated_account_keeps_its_legacy_hash(users):
+    async def scenario():
+        legacy = security._legacy_sha256("secret-123")
+        await users.insert_one(_user("b@example.com", legacy, is_active=False))
+
+        with pytest.raises(HTTPException) as error:
+            await login(UserLogin(email="b@example.com", password="secret-123"))
+        assert error.value.status_code == 403
+        assert (await users.find_one({"id": "b@example.com"}))["hashed_password"] == legacy
+
+    asyncio.run(scenario())
+
+
+def test_saturated_hashing_pool_answers_503(users, monkeypatch):
+    monkeypatch.setattr(security, "PASSWORD_HASH_MAX_QUEUE", 1)
+    capacity = security.PASSWORD_HASH_WORKERS + security.PASSWORD_HASH_MAX_QUEUE
+    extra = 3
+
+    async def attempt():
+        try:
+            await login(UserLogin(email="c@example.com", password="secret-123"))
+            return 200
+        except HTTPException as e:
+            return e.status_code
+
+    async def scenario():
+        await users.insert_one(_user("c@example.com", security.get_password_hash("secret-123")))
+        rejected = security.password_hashing_stats()["rejected"]
+
+        codes = await asyncio.gather(*(attempt() for _ in range(capacity + extra)))
+
+        assert sorted(codes) == [200] * capacity + [503] * extra
+        stats = security.password_hashing_stats()
+        assert stats["rejected"] - rejected == extra
+        assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+
+        # Une fois la file vidée, les connexions passent de nouveau
+        assert await attempt() == 200
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_logins_keep_the_event_loop_responsive(users, monkeypatch):
+    # Coût bcrypt proche de la production, réduit pour garder le test court
+    monkeypatch.setattr(security, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=8))
+    monkeypatch.setattr(security, "PASSWORD_HASH_MAX_QUEUE", 64)
+    logins = 32
+
+    async def scenario():
+        hashed = security.get_password_hash("secret-123")
+        await users.insert_one(_user("d@example.com", hashed))
+        started = time.perf_counter()
+        security.verify_password("secret-123", hashed)
+        hash_seconds = time.perf_counter() - started
+        completed = security.password_hashing_stats()["completed"]
+
+        # Battement de 5 ms : le plus grand retard mesure le blocage de la boucle
+        lags = []
+        done = asyncio.Event()
+
+        async def heartbeat():
+            while not done.is_set():
+                tick = time.perf_counter()
+                await asyncio.sleep(0.005)
+                lags.append(time.perf_counter() - tick - 0.005)
+
+        beat = asyncio.create_task(heartbeat())
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(
+            login(UserLogin(email="d@example.com", password="secret-123")) for _ in range(logins)
+        ))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await beat
+
+        assert all(response.access_token for response in responses)
+        assert security.password_hashing_stats()["completed"] - completed == logins
+        # Le hachage tourne dans le pool : la boucle n'attend jamais un hash complet
+        assert max(lags) < hash_seconds
+        print(f"{logins} logins in {elapsed:.2f} s ({logins / elapsed:.0f}/s, "
+              f"{security.PASSWORD_HASH_WORKERS} workers), hash {hash_seconds * 1000:.1f} ms, "
+              f"max loop lag {max(lags) * 1000:.1f} ms over {len(lags)} beats")
+
+    asyncio.run(scenario())
+
+
+def test_failed_hashing_call_is_not_counted_as_completed():
+    def broken():
+        raise ValueError("bad hash")
+
+    async def scenario():
+        completed = security.password_hashing_stats()["completed"]
+        with pytest.raises(ValueError):
+            await security._run_in_hash_pool(broken)
+        stats = security.password_hashing_stats()
+        assert stats["completed"] == completed and stats["in_flight"] == 0
+
+    asyncio.run(scenario())
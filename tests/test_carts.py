@@ -0,0 +1,93 @@
+"""Cart store: LRU eviction, write-behind flushes and changes made during a flush."""
+import asyncio
+
+from app.services.carts import CartStore
+
+
+async def _set(store, db, user_id, product_id, quantity):
+    entry = await store.get(db, user_id)
+    entry.items[product_id] = quantity
+    entry.touch()
+    return entry
+
+
+async def _saved(db):
+    return {
+        cart["_id"]: {item["product_id"]: item["quantity"] for item in cart["items"]}
+        for cart in await db.carts.find({}).to_list(None)
+    }
+
+
+class _DuringFlush:
+    """Database whose carts.bulk_write first runs ``during`` (a request served mid-flush)."""
+
+    def __init__(self, db, during):
+        self.carts = self
+        self._carts = db.carts
+        self._during = during
+
+    async def bulk_write(self, operations, **kwargs):
+        await self._during()
+        return await self._carts.bulk_write(operations, **kwargs)
+
+
+def test_evicted_dirty_carts_are_written_by_the_next_flush(db):
+    async def scenario():
+        store = CartStore(max_size=2)
+        for user_id in ("u1", "u2", "u3"):
+            await _set(store, db, user_id, "a", 1)
+        assert store.stats()["cached"] == 2 and store.stats()["pending"] == 1
+        assert await db.carts.count_documents({}) == 0
+
+        assert await store.flush(db) == 3
+        assert await _saved(db) == {"u1": {"a": 1}, "u2": {"a": 1}, "u3": {"a": 1}}
+        assert store.stats()["pending"] == 0 and store.stats()["dirty"] == 0
+        assert await store.flush(db) == 0
+
+    asyncio.run(scenario())
+
+
+def test_evicted_cart_is_read_back_before_it_is_flushed(db):
+    async def scenario():
+        store = CartStore(max_size=1)
+        await _set(store, db, "u1", "a", 2)
+        await store.get(db, "u2")
+        assert store.stats()["pending"] == 1
+
+        # Relu depuis les paniers en attente, sans aller-retour MongoDB
+        misses = store.misses
+        entry = await store.get(db, "u1")
+        assert entry.items == {"a": 2} and entry.dirty
+        assert store.misses == misses
+        # u2 (propre) est évincé sans attente ; u1 revient dans le cache
+        assert store.stats()["cached"] == 1 and store.stats()["pending"] == 0
+
+        await _set(store, db, "u1", "b", 1)
+        assert await store.flush(db) == 1
+        assert await _saved(db) == {"u1": {"a": 2, "b": 1}}
+
+    asyncio.run(scenario())
+
+
+def test_update_during_a_flush_is_written_by_the_next_one(db):
+    async def scenario():
+        store = CartStore(max_size=1)
+        await _set(store, db, "u1", "a", 1)
+        await _set(store, db, "u2", "a", 1)
+        assert store.stats()["pending"] == 1
+
+        async def during():
+            # u2 en cache et u1 évincé sont modifiés alors que leur écriture est en cours
+            await _set(store, db, "u2", "a", 5)
+            await _set(store, db, "u1", "b", 3)
+
+        assert await store.flush(_DuringFlush(db, during)) == 2
+        assert await _saved(db) == {"u1": {"a": 1}, "u2": {"a": 1}}
+        # Les versions écrites sont antérieures : les deux paniers restent à écrire
+        assert store.stats()["dirty"] == 2
+
+        assert await store.flush(db) == 2
+        assert await _saved(db) == {"u1": {"a": 1, "b": 3}, "u2": {"a": 5}}
+        assert store.stats()["dirty"] == 0 and store.stats()["pending"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,39 @@
+"""Binary catalog snapshot: lossless round trip of products.json."""
+from pathlib import Path
+import json
+
+from app.services.catalog_snapshot import CatalogSnapshot, compile_snapshot, load_catalog_data
+
+PRODUCTS_JSON = Path(__file__).parent.parent / "backend" / "data" / "products.json"
+
+
+def _round_trip(tmp_path, data):
+    json_path = tmp_path / "products.json"
+    json_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    return CatalogSnapshot(compile_snapshot(json_path)).data()
+
+
+def test_shipped_catalog_round_trips_exactly(tmp_path):
+    data = json.loads(PRODUCTS_JSON.read_text(encoding="utf-8"))
+    assert _round_trip(tmp_path, data) == data
+
+
+def test_unknown_fields_nulls_and_other_types_are_kept(tmp_path):
+    products = [
+        {"id": "a", "name": "Crème", "price": 12.5, "rating": 4, "in_stock": 1, "match_score": 0.93, "tags": ["x", "é"]},
+        {"id": "b", "price": True, "review_count": None, "image_file": None, "is_new": False},
+        {"id": "c"},
+    ]
+    result = _round_trip(tmp_path, {"metadata": {"v": 1}, "products": products})["products"]
+    assert result == products
+    # Aucun champ ajouté (is_bestseller, original_price...) s'il n'était pas dans la source
+    assert [sorted(p) for p in result] == [sorted(p) for p in products]
+    assert type(result[0]["rating"]) is int and type(result[1]["price"]) is bool
+
+
+def test_stale_snapshot_is_recompiled(tmp_path):
+    json_path = tmp_path / "products.json"
+    json_path.write_text(json.dumps({"products": [{"id": "a"}]}), encoding="utf-8")
+    assert load_catalog_data(json_path)["products"] == [{"id": "a"}]
+    json_path.write_text(json.dumps({"products": [{"id": "a"}, {"id": "bb", "match_score": 1.0}]}), encoding="utf-8")
+    assert load_catalog_data(json_path)["products"] == [{"id": "a"}, {"id": "bb", "match_score": 1.0}]
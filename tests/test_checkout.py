@@ -0,0 +1,129 @@
+"""Server-side resolution of order lines, and its latency as the cart grows."""
+from types import SimpleNamespace
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes.orders import OrderItemCreate
+from app.services.checkout import CHECKOUT_PRODUCT_PROJECTION, compute_order_totals, resolve_order_items
+
+PRODUCTS = [
+    {"id": "a", "name": "Crème A", "brand": "X", "image_url": "/a.png", "price_tnd": 30, "in_stock": True, "quantity": 5},
+    {"id": "b", "name": "Sérum B", "brand": "Y", "image_url": "/b.png", "price_tnd": 45, "in_stock": True},
+    {"id": "c", "name": "Masque C", "brand": "Z", "image_url": "/c.png", "price_tnd": 12, "in_stock": False},
+]
+
+
+def _resolve(db, *lines):
+    async def scenario():
+        await db.products.insert_many([dict(p) for p in PRODUCTS])
+        return await resolve_order_items(db, [OrderItemCreate(product_id=pid, quantity=q, product_name="ignoré") for pid, q in lines])
+
+    return asyncio.run(scenario())
+
+
+def test_duplicate_lines_are_merged_and_priced_from_the_catalog(db):
+    lines, subtotal = _resolve(db, ("a", 2), ("b", 1), ("a", 3))
+
+    assert [(line["product_id"], line["quantity"], line["total_price_tnd"]) for line in lines] == [("a", 5, 150), ("b", 1, 45)]
+    assert lines[0]["product_name"] == "Crème A"
+    # Stock suivi seulement pour les produits qui ont un champ quantity
+    assert [line["stock_reserved"] for line in lines] == [True, False]
+    assert subtotal == 195
+    assert compute_order_totals(subtotal)["total_tnd"] == 195
+
+
+def test_unknown_product_is_a_400(db):
+    with pytest.raises(HTTPException) as error:
+        _resolve(db, ("a", 1), ("inconnu", 1))
+    assert error.value.status_code == 400
+    assert "inconnu" in error.value.detail
+
+
+@pytest.mark.parametrize("lines, name", [
+    ([("c", 1)], "Masque C"),
+    # 4 + 2 après fusion dépasse les 5 en stock
+    ([("a", 4), ("b", 1), ("a", 2)], "Crème A"),
+])
+def test_out_of_stock_is_a_409(db, lines, name):
+    with pytest.raises(HTTPException) as error:
+        _resolve(db, *lines)
+    assert error.value.status_code == 409
+    assert name in error.value.detail
+
+
+def test_non_positive_quantity_is_a_400(db):
+    with pytest.raises(HTTPException) as error:
+        _resolve(db, ("a", 0))
+    assert error.value.status_code == 400
+
+
+class _RemoteProducts:
+    """db.products with a simulated network round trip on every query."""
+
+    def __init__(self, products, rtt):
+        self.products = products
+        self.rtt = rtt
+        self.round_trips = 0
+
+    def find(self, *args, **kwargs):
+        self.round_trips += 1
+        cursor = self.products.find(*args, **kwargs)
+        to_list = cursor.to_list
+
+        async def remote_to_list(length=None):
+            await asyncio.sleep(self.rtt)
+            return await to_list(length)
+
+        cursor.to_list = remote_to_list
+        return cursor
+
+    async def find_one(self, *args, **kwargs):
+        self.round_trips += 1
+        await asyncio.sleep(self.rtt)
+        return await self.products.find_one(*args, **kwargs)
+
+
+def test_checkout_latency_stays_flat_as_the_cart_grows(db):
+    rtt = 0.005
+    sizes = [1, 10, 50, 100]
+    remote = _RemoteProducts(db.products, rtt)
+
+    async def per_line(items):
+        # Référence : une recherche produit par ligne, comme avant la résolution groupée
+        for item in items:
+            await remote.find_one({"id": item.product_id}, CHECKOUT_PRODUCT_PROJECTION)
+
+    async def timed(func, items, runs):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            await func(items)
+            timings.append(time.perf_counter() - started)
+        return sorted(timings)[runs // 2]
+
+    async def scenario():
+        await db.products.insert_many([
+            {"id": f"p{i}", "name": f"Produit {i}", "brand": "X", "image_url": f"/p{i}.png",
+             "price_tnd": 10 + i % 50, "in_stock": True, "quantity": 1000}
+            for i in range(max(sizes))
+        ])
+        database = SimpleNamespace(products=remote)
+        batched, naive = {}, {}
+        for size in sizes:
+            items = [OrderItemCreate(product_id=f"p{i}", quantity=1, product_name="ignoré") for i in range(size)]
+            remote.round_trips = 0
+            batched[size] = await timed(lambda items: resolve_order_items(database, items), items, runs=3)
+            # Un seul aller-retour par résolution, quelle que soit la taille du panier
+            assert remote.round_trips == 3
+            naive[size] = await timed(per_line, items, runs=1)
+
+        for size in sizes:
+            print(f"{size:>4} lines: batched {batched[size] * 1000:6.1f} ms, per line {naive[size] * 1000:7.1f} ms")
+        # 100 lignes coûtent moins que 10 allers-retours de plus qu'une seule
+        assert batched[max(sizes)] < batched[1] + 10 * rtt
+        assert batched[max(sizes)] < naive[max(sizes)] / 10
+
+    asyncio.run(scenario())
@@ -0,0 +1,84 @@
+"""Per-client order counters and the admin client list built on them."""
+from datetime import datetime, timedelta, timezone
+import asyncio
+
+from starlette.responses import Response
+
+from app.api.routes import admin
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.services.client_stats import (
+    ensure_client_stats,
+    rebuild_client_stats,
+    record_client_cancellation,
+    record_client_order,
+)
+
+
+def _client(i):
+    return {
+        "id": f"u{i}", "email": f"u{i}@example.com", "first_name": "Client", "last_name": str(i),
+        "phone": "20000000", "role": "client", "created_at": datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(days=i),
+    }
+
+
+async def _place_orders(db):
+    orders = [
+        {"id": "o1", "user_id": "u1", "status": "pending", "total_tnd": 50},
+        {"id": "o2", "user_id": "u1", "status": "pending", "total_tnd": 30},
+        {"id": "o3", "user_id": "u2", "status": "pending", "total_tnd": 200},
+        {"id": "o4", "user_id": "u3", "status": "pending", "total_tnd": 80},
+    ]
+    for order in orders:
+        await db.orders.insert_one(dict(order))
+        await record_client_order(db, order)
+    await db.orders.update_one({"id": "o4"}, {"$set": {"status": "cancelled"}})
+    await record_client_cancellation(db, orders[3])
+
+
+def _stats(users):
+    return {u["id"]: (u["orders_count"], u["total_spent"]) for u in users}
+
+
+def test_incremental_counters_match_a_rebuild(db):
+    async def scenario():
+        await db.users.insert_many([_client(i) for i in range(1, 5)])
+        await ensure_client_stats(db)
+        await _place_orders(db)
+        incremental = _stats(await db.users.find({}).to_list(None))
+        assert incremental == {"u1": (2, 80), "u2": (1, 200), "u3": (1, 0), "u4": (0, 0)}
+
+        assert await rebuild_client_stats(db) == 3
+        assert _stats(await db.users.find({}).to_list(None)) == incremental
+
+    asyncio.run(scenario())
+
+
+def test_client_list_pages_by_stat_with_search(db, monkeypatch):
+    async def get_database():
+        return db
+
+    monkeypatch.setattr(admin, "get_database", get_database)
+
+    async def page(sort, cursor=None, search=None):
+        response = Response()
+        clients = await admin.get_all_clients(response, sort=sort, search=search, limit=2, cursor=cursor, admin={})
+        return [c["id"] for c in clients], response.headers.get(NEXT_CURSOR_HEADER)
+
+    async def scenario():
+        await db.users.insert_many([_client(i) for i in range(1, 5)] + [{**_client(9), "role": "admin"}])
+        await ensure_client_stats(db)
+        await _place_orders(db)
+
+        first, cursor = await page("total_spent")
+        second, end = await page("total_spent", cursor)
+        assert first + second == ["u2", "u1", "u4", "u3"] and end
+
+        assert (await page("orders_count"))[0] == ["u1", "u3"]
+        assert (await page("created_at"))[0] == ["u4", "u3"]
+
+        # La recherche reste appliquée sur les pages suivantes
+        first, cursor = await page("created_at", search="client")
+        second, _ = await page("created_at", cursor, search="1")
+        assert first == ["u4", "u3"] and second == ["u1"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,50 @@
+"""Co-purchase pairs: incremental counts and the full rebuild."""
+import asyncio
+
+from app.services import copurchases as module
+from app.services.copurchases import (
+    PAIRS_COLLECTION,
+    copurchases,
+    rebuild_copurchases,
+    record_order_pairs,
+)
+
+
+def _order(i, *product_ids, status="pending"):
+    return {"id": f"o{i}", "status": status, "items": [{"product_id": pid, "quantity": 1} for pid in product_ids]}
+
+
+def test_rebuild_matches_incremental_counts(db, monkeypatch):
+    # Petits lots : le comptage par lots et l'écriture par lots sont exercés
+    monkeypatch.setattr(module, "COPURCHASE_BATCH_SIZE", 2)
+
+    async def scenario():
+        orders = [
+            _order(1, "a", "b", "c"),
+            _order(2, "a", "b"),
+            _order(3, "b", "c", "b"),
+            _order(4, "a"),
+            _order(5, "a", "c"),
+        ]
+        for order in orders:
+            await db.orders.insert_one(dict(order))
+            await record_order_pairs(db, order)
+        await db.orders.update_one({"id": "o5"}, {"$set": {"status": "cancelled"}})
+        await record_order_pairs(db, orders[4], -1)
+        # Un couple obsolète doit disparaître à la reconstruction
+        await db[PAIRS_COLLECTION].insert_one({"_id": "x|y", "product_id": "x", "other_id": "y", "count": 3})
+
+        incremental = {row["_id"]: row["count"] for row in await db[PAIRS_COLLECTION].find({"count": {"$gt": 0}}).to_list(None)}
+        incremental.pop("x|y")
+
+        assert await rebuild_copurchases(db) == 6
+        rebuilt = {row["_id"]: row["count"] for row in await db[PAIRS_COLLECTION].find({}).to_list(None)}
+        assert rebuilt == incremental == {"a|b": 2, "b|a": 2, "a|c": 1, "c|a": 1, "b|c": 2, "c|b": 2}
+        assert "count" in await db[PAIRS_COLLECTION].index_information()
+        assert copurchases.complements("b") == [("c", 2), ("a", 2)]
+
+        await db.orders.delete_many({})
+        assert await rebuild_copurchases(db) == 0
+        assert await db[PAIRS_COLLECTION].count_documents({}) == 0
+
+    asyncio.run(scenario())
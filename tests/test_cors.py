@@ -0,0 +1,32 @@
+"""CORS: headers the cross-origin frontend must be able to read."""
+import asyncio
+
+import server
+from app.api.pagination import NEXT_CURSOR_HEADER
+
+
+def _get(app, path, headers):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": ("127.0.0.1", 50000), "server": ("testserver", 8000),
+    }
+    asyncio.run(app(scope, receive, send))
+    start = next(m for m in messages if m["type"] == "http.response.start")
+    return start["status"], {name.decode(): value.decode() for name, value in start["headers"]}
+
+
+def test_next_cursor_header_is_exposed_to_the_frontend():
+    status, headers = _get(server.app, "/health", {"Origin": "http://localhost:3000"})
+    assert status == 200
+    exposed = [h.strip().lower() for h in headers["access-control-expose-headers"].split(",")]
+    assert NEXT_CURSOR_HEADER.lower() in exposed
@@ -0,0 +1,52 @@
+"""Startup index creation reports its failures."""
+import asyncio
+from datetime import datetime
+
+from app.db.indexes import ensure_indexes
+from app.services.order_numbers import dedupe_order_numbers
+
+
+def test_failed_unique_index_is_reported_as_required(db):
+    async def scenario():
+        await db.products.insert_many([{"id": "a"}, {"id": "a"}])
+        failures = await ensure_indexes(db)
+        assert [(f["collection"], f["index"], f["required"]) for f in failures] == [("products", "id_unique", True)]
+
+        await db.products.delete_many({})
+        assert await ensure_indexes(db) == []
+
+    asyncio.run(scenario())
+
+
+def test_duplicate_order_numbers_are_renumbered(db):
+    async def scenario():
+        await db.orders.insert_many([
+            {"id": "o1", "order_number": "ORD-20250107-0001", "created_at": datetime(2025, 1, 7, 9)},
+            {"id": "o2", "order_number": "ORD-20250107-0001", "created_at": datetime(2025, 1, 7, 10)},
+            {"id": "o3", "order_number": "ORD-20250107-0001-2", "created_at": datetime(2025, 1, 7, 11)},
+            {"id": "o4", "order_number": "ORD-20250107-0001", "created_at": datetime(2025, 1, 7, 12)},
+        ])
+        failures = await ensure_indexes(db)
+        assert [f["index"] for f in failures] == ["order_number_unique"]
+
+        assert await dedupe_order_numbers(db) == 2
+        numbers = {o["id"]: (o["order_number"], o.get("original_order_number")) for o in await db.orders.find({}).to_list(None)}
+        assert numbers == {
+            "o1": ("ORD-20250107-0001", None),
+            "o2": ("ORD-20250107-0001-3", "ORD-20250107-0001"),
+            "o3": ("ORD-20250107-0001-2", None),
+            "o4": ("ORD-20250107-0001-4", "ORD-20250107-0001"),
+        }
+        assert await ensure_indexes(db) == []
+        assert await dedupe_order_numbers(db) == 0
+
+    asyncio.run(scenario())
+
+
+def test_obsolete_indexes_are_dropped(db):
+    async def scenario():
+        await db.orders.create_index([("user_id", 1), ("status", 1), ("total_tnd", 1)], name="user_status_total")
+        assert await ensure_indexes(db) == []
+        assert "user_status_total" not in await db.orders.index_information()
+
+    asyncio.run(scenario())
@@ -0,0 +1,114 @@
+"""Stock reservation: conditional decrements and rollback."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.catalog import catalog
+from app.services.inventory import release_stock, reserve_stock
+
+
+def _line(product_id, quantity):
+    return {"product_id": product_id, "product_name": product_id, "quantity": quantity, "stock_reserved": True}
+
+
+def test_concurrent_reservations_never_oversell(db):
+    async def scenario():
+        await db.products.insert_many([
+            {"id": "a", "quantity": 60, "in_stock": True},
+            {"id": "b", "quantity": 25, "in_stock": True},
+        ])
+
+        async def order(lines):
+            try:
+                await reserve_stock(db, lines)
+                return lines
+            except HTTPException as e:
+                assert e.status_code == 409
+                return None
+
+        # Plusieurs centaines de commandes simultanées pour les dernières unités
+        orders = [[_line("a", 1), _line("b", 1)] if i % 2 else [_line("a", 2)] for i in range(500)]
+        results = await asyncio.gather(*(order(lines) for lines in orders))
+
+        products = {p["id"]: p for p in await db.products.find({}).to_list(None)}
+        reserved = {"a": 0, "b": 0}
+        for lines in results:
+            for line in lines or []:
+                reserved[line["product_id"]] += line["quantity"]
+        assert products["a"]["quantity"] >= 0 and products["b"]["quantity"] >= 0
+        assert products["a"]["quantity"] == 60 - reserved["a"]
+        assert products["b"]["quantity"] == 25 - reserved["b"]
+        assert products["a"]["in_stock"] == (products["a"]["quantity"] > 0)
+        # Le stock a bien été épuisé et l'excédent refusé
+        assert reserved["a"] >= 59 and results.count(None) > 400
+
+    asyncio.run(scenario())
+
+
+def test_failed_line_rolls_back_applied_lines(db):
+    async def scenario():
+        await db.products.insert_many([
+            {"id": "a", "quantity": 5, "in_stock": True},
+            {"id": "b", "quantity": 1, "in_stock": True},
+        ])
+        with pytest.raises(HTTPException) as error:
+            await reserve_stock(db, [_line("a", 2), _line("b", 3)])
+        assert error.value.status_code == 409
+        quantities = {p["id"]: p["quantity"] for p in await db.products.find({}).to_list(None)}
+        assert quantities == {"a": 5, "b": 1}
+
+    asyncio.run(scenario())
+
+
+def test_deleted_product_is_a_conflict_without_phantom_document(db):
+    async def scenario():
+        await db.products.insert_one({"id": "a", "quantity": 5, "in_stock": True})
+        with pytest.raises(HTTPException) as error:
+            await reserve_stock(db, [_line("a", 1), _line("gone", 1)])
+        assert error.value.status_code == 409
+        assert await db.products.count_documents({}) == 1
+        assert (await db.products.find_one({"id": "a"}))["quantity"] == 5
+
+        await reserve_stock(db, [_line("a", 2)])
+        await release_stock(db, [_line("a", 2)])
+        assert (await db.products.find_one({"id": "a"}))["quantity"] == 5
+
+    asyncio.run(scenario())
+
+
+def test_catalog_is_invalidated_only_when_in_stock_flips(db):
+    async def scenario():
+        await db.products.insert_many([
+            {"id": "a", "quantity": 3, "in_stock": True},
+            {"id": "b", "quantity": 10, "in_stock": True},
+        ])
+        version = catalog.version
+
+        await reserve_stock(db, [_line("b", 2)])
+        assert catalog.version == version
+
+        await reserve_stock(db, [_line("a", 3), _line("b", 1)])
+        assert catalog.version == version + 1
+
+        await release_stock(db, [_line("b", 1)])
+        assert catalog.version == version + 1
+
+        await release_stock(db, [_line("a", 1)])
+        assert catalog.version == version + 2
+        assert (await db.products.find_one({"id": "a"}))["in_stock"] is True
+
+    asyncio.run(scenario())
+
+
+def test_release_keeps_a_manual_out_of_stock(db):
+    async def scenario():
+        await db.products.insert_one({"id": "a", "quantity": 0, "in_stock": False, "stock_disabled": True})
+        version = catalog.version
+
+        await release_stock(db, [_line("a", 2)])
+        product = await db.products.find_one({"id": "a"})
+        assert product["quantity"] == 2 and product["in_stock"] is False
+        assert catalog.version == version
+
+    asyncio.run(scenario())
@@ -0,0 +1,26 @@
+"""Opaque pagination cursors."""
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.pagination import decode_cursor, encode_cursor
+
+
+def test_round_trip_keeps_dates():
+    created_at = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor({"created_at": created_at, "id": "x"}), "created_at", "id") == {
+        "created_at": created_at, "id": "x"
+    }
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 json",
+    encode_cursor({"id": "x"}),
+    encode_cursor({"created_at": {"$gt": ""}, "id": "x"}),
+    encode_cursor({"created_at": {"$date": "pas une date"}, "id": "x"}),
+])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, "created_at", "id")
+    assert error.value.status_code == 400
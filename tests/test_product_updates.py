@@ -0,0 +1,53 @@
+"""Server-side product update pipelines."""
+from datetime import datetime, timezone
+
+import mongomock
+
+from app.services.product_updates import (
+    build_product_update_pipeline,
+    discounted_price_stage,
+    toggle_stock_pipeline,
+)
+
+
+def test_discount_falls_back_to_the_price_when_original_is_missing_or_zero():
+    products = mongomock.MongoClient().kbeauty.products
+    products.insert_many([
+        {"id": "zero", "price_tnd": 100, "original_price_tnd": 0},
+        {"id": "missing", "price_tnd": 100},
+        {"id": "original", "price_tnd": 80, "original_price_tnd": 120},
+    ])
+
+    products.update_many({}, [discounted_price_stage(25)])
+    result = {p["id"]: (p["original_price_tnd"], p["price_tnd"]) for p in products.find()}
+    assert result == {"zero": (100, 75), "missing": (100, 75), "original": (120, 90)}
+
+    products.update_many({}, [discounted_price_stage(0)])
+    result = {p["id"]: (p["original_price_tnd"], p["price_tnd"], p["discount_percentage"]) for p in products.find()}
+    assert result == {"zero": (100, 100, 0), "missing": (100, 100, 0), "original": (120, 120, 0)}
+
+
+def test_manual_out_of_stock_survives_quantity_changes():
+    products = mongomock.MongoClient().kbeauty.products
+    now = datetime.now(timezone.utc)
+    products.insert_many([
+        {"id": "tracked", "quantity": 3, "in_stock": True},
+        {"id": "untracked", "in_stock": True},
+    ])
+
+    # Rupture forcée par l'admin, puis réassort
+    products.update_many({}, toggle_stock_pipeline(now))
+    products.update_one({"id": "tracked"}, build_product_update_pipeline({"quantity": 10}, now))
+    result = {p["id"]: (p["in_stock"], p["stock_disabled"]) for p in products.find()}
+    assert result == {"tracked": (False, True), "untracked": (False, True)}
+
+    # Remise en stock : un produit suivi ne réapparaît que s'il lui reste de la quantité
+    products.update_one({"id": "tracked"}, build_product_update_pipeline({"quantity": 0}, now))
+    products.update_many({}, toggle_stock_pipeline(now))
+    result = {p["id"]: (p["in_stock"], p["stock_disabled"]) for p in products.find()}
+    assert result == {"tracked": (False, False), "untracked": (True, False)}
+
+    products.update_one({"id": "tracked"}, build_product_update_pipeline({"in_stock": False, "quantity": 4}, now))
+    assert products.find_one({"id": "tracked"})["in_stock"] is False
+    products.update_one({"id": "tracked"}, build_product_update_pipeline({"in_stock": True}, now))
+    assert products.find_one({"id": "tracked"})["in_stock"] is True
@@ -0,0 +1,115 @@
+"""Promotion scheduler: start, end, back-to-back promotions and overlap rejection."""
+from datetime import datetime, timedelta, timezone
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes.admin import _validate_promotion
+from app.services.promotions import PromotionScheduler, process_due_promotions
+
+T0 = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def day(n):
+    return T0 + timedelta(days=n)
+
+
+def _promotion(promotion_id, discount, start, end, product_ids=("p",), status="scheduled"):
+    return {
+        "id": promotion_id, "name": promotion_id, "product_ids": list(product_ids), "discount_percentage": discount,
+        "is_active": True, "start_date": start, "end_date": end, "status": status,
+    }
+
+
+async def _product(db, product_id="p"):
+    product = await db.products.find_one({"id": product_id}, {"_id": 0})
+    return product["price_tnd"], product["discount_percentage"], product.get("promotion_id")
+
+
+async def _status(db, promotion_id):
+    return (await db.promotions.find_one({"id": promotion_id}))["status"]
+
+
+def test_promotion_starts_and_ends_restoring_the_previous_discount(db):
+    async def scenario():
+        await db.products.insert_one({"id": "p", "price_tnd": 90, "original_price_tnd": 100, "discount_percentage": 10})
+        await db.promotions.insert_one(_promotion("a", 30, day(1), day(5)))
+
+        assert await process_due_promotions(db, day(0)) == 0
+        assert await _product(db) == (90, 10, None)
+
+        assert await process_due_promotions(db, day(1)) == 1
+        assert await _product(db) == (70, 30, "a")
+        assert await _status(db, "a") == "running"
+
+        assert await process_due_promotions(db, day(5)) == 1
+        assert await _product(db) == (90, 10, None)
+        assert await _status(db, "a") == "ended"
+        assert "pre_promotion_discount" not in await db.products.find_one({"id": "p"})
+
+    asyncio.run(scenario())
+
+
+def test_back_to_back_promotions_hand_over_at_the_boundary(db):
+    async def scenario():
+        await db.products.insert_one({"id": "p", "price_tnd": 100, "original_price_tnd": 100, "discount_percentage": 0})
+        await db.promotions.insert_many([_promotion("a", 20, day(0), day(10)), _promotion("b", 50, day(10), day(12))])
+
+        await process_due_promotions(db, day(0))
+        assert await _product(db) == (80, 20, "a")
+        # Fin de A et début de B au même instant : retrait d'abord, puis application
+        await process_due_promotions(db, day(10))
+        assert await _product(db) == (50, 50, "b")
+        await process_due_promotions(db, day(12))
+        assert await _product(db) == (100, 0, None)
+
+    asyncio.run(scenario())
+
+
+def test_window_already_over_is_ended_without_touching_prices(db):
+    async def scenario():
+        await db.products.insert_one({"id": "p", "price_tnd": 100, "original_price_tnd": 100, "discount_percentage": 0})
+        await db.promotions.insert_one(_promotion("a", 20, day(1), day(2)))
+        await process_due_promotions(db, day(3))
+        assert await _product(db) == (100, 0, None)
+        assert await _status(db, "a") == "ended"
+
+    asyncio.run(scenario())
+
+
+def test_overlapping_promotions_on_a_product_are_rejected(db):
+    async def scenario():
+        await db.products.insert_many([{"id": "p"}, {"id": "q"}])
+        await db.promotions.insert_one(_promotion("a", 20, day(0), day(10)))
+
+        with pytest.raises(HTTPException) as error:
+            await _validate_promotion(db, ["q", "p"], 50, day(3), day(5))
+        assert error.value.status_code == 409 and "['p']" in error.value.detail
+        with pytest.raises(HTTPException):
+            await _validate_promotion(db, ["p"], 50, day(9), None)
+
+        # Autres produits, période adjacente, ou la promotion elle-même : accepté
+        await _validate_promotion(db, ["q"], 50, day(3), day(5))
+        await _validate_promotion(db, ["p"], 50, day(10), day(12))
+        await _validate_promotion(db, ["p"], 30, day(0), day(8), promotion_id="a")
+
+        await db.promotions.update_one({"id": "a"}, {"$set": {"status": "ended"}})
+        await _validate_promotion(db, ["p"], 50, day(3), day(5))
+
+    asyncio.run(scenario())
+
+
+def test_scheduler_wakes_at_the_next_boundary(db):
+    async def scenario():
+        await db.promotions.insert_many([
+            _promotion("a", 20, day(4), day(6)),
+            _promotion("b", 20, day(1), day(2), status="running"),
+        ])
+        scheduler = PromotionScheduler()
+        await scheduler.load_events(db)
+        assert scheduler.next_boundary() == day(2)
+        assert scheduler._pop_due(day(2)) == 1
+        assert scheduler.next_boundary() == day(4)
+
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+"""Rating aggregates: initialization, incremental changes and full rebuild."""
+import asyncio
+
+from app.services.reviews import (
+    apply_rating_change,
+    ensure_rating_aggregates,
+    initial_rating_aggregates,
+    rebuild_rating_aggregates,
+)
+
+EMPTY_HISTOGRAM = {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
+
+
+def _aggregates(product):
+    return product["rating_sum"], product["review_count"], product["rating"]
+
+
+def test_ensure_only_initializes_products_without_aggregates(db):
+    async def scenario():
+        await db.products.insert_many([
+            # Importé avant les agrégats, avec une note d'origine
+            {"id": "old", "rating": 4.2, "review_count": 5},
+            {"id": "bare"},
+            # Déjà suivi : ne doit pas bouger
+            {"id": "live", "rating": 4.5, "review_count": 2, "rating_sum": 9,
+             "rating_histogram": {**EMPTY_HISTOGRAM, "4": 1, "5": 1}},
+        ])
+        await db.reviews.insert_one({"id": "r", "product_id": "live", "rating": 1, "status": "approved"})
+
+        assert await ensure_rating_aggregates(db) == 2
+        products = {p["id"]: p for p in await db.products.find({}).to_list(None)}
+        assert _aggregates(products["old"]) == (21, 5, 4.2)
+        assert products["bare"]["rating_sum"] == 0 and products["bare"]["review_count"] == 0
+        assert products["bare"]["rating_histogram"] == EMPTY_HISTOGRAM
+        assert _aggregates(products["live"]) == (9, 2, 4.5)
+
+        # Second démarrage : plus rien à initialiser
+        assert await ensure_rating_aggregates(db) == 0
+
+        await apply_rating_change(db, "old", None, 5)
+        assert _aggregates(await db.products.find_one({"id": "old"})) == (26, 6, 4.3)
+
+    asyncio.run(scenario())
+
+
+def test_new_products_start_with_consistent_aggregates():
+    assert initial_rating_aggregates() == {"rating": None, "review_count": 0, "rating_sum": 0, "rating_histogram": EMPTY_HISTOGRAM}
+    assert initial_rating_aggregates(4.0, 3)["rating_sum"] == 12
+    assert initial_rating_aggregates(4.0, 0)["rating"] is None
+
+
+def test_rebuild_recomputes_everything_from_approved_reviews(db):
+    async def scenario():
+        await db.products.insert_many([{"id": "a", **initial_rating_aggregates()}, {"id": "b", **initial_rating_aggregates(4.0, 3)}])
+        await db.reviews.insert_many([
+            {"id": "r1", "product_id": "a", "rating": 5, "status": "approved"},
+            {"id": "r2", "product_id": "a", "rating": 4, "status": "approved"},
+            {"id": "r3", "product_id": "a", "rating": 1, "status": "pending"},
+        ])
+
+        assert await rebuild_rating_aggregates(db) == 1
+        a = await db.products.find_one({"id": "a"})
+        b = await db.products.find_one({"id": "b"})
+        assert _aggregates(a) == (9, 2, 4.5)
+        assert a["rating_histogram"] == {**EMPTY_HISTOGRAM, "4": 1, "5": 1}
+        assert _aggregates(b) == (0, 0, None)
+
+        await apply_rating_change(db, "a", None, 1)
+        await apply_rating_change(db, "a", 5, 3)
+        assert _aggregates(await db.products.find_one({"id": "a"})) == (8, 3, 2.7)
+
+    asyncio.run(scenario())
@@ -0,0 +1,86 @@
+"""Access token verification: hmac backend, verification cache and its expiry."""
+from datetime import timedelta
+from types import SimpleNamespace
+import time
+
+import pytest
+
+from app.core import security
+
+
+@pytest.fixture(autouse=True)
+def empty_token_cache():
+    security.clear_token_cache()
+    yield
+    security.clear_token_cache()
+
+
+def _token(minutes=60, **claims):
+    return security.create_access_token({"sub": "user-1", **claims}, timedelta(minutes=minutes))
+
+
+@pytest.mark.parametrize("backend", ["jose", "hmac"])
+def test_backends_agree(monkeypatch, backend):
+    monkeypatch.setattr(security, "JWT_BACKEND", backend)
+    token = _token(role="admin")
+    payload = security._verify_token(token)
+    assert payload["sub"] == "user-1" and payload["role"] == "admin"
+
+    header, body, signature = token.split(".")
+    assert security._verify_token(f"{header}.{body}.{signature[:-2]}AA") is None
+    assert security._verify_token(f"{header}.{body}.") is None
+    assert security._verify_token(_token(minutes=-1)) is None
+
+
+@pytest.mark.parametrize("backend", ["jose", "hmac"])
+def test_cached_verification_is_faster_and_equal(monkeypatch, backend):
+    monkeypatch.setattr(security, "JWT_BACKEND", backend)
+    tokens = [_token(n=i) for i in range(50)]
+    rounds = 20
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for token in tokens:
+            uncached = security._verify_token(token)
+    uncached_seconds = time.perf_counter() - started
+
+    for token in tokens:
+        security.decode_access_token(token)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for token in tokens:
+            cached = security.decode_access_token(token)
+    cached_seconds = time.perf_counter() - started
+
+    assert cached == uncached
+    assert cached_seconds < uncached_seconds
+    print(f"{backend}: uncached {uncached_seconds / (rounds * len(tokens)) * 1e6:.1f} µs, "
+          f"cached {cached_seconds / (rounds * len(tokens)) * 1e6:.1f} µs per token")
+
+
+def test_cached_token_is_evicted_once_expired(monkeypatch):
+    token = _token(minutes=1)
+    assert security.decode_access_token(token)["sub"] == "user-1"
+    assert len(security._token_cache) == 1
+
+    # Le cache seul répond encore ; après "exp" il doit refuser et oublier le token
+    monkeypatch.setattr(security, "_verify_token", lambda token: pytest.fail("cache not used"))
+    assert security.decode_access_token(token)["sub"] == "user-1"
+    monkeypatch.setattr(security, "time", SimpleNamespace(time=lambda: time.time() + 120))
+    assert security.decode_access_token(token) is None
+    assert len(security._token_cache) == 0
+
+
+def test_cached_payload_cannot_be_mutated_by_callers():
+    token = _token()
+    security.decode_access_token(token)["sub"] = "someone-else"
+    assert security.decode_access_token(token)["sub"] == "user-1"
+
+
+def test_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(security, "TOKEN_CACHE_MAX_SIZE", 3)
+    tokens = [_token(n=i) for i in range(5)]
+    for token in tokens:
+        security.decode_access_token(token)
+    key = lambda token: security.hashlib.sha256(token.encode()).digest()
+    assert list(security._token_cache) == [key(token) for token in tokens[2:]]
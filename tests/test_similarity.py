@@ -0,0 +1,87 @@
+"""Similar products: sparse rows, neighbour lists and the background listener."""
+import threading
+
+import numpy as np
+
+from app.services import similarity as module
+from app.services.similarity import SimilarityIndex
+
+
+def _catalog(n):
+    words = ["hydratant", "serum", "vitamine", "acide", "hyaluronique", "apaisant", "centella", "spf", "riz", "the"]
+    return [
+        {
+            "id": f"p{i}",
+            "name": f"{words[i % 10]} {words[(i * 3) % 10]}",
+            "brand": f"brand{i % 4}",
+            "category": f"category{i % 3}",
+            "description": " ".join(words[(i + j) % 10] for j in range(i % 5 + 1)),
+        }
+        for i in range(n)
+    ]
+
+
+def _dense_top_scores(index, k):
+    matrix = index._dense(range(len(index.ids)))
+    scores = matrix @ matrix.T
+    np.fill_diagonal(scores, -1.0)
+    return {
+        index.ids[row]: [score for score in sorted(scores[row], reverse=True)[:k] if score > 0]
+        for row in range(len(index.ids))
+    }
+
+
+def test_neighbours_match_a_dense_cosine_across_blocks(monkeypatch):
+    # Petits blocs : le découpage des scores est exercé
+    monkeypatch.setattr(module, "SIMILAR_BLOCK_SIZE", 7)
+    index = SimilarityIndex(top_k=3)
+    index.build(_catalog(40))
+
+    # Comparaison des scores (les égalités laissent le choix des voisins)
+    expected = _dense_top_scores(index, 3)
+    assert set(index.neighbours) == set(expected)
+    for product_id, listed in index.neighbours.items():
+        assert np.allclose([score for _, score in listed], expected[product_id])
+
+
+def test_incremental_update_recomputes_the_affected_lists(monkeypatch):
+    monkeypatch.setattr(module, "SIMILAR_REBUILD_RATIO", 0.5)
+    products = _catalog(30)
+    index = SimilarityIndex(top_k=3)
+    index.build(products)
+
+    products[4] = dict(products[4], name=products[7]["name"], description=products[7]["description"],
+                       brand=products[7]["brand"], category=products[7]["category"])
+    del products[12]
+    index.update(products)
+    assert (index.full_builds, index.incremental_updates) == (1, 1)
+    assert "p12" not in index.neighbours
+    assert all(other != "p12" for listed in index.neighbours.values() for other, _ in listed)
+    assert index.similar("p4")[0][0] == "p7"
+    assert index.similar("p4")[0][1] > 0.99
+
+
+def test_listener_builds_in_the_background_and_keeps_the_latest_catalog():
+    index = SimilarityIndex(top_k=3)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    update = index.update
+
+    def slow_update(products):
+        calls.append(len(products))
+        started.set()
+        release.wait(5)
+        update(products)
+
+    index.update = slow_update
+    future = index.schedule(_catalog(10))
+    assert started.wait(5)
+    # Recharges pendant la construction : une seule mise à jour, avec le dernier catalogue
+    index.schedule(_catalog(20))
+    assert index.schedule(_catalog(30)) is future
+    assert index.neighbours == {}
+    release.set()
+    future.result(5)
+
+    assert calls == [10, 30]
+    assert len(index.ids) == 30 and not index.stats()["updating"]